@@ -0,0 +1,337 @@
+"""
+Load tests the API end to end: boots the server (setup_cherry_tree) in a
+child process against a local database, with a real boto3 client signing
+with made up credentials so S3 is never called, then drives
+/api/upload, /api/status and /api/access from many client threads and
+reports throughput and latency percentiles per endpoint.
+
+Run from the root of the repo, against a migrated database:
+    PYTHONPATH=. python -m benchmarks.load_test --dsn 'host=localhost port=5432 dbname=db'
+
+Save a run with --output and pass it to a later run's --compare to see what
+changed. The server inherits the environment, so e.g.
+STATUS_WRITE_COALESCER=on applies to it. --server-workers runs it as that
+many processes, as with cloud_asset_server.py --workers. Every asset the load test creates
+is deleted when it finishes.
+"""
+import argparse
+import http.client
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+import psycopg2
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.database_accessor import CONNECTION_ARGS, TEST_DB_CONN_ARGS
+
+ENDPOINTS = ('upload', 'status', 'access')
+BUCKET = 'load-test'
+
+def _serve(port, dsn, server_threads, server_workers):
+    os.environ[CONNECTION_ARGS] = dsn
+    # Read when s3_service is first imported, just below
+    os.environ['S3_BUCKET_NAME'] = BUCKET
+    # Imported here so the parent process doesn't pay for CherryPy and boto3
+    import boto3
+    import cherrypy
+    from botocore.config import Config
+    from cloud_asset_server import setup_cherry_tree, CHERRY_TREE_CONFIG
+    from database.database_accessor import DatabaseAccessor
+    from external_services.s3_service import S3Service
+    from prefork import PreforkSupervisor, open_listening_socket, use_listening_socket
+
+    def serve(listen_socket=None):
+        S3Service.s3_client = boto3.client(
+            's3',
+            region_name='eu-west-2',
+            aws_access_key_id='AKIDEXAMPLE',
+            aws_secret_access_key='wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+            config=Config(signature_version='s3v4'),
+        )
+        DatabaseAccessor.connect(max_size=max(server_threads, 1))
+        service = setup_cherry_tree(port)
+        cherrypy.config.update({'server.thread_pool': server_threads})
+        if listen_socket is not None:
+            use_listening_socket(listen_socket)
+        cherrypy.quickstart(service, '/api', CHERRY_TREE_CONFIG)
+
+    if not server_workers:
+        serve()
+        return
+    with open_listening_socket(cherrypy.server.socket_host, port, cherrypy.server.socket_queue_size) as listen_socket:
+        PreforkSupervisor(serve, listen_socket, server_workers).run()
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+def _wait_for_server(port, server, timeout):
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if not server.is_alive():
+            raise RuntimeError(f'Server exited with code {server.exitcode}')
+        try:
+            with socket.create_connection(('localhost', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'Server did not start within {timeout} seconds')
+
+def parse_mix(mix):
+    """
+    :param mix: e.g. 'upload=1,status=1,access=2', the relative share of requests per endpoint.
+    """
+    weights = {}
+    for part in mix.split(','):
+        endpoint, _, weight = part.partition('=')
+        if endpoint.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f'Unknown endpoint {endpoint!r}, expected one of {ENDPOINTS}')
+        weights[endpoint.strip()] = float(weight or 1)
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError('At least one endpoint needs a weight above 0')
+    return weights
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))]
+
+def summarize(latencies, errors, seconds):
+    latencies = sorted(latencies)
+    ms = lambda value: None if value is None else value * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': len(latencies) / seconds,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1]) if latencies else None,
+    }
+
+class _Worker(threading.Thread):
+    """
+    Sends requests over one keep-alive connection until `stop` is set,
+    recording the latency of every request sent after `measure` is set.
+    """
+    def __init__(self, index, port, run_id, weights, asset_ids, measure, stop):
+        super().__init__(daemon=True)
+        self.index = index
+        self.port = port
+        self.run_id = run_id
+        self.endpoints = list(weights)
+        self.weights = list(weights.values())
+        self.asset_ids = asset_ids
+        self.measure = measure
+        self.stop = stop
+        self.random = random.Random(index)
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.errors = {endpoint: 0 for endpoint in ENDPOINTS}
+        self.connection = None
+        self.uploads = 0
+
+    def _request(self, endpoint):
+        if endpoint == 'upload':
+            self.uploads += 1
+            body = json.dumps({'object_key': f'{self.run_id}/{self.index}/{self.uploads}'})
+            return 'POST', '/api/upload', body
+        asset_id = self.random.choice(self.asset_ids)
+        if endpoint == 'status':
+            body = json.dumps({'asset_id': asset_id, 'uploaded_status': UploadedStatus.COMPLETE.value})
+            return 'PUT', '/api/status', body
+        return 'GET', f'/api/access?asset_id={asset_id}', None
+
+    def _send(self, method, path, body):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection('localhost', self.port, timeout=30)
+        try:
+            self.connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            return None
+
+    def run(self):
+        while not self.stop.is_set():
+            endpoint = self.random.choices(self.endpoints, self.weights)[0]
+            request = self._request(endpoint)
+            measuring = self.measure.is_set()
+            start = time.perf_counter()
+            status = self._send(*request)
+            elapsed = time.perf_counter() - start
+            if not measuring:
+                continue
+            if status is None or status >= 400:
+                self.errors[endpoint] += 1
+            else:
+                self.latencies[endpoint].append(elapsed)
+        if self.connection is not None:
+            self.connection.close()
+
+def _seed(dsn, run_id, count):
+    connection = psycopg2.connect(dsn)
+    try:
+        with connection, connection.cursor() as cursor:
+            now = datetime.utcnow()
+            assets = AssetDao.insert_many([
+                AssetRow(
+                    id=None,
+                    uploaded_status=UploadedStatus.COMPLETE.value,
+                    bucket=BUCKET,
+                    object_key=f'{run_id}/seed/{index}',
+                    create_date=now,
+                )
+                for index in range(count)
+            ], cursor)
+        return [asset.id for asset in assets]
+    finally:
+        connection.close()
+
+def _clean_up(dsn, run_id):
+    connection = psycopg2.connect(dsn)
+    try:
+        with connection, connection.cursor() as cursor:
+            cursor.execute(
+                'with deleted as (delete from asset_key where bucket = %s and object_key like %s returning id, create_date) '
+                'delete from asset using deleted where asset.id = deleted.id and asset.create_date = deleted.create_date',
+                (BUCKET, f'{run_id}/%')
+            )
+    finally:
+        connection.close()
+
+def run(dsn, weights, concurrency, duration, warmup, seed_assets, server_threads, server_workers=None, timeout=30.0):
+    run_id = f'load-test-{uuid.uuid4().hex}'
+    asset_ids = _seed(dsn, run_id, seed_assets)
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port, dsn, server_threads, server_workers), daemon=True)
+    server.start()
+    try:
+        _wait_for_server(port, server, timeout)
+        measure = threading.Event()
+        stop = threading.Event()
+        workers = [
+            _Worker(index, port, run_id, weights, asset_ids, measure, stop)
+            for index in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        time.sleep(warmup)
+        measure.set()
+        measure_start = time.perf_counter()
+        time.sleep(duration)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - measure_start
+    finally:
+        server.terminate()
+        server.join()
+        _clean_up(dsn, run_id)
+
+    endpoints = {
+        endpoint: summarize(
+            [latency for worker in workers for latency in worker.latencies[endpoint]],
+            sum(worker.errors[endpoint] for worker in workers),
+            seconds,
+        )
+        for endpoint in ENDPOINTS if weights.get(endpoint)
+    }
+    return {
+        'config': {
+            'concurrency': concurrency,
+            'duration_s': duration,
+            'warmup_s': warmup,
+            'mix': weights,
+            'seed_assets': seed_assets,
+            'server_threads': server_threads,
+            'server_workers': server_workers,
+        },
+        'endpoints': endpoints,
+        'total': summarize(
+            [latency for worker in workers for endpoint in ENDPOINTS for latency in worker.latencies[endpoint]],
+            sum(sum(worker.errors.values()) for worker in workers),
+            seconds,
+        ),
+    }
+
+def compare(results, baseline):
+    """
+    :return: the percentage change of each endpoint's throughput and latency
+    percentiles from `baseline`, a previous run's results.
+    """
+    changes = {}
+    for name, summary in {**results['endpoints'], 'total': results['total']}.items():
+        before = baseline['endpoints'].get(name) if name != 'total' else baseline.get('total')
+        if not before:
+            continue
+        changes[name] = {
+            key: (summary[key] - before[key]) / before[key] * 100 if summary[key] and before[key] else None
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')
+        }
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.getenv(CONNECTION_ARGS, TEST_DB_CONN_ARGS))
+    parser.add_argument('--concurrency', type=int, default=10, help='client threads sending requests')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to measure for')
+    parser.add_argument('--warmup', type=float, default=2.0, help='seconds to send requests before measuring')
+    parser.add_argument(
+        '--mix', type=parse_mix, default='upload=1,status=1,access=2',
+        help='relative share of requests per endpoint (default: %(default)s)'
+    )
+    parser.add_argument('--seed-assets', type=int, default=1000, help='complete assets to update and access')
+    parser.add_argument('--server-threads', type=int, default=10, help="the server's thread pool size")
+    parser.add_argument(
+        '--server-workers', type=int,
+        help='run the server as this many processes sharing the port, each with --server-threads threads'
+    )
+    parser.add_argument('--output', help='also write the results, as JSON, to this file')
+    parser.add_argument('--compare', help='a previous run saved with --output to compare against')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(
+        args.dsn, args.mix, args.concurrency, args.duration, args.warmup, args.seed_assets, args.server_threads,
+        args.server_workers
+    )
+    if args.compare:
+        with open(args.compare) as baseline:
+            results['change_pct'] = compare(results, json.load(baseline))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f'{args.concurrency} clients for {args.duration:.0f}s')
+    print(f'{"endpoint":<10} {"requests":>9} {"errors":>7} {"req/s":>9} {"p50 (ms)":>9} {"p95 (ms)":>9} {"p99 (ms)":>9}')
+    for name, summary in {**results['endpoints'], 'total': results['total']}.items():
+        if not summary['requests']:
+            print(f'{name:<10} {summary["requests"]:>9} {summary["errors"]:>7}')
+            continue
+        print(
+            f'{name:<10} {summary["requests"]:>9} {summary["errors"]:>7} {summary["throughput_rps"]:>9.0f} '
+            f'{summary["p50_ms"]:>9.2f} {summary["p95_ms"]:>9.2f} {summary["p99_ms"]:>9.2f}'
+        )
+    for name, change in results.get('change_pct', {}).items():
+        formatted = ', '.join(
+            f'{key} {value:+.1f}%' for key, value in change.items() if value is not None
+        )
+        print(f'{name:<10} vs. baseline: {formatted}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Microbenchmarks of the per-request work the server does in Python: request
+validation, turning database rows into AssetRows, building and sending SQL,
+serializing responses to JSON with the server's own encoder and signing S3
+URLs with a real boto3 client. Each case reports its time per call and, from
+tracemalloc, the memory it allocates per call.
+
+Runs offline, with no database (SQL goes to a cursor that only records it)
+and made up AWS credentials, from the root of the repo:
+    PYTHONPATH=. python -m benchmarks.micro_bench
+    PYTHONPATH=. python -m benchmarks.micro_bench --case sign
+
+`ns/op` is the best of --repeat timed loops of --iterations calls. `peak B/op`
+is the most memory a single call has allocated at once, including what it
+frees before returning, and `kept blocks/op` and `kept B/op` what is still
+allocated after it returns (its result, mostly).
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault('S3_BUCKET_NAME', 'benchmark-bucket')
+
+import boto3
+from botocore.config import Config
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from endpoints.metrics import encode_json
+from external_services.s3_service import S3Service, S3ClientMethod
+from external_services.signed_url_cache import SignedUrlCache
+from methods.asset_methods import _asset_to_json, _encode_list_cursor
+from methods.s3_access_methods import _check_valid_upload_request, _check_valid_access_request
+
+class _RecordingCursor:
+    """
+    Stands in for a psycopg2 cursor, so the DAO's SQL building and parameter
+    handling can be timed without the round trip to the database.
+    """
+    class _Connection:
+        def __init__(self):
+            self.prepared_statements = set()
+
+    def __init__(self, rows):
+        self.connection = self._Connection()
+        self.rows = rows
+        self.executed = None
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        self.executed = (sql, params)
+        self.rowcount = len(self.rows)
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+def _result_row(i):
+    return (i, UploadedStatus.COMPLETE.value, 'benchmark-bucket', f'benchmark/{i}.jpg', datetime(2020, 2, 29), None)
+
+def _asset_row(i):
+    return AssetRow(*_result_row(i))
+
+def _s3_client():
+    return boto3.client(
+        's3',
+        region_name='eu-west-2',
+        aws_access_key_id='AKIDEXAMPLE',
+        aws_secret_access_key='wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+        config=Config(signature_version='s3v4'),
+    )
+
+
+def _signing(native, cached, method):
+    """
+    Signs with S3Service.create_signed_url, with the native presigner and the
+    signed URL cache switched on or off. Uncached calls use a new key every
+    time, so each one is really signed.
+    """
+    def setup():
+        S3Service.s3_client = _s3_client()
+        S3Service.use_native_presigner = native
+        # Lets the same URL be reused for repeat requests for it, to time a cache hit
+        S3Service.signed_url_cache = SignedUrlCache(max_size=10000 if cached else 0, min_remaining_fraction=0.5)
+        S3Service.create_signed_url(method, 'benchmark/0.jpg')
+
+    def call(i):
+        return S3Service.create_signed_url(method, 'benchmark/0.jpg' if cached else f'benchmark/{i}.jpg')
+    return setup, call
+
+def _cases():
+    """
+    :return: (name, setup, call) for every case, where `call` takes the
+    iteration number and `setup` runs once before the case is measured.
+    """
+    upload_request = {'object_key': 'benchmark/1.jpg', 'expires_in': 60}
+    # Query string parameters arrive as strings
+    access_request = {'asset_id': '1', 'expires_in': '60'}
+    result_row = _result_row(1)
+    page = [_result_row(i) for i in range(100)]
+    new_rows = [_asset_row(i) for i in range(100)]
+    one_row_cursor = _RecordingCursor([result_row])
+    page_cursor = _RecordingCursor(page)
+    page_assets = [_asset_row(i) for i in range(100)]
+    upload_response = {
+        'url': {
+            'url': 'https://benchmark-bucket.s3.amazonaws.com/',
+            'fields': {
+                'key': 'benchmark/1.jpg',
+                'x-amz-algorithm': 'AWS4-HMAC-SHA256',
+                'x-amz-credential': 'AKIDEXAMPLE/20200229/eu-west-2/s3/aws4_request',
+                'x-amz-date': '20200229T000000Z',
+                'policy': 'eyJleHBpcmF0aW9uIjogIjIwMjAtMDItMjlUMDA6MDE6MDBaIn0=' * 8,
+                'x-amz-signature': 'f' * 64,
+            },
+        },
+        'asset_id': 1,
+    }
+    access_response = {
+        'url': 'https://benchmark-bucket.s3.eu-west-2.amazonaws.com/benchmark/1.jpg?' + 'X-Amz-Signature=' + 'f' * 400,
+        'asset_id': 1,
+    }
+    noop = lambda: None
+
+    return [
+        ('validate upload request', noop, lambda i: _check_valid_upload_request(upload_request)),
+        ('validate access request', noop, lambda i: _check_valid_access_request(access_request)),
+        ('convert row to AssetRow', noop, lambda i: AssetDao._convert_to_asset_row(result_row)),
+        ('sql get_by_id', noop, lambda i: AssetDao.get_by_id(1, one_row_cursor)),
+        ('sql list_page (100 rows)', noop, lambda i: AssetDao.list_page(
+            100, page_cursor, uploaded_status=UploadedStatus.COMPLETE.value, after=(datetime(2020, 1, 1), 1)
+        )),
+        ('sql insert_many (100 rows)', noop, lambda i: AssetDao.insert_many(new_rows, page_cursor)),
+        ('json upload response', noop, lambda i: encode_json(upload_response)),
+        ('json access response', noop, lambda i: encode_json(access_response)),
+        ('json list page (100 assets)', noop, lambda i: encode_json({
+            'assets': [_asset_to_json(asset) for asset in page_assets],
+            'next_cursor': _encode_list_cursor(page_assets[-1]),
+        })),
+        ('sign get_object (boto3)', *_signing(False, False, S3ClientMethod.GET_OBJECT)),
+        ('sign get_object (native)', *_signing(True, False, S3ClientMethod.GET_OBJECT)),
+        ('sign get_object (cached)', *_signing(False, True, S3ClientMethod.GET_OBJECT)),
+        ('sign post_object (boto3)', *_signing(False, False, S3ClientMethod.POST_OBJECT)),
+        ('sign post_object (native)', *_signing(True, False, S3ClientMethod.POST_OBJECT)),
+    ]
+
+def _ns_per_op(call, iterations, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for i in range(iterations):
+            call(i)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / iterations
+
+def _allocations(call, iterations):
+    tracemalloc.start()
+    try:
+        peaks = []
+        for i in range(iterations):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            call(i)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+
+        results = []
+        before = tracemalloc.take_snapshot()
+        for i in range(iterations):
+            results.append(call(i))
+        after = tracemalloc.take_snapshot()
+        kept = [stat for stat in after.compare_to(before, 'filename') if stat.size_diff > 0]
+        # The list holding the results isn't the calls' doing
+        kept_blocks = sum(stat.count_diff for stat in kept) - 1
+        kept_bytes = sum(stat.size_diff for stat in kept) - results.__sizeof__()
+    finally:
+        tracemalloc.stop()
+
+    peaks.sort()
+    return {
+        'peak_bytes_per_op': peaks[len(peaks) // 2],
+        'kept_blocks_per_op': max(kept_blocks, 0) / iterations,
+        'kept_bytes_per_op': max(kept_bytes, 0) / iterations,
+    }
+
+def run(iterations, repeat, alloc_iterations, case_filter=None):
+    saved = (S3Service.s3_client, S3Service.use_native_presigner, S3Service.signed_url_cache)
+    results = {}
+    try:
+        for name, setup, call in _cases():
+            if case_filter and case_filter not in name:
+                continue
+            setup()
+            # Warm up, e.g. so the presigner has probed the bucket
+            for i in range(min(iterations, 100)):
+                call(i)
+            results[name] = {
+                'ns_per_op': _ns_per_op(call, iterations, repeat),
+                **_allocations(call, alloc_iterations),
+            }
+    finally:
+        S3Service.s3_client, S3Service.use_native_presigner, S3Service.signed_url_cache = saved
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5000, help='calls per timed loop')
+    parser.add_argument('--repeat', type=int, default=5, help='timed loops per case, the fastest of which is kept')
+    parser.add_argument('--alloc-iterations', type=int, default=200, help='calls traced for allocations')
+    parser.add_argument('--case', help='only run cases whose name contains this')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.repeat, args.alloc_iterations, args.case)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f'{"case":<30} {"ns/op":>10} {"peak B/op":>10} {"kept blocks/op":>15} {"kept B/op":>10}')
+    for name, result in results.items():
+        print(
+            f'{name:<30} {result["ns_per_op"]:>10.0f} {result["peak_bytes_per_op"]:>10} '
+            f'{result["kept_blocks_per_op"]:>15.1f} {result["kept_bytes_per_op"]:>10.0f}'
+        )
+
+if __name__ == '__main__':
+    main()
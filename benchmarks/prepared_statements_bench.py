@@ -0,0 +1,103 @@
+"""
+Compares per-query latency of AssetDao calls sent as plain SQL against the
+same calls run as server-side prepared statements.
+
+Run from the root of the repo, against a migrated database:
+    PYTHONPATH=. python -m benchmarks.prepared_statements_bench --dsn 'host=localhost port=5432 dbname=db'
+
+Everything the benchmark writes is rolled back when it finishes.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime
+import psycopg2
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.database_accessor import CONNECTION_ARGS, TEST_DB_CONN_ARGS
+from database.statement import PreparingConnection, Statement
+
+def _time_calls(fn, iterations):
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def _summarize(timings):
+    timings = sorted(timings)
+    return {
+        'mean_us': statistics.mean(timings) * 1e6,
+        'p50_us': timings[len(timings) // 2] * 1e6,
+        'p99_us': timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6,
+    }
+
+def run(dsn, iterations):
+    results = {}
+    for mode, prepared in (('plain', False), ('prepared', True)):
+        Statement.use_prepared_statements = prepared
+        # A fresh connection per mode, so the prepared run pays its PREPAREs too
+        connection = psycopg2.connect(dsn, connection_factory=PreparingConnection)
+        try:
+            with connection.cursor() as cursor:
+                run_id = uuid.uuid4().hex
+                now = datetime.utcnow()
+
+                def insert_one(i):
+                    AssetDao.insert_one(AssetRow(
+                        id=None,
+                        uploaded_status=UploadedStatus.PENDING.value,
+                        bucket='benchmark',
+                        object_key=f'{run_id}/{i}',
+                        create_date=now,
+                    ), cursor)
+
+                insert_timings = _time_calls(insert_one, iterations)
+
+                cursor.execute(
+                    'select id from asset where bucket = %s and object_key like %s',
+                    ('benchmark', f'{run_id}/%')
+                )
+                asset_ids = [row[0] for row in cursor.fetchall()]
+                get_timings = _time_calls(
+                    lambda i: AssetDao.get_by_id(random.choice(asset_ids), cursor),
+                    iterations,
+                )
+
+                results[mode] = {
+                    'get_by_id': _summarize(get_timings),
+                    'insert_one': _summarize(insert_timings),
+                }
+        finally:
+            connection.rollback()
+            connection.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.getenv(CONNECTION_ARGS, TEST_DB_CONN_ARGS))
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.dsn, args.iterations)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f'{args.iterations} calls each')
+    print(f'{"query":<12} {"mode":<10} {"mean (us)":>10} {"p50 (us)":>10} {"p99 (us)":>10}')
+    for query in ('get_by_id', 'insert_one'):
+        for mode in ('plain', 'prepared'):
+            summary = results[mode][query]
+            print(
+                f'{query:<12} {mode:<10} {summary["mean_us"]:>10.1f} '
+                f'{summary["p50_us"]:>10.1f} {summary["p99_us"]:>10.1f}'
+            )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares how many signed URLs and POST policies per second boto3 and
+SigV4Presigner produce for the same client.
+
+Runs offline with made up credentials, from the root of the repo:
+    PYTHONPATH=. python -m benchmarks.presign_bench
+"""
+import argparse
+import json
+import time
+import boto3
+from botocore.config import Config
+from external_services.sigv4_presigner import SigV4Presigner
+
+def _per_second(fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(f'benchmark/{i}.jpg')
+    return iterations / (time.perf_counter() - start)
+
+def run(region, iterations):
+    client = boto3.client(
+        's3',
+        region_name=region,
+        aws_access_key_id='AKIDEXAMPLE',
+        aws_secret_access_key='wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+        config=Config(signature_version='s3v4'),
+    )
+    presigner = SigV4Presigner(client)
+    bucket = 'benchmark-bucket'
+    if presigner.generate_presigned_url(bucket, 'warm-up', 60) is None:
+        raise RuntimeError(f'SigV4Presigner does not support signing for {region}')
+    presigner.generate_presigned_post(bucket, 'warm-up', 60)
+
+    return {
+        'get_object': {
+            'boto3': _per_second(
+                lambda key: client.generate_presigned_url(
+                    'get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=60
+                ),
+                iterations,
+            ),
+            'native': _per_second(
+                lambda key: presigner.generate_presigned_url(bucket, key, 60), iterations
+            ),
+        },
+        'post_object': {
+            'boto3': _per_second(
+                lambda key: client.generate_presigned_post(
+                    bucket, key, Fields={}, Conditions=[], ExpiresIn=60
+                ),
+                iterations,
+            ),
+            'native': _per_second(
+                lambda key: presigner.generate_presigned_post(bucket, key, 60), iterations
+            ),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--region', default='eu-west-2')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.region, args.iterations)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f'{args.iterations} signatures each')
+    print(f'{"method":<12} {"boto3 (/s)":>12} {"native (/s)":>12} {"speedup":>8}')
+    for method, rates in results.items():
+        print(
+            f'{method:<12} {rates["boto3"]:>12.0f} {rates["native"]:>12.0f} '
+            f'{rates["native"] / rates["boto3"]:>7.1f}x'
+        )
+
+if __name__ == '__main__':
+    main()
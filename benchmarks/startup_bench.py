@@ -0,0 +1,141 @@
+"""
+Measures how long the server takes to start: the time to import
+cloud_asset_server (with a breakdown of the slowest imports, from
+`python -X importtime`), and the time from launching the server to it
+answering its first request.
+
+Run from the root of the repo, against a migrated database:
+    PYTHONPATH=. python -m benchmarks.startup_bench --dsn 'host=localhost port=5432 dbname=db'
+
+Pass --import-budget-ms and/or --startup-budget-ms to exit non-zero when a
+median goes over budget, e.g. to catch regressions in CI.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import requests
+from database.database_accessor import CONNECTION_ARGS, TEST_DB_CONN_ARGS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _env(**extra):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env.update(extra)
+    return env
+
+def _parse_importtime(stderr):
+    """
+    :return: {module: cumulative microseconds} from `python -X importtime` output.
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line[len('import time:'):].split('|')
+        cumulative[module.strip()] = int(cumulative_us)
+    return cumulative
+
+def measure_import(runs, top):
+    totals = []
+    slowest = {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import cloud_asset_server'],
+            env=_env(), cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        cumulative = _parse_importtime(result.stderr)
+        totals.append(cumulative['cloud_asset_server'] / 1000)
+        for module, us in cumulative.items():
+            slowest.setdefault(module, []).append(us / 1000)
+    return {
+        'median_ms': statistics.median(totals),
+        'max_ms': max(totals),
+        'slowest_imports_ms': dict(sorted(
+            ((module, statistics.median(ms)) for module, ms in slowest.items()
+             if module != 'cloud_asset_server'),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:top]),
+    }
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+def measure_first_response(dsn, runs, timeout):
+    timings = []
+    for _ in range(runs):
+        port = _free_port()
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, 'cloud_asset_server.py', '--port', str(port)],
+            env=_env(**{CONNECTION_ARGS: dsn}), cwd=ROOT,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            while True:
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError(f'Server did not respond within {timeout} seconds')
+                if server.poll() is not None:
+                    raise RuntimeError(f'Server exited with code {server.returncode}')
+                try:
+                    # Any answer from the API will do, a 400 for an unknown asset included
+                    requests.get(f'http://localhost:{port}/api/access?asset_id=0', timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.005)
+            timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            server.terminate()
+            server.wait()
+    return {'median_ms': statistics.median(timings), 'max_ms': max(timings)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.getenv(CONNECTION_ARGS, TEST_DB_CONN_ARGS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='how many of the slowest imports to list')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds to wait for the server to respond')
+    parser.add_argument('--import-budget-ms', type=float)
+    parser.add_argument('--startup-budget-ms', type=float)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = {
+        'import': measure_import(args.runs, args.top),
+        'first_response': measure_first_response(args.dsn, args.runs, args.timeout),
+    }
+    over_budget = []
+    if args.import_budget_ms is not None and results['import']['median_ms'] > args.import_budget_ms:
+        over_budget.append(f'import took {results["import"]["median_ms"]:.0f}ms, budget is {args.import_budget_ms:.0f}ms')
+    if args.startup_budget_ms is not None and results['first_response']['median_ms'] > args.startup_budget_ms:
+        over_budget.append(
+            f'first response took {results["first_response"]["median_ms"]:.0f}ms, '
+            f'budget is {args.startup_budget_ms:.0f}ms'
+        )
+
+    if args.json:
+        print(json.dumps({**results, 'over_budget': over_budget}, indent=2))
+    else:
+        print(f'{args.runs} runs each')
+        print(f'import cloud_asset_server: median {results["import"]["median_ms"]:.0f}ms, max {results["import"]["max_ms"]:.0f}ms')
+        for module, ms in results['import']['slowest_imports_ms'].items():
+            print(f'  {ms:>8.1f}ms  {module}')
+        print(
+            f'time to first response: median {results["first_response"]["median_ms"]:.0f}ms, '
+            f'max {results["first_response"]["max_ms"]:.0f}ms'
+        )
+        for message in over_budget:
+            print(f'OVER BUDGET: {message}')
+    if over_budget:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,75 @@
-import cherrypy
 import argparse
-from unittest.mock import patch
+import os
+import threading
+import cherrypy
 from external_services.s3_service import S3Service
 from database.database_accessor import DatabaseAccessor
-from endpoints.upload_asset import UploadAssetEndpoint
-from endpoints.update_status import UpdateAssetStatusEndpoint
-from endpoints.access_asset import AccessAssetEndpoint
+from database.status_write_coalescer import status_write_coalescer
+from endpoints.upload_asset import UploadAssetEndpoint, BatchUploadAssetEndpoint
+from endpoints.multipart_upload import (
+    MultipartUploadEndpoint, CompleteMultipartUploadEndpoint, AbortMultipartUploadEndpoint
+)
+from endpoints.update_status import UpdateAssetStatusEndpoint, BatchUpdateAssetStatusEndpoint
+from endpoints.access_asset import AccessAssetEndpoint, BatchAccessAssetEndpoint
+from endpoints.list_assets import ListAssetsEndpoint
+from endpoints.export_assets import ExportAssetsEndpoint
+from endpoints.s3_events import S3EventsEndpoint
+from endpoints.metrics import MetricsEndpoint, json_handler
+import endpoints.admission  # registers tools.admission
+from prefork import PreforkSupervisor, open_listening_socket, use_listening_socket
 
 class CloudAssetManagerServer:
     pass
 
+class EventSources:
+    pass
+
 CHERRY_TREE_CONFIG = {
     '/upload': {
         'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
         'tools.response_headers.on': True,
         'tools.response_headers.headers': [('Content-Type', 'application/json')],
+        'tools.json_out.handler': json_handler,
+        'tools.request_metrics.on': True,
+        'tools.admission.on': True,
     },
     '/status': {
         'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
         'tools.response_headers.on': True,
         'tools.response_headers.headers': [('Content-Type', 'application/json')],
+        'tools.json_out.handler': json_handler,
+        'tools.request_metrics.on': True,
+        'tools.admission.on': True,
     },
     '/access': {
         'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
         'tools.response_headers.on': True,
         'tools.response_headers.headers': [('Content-Type', 'application/json')],
-    }
+        'tools.json_out.handler': json_handler,
+        'tools.request_metrics.on': True,
+        'tools.admission.on': True,
+    },
+    '/assets': {
+        'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
+        'tools.response_headers.on': True,
+        'tools.response_headers.headers': [('Content-Type', 'application/json')],
+        'tools.json_out.handler': json_handler,
+        'tools.request_metrics.on': True,
+        'tools.admission.on': True,
+    },
+    '/events': {
+        'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
+        'tools.response_headers.on': True,
+        'tools.response_headers.headers': [('Content-Type', 'application/json')],
+        'tools.json_out.handler': json_handler,
+        'tools.request_metrics.on': True,
+        'tools.admission.on': True,
+    },
+    '/metrics': {
+        'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
+        'tools.response_headers.on': True,
+        'tools.response_headers.headers': [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')],
+    },
 }
 
 def setup_cherry_tree(port=8080):
@@ -39,22 +83,85 @@ def setup_cherry_tree(port=8080):
     })
     service = CloudAssetManagerServer()
     service.upload = UploadAssetEndpoint()
+    service.upload.batch = BatchUploadAssetEndpoint()
+    service.upload.multipart = MultipartUploadEndpoint()
+    service.upload.multipart.complete = CompleteMultipartUploadEndpoint()
+    service.upload.multipart.abort = AbortMultipartUploadEndpoint()
     service.status = UpdateAssetStatusEndpoint()
+    service.status.batch = BatchUpdateAssetStatusEndpoint()
     service.access = AccessAssetEndpoint()
+    service.access.batch = BatchAccessAssetEndpoint()
+    service.assets = ListAssetsEndpoint()
+    service.assets.export = ExportAssetsEndpoint()
+    service.events = EventSources()
+    service.events.s3 = S3EventsEndpoint()
+    service.metrics = MetricsEndpoint()
     return service
 
-def startup_server():
+def startup_server(port=8080, listen_socket=None):
+    """
+    :param listen_socket: when run as a worker of startup_prefork_server, the
+    socket its supervisor is listening on, to accept connections from instead
+    of binding `port`.
+    """
     DatabaseAccessor.connect()
+    # Build the S3 client off the main thread, so the server can start listening
+    # in the meantime; a request that needs it first just waits for it
+    threading.Thread(target=S3Service.get_client, daemon=True).start()
     try:
-        # Three endpoints, defined here:
+        # Endpoints, defined here:
         # /api/upload
+        # /api/upload/batch
+        # /api/upload/multipart
+        # /api/upload/multipart/complete
+        # /api/upload/multipart/abort
         # /api/status
+        # /api/status/batch
         # /api/access
-        service = setup_cherry_tree()
-        print('Server running on port 8080')
+        # /api/access/batch
+        # /api/assets
+        # /api/assets/export
+        # /api/events/s3
+        # /api/metrics
+        service = setup_cherry_tree(port)
+        if listen_socket is None:
+            print(f'Server running on port {port}')
+        else:
+            use_listening_socket(listen_socket)
         cherrypy.quickstart(service, '/api', CHERRY_TREE_CONFIG)
     finally:
-        DatabaseAccessor.connection.close()
+        # Write out any queued status updates while there's still a database to write them to
+        status_write_coalescer.close()
+        DatabaseAccessor.disconnect()
+
+def startup_prefork_server(port=8080, workers=0):
+    """
+    Runs `workers` (by default, one per CPU core) server processes, all
+    accepting connections on `port`, under a PreforkSupervisor.
+
+    Everything is imported here, before forking, so workers start quickly
+    and share it. Each worker opens its own database connections and S3
+    client once it has started, as neither can be shared across processes;
+    its caches and metrics are its own too.
+    """
+    # Otherwise every worker would import it on its first request
+    import boto3  # noqa: F401
+    workers = workers or os.cpu_count()
+    with open_listening_socket(cherrypy.server.socket_host, port, cherrypy.server.socket_queue_size) as listen_socket:
+        print(f'Server running on port {port} with {workers} workers')
+        PreforkSupervisor(lambda sock: startup_server(port, sock), listen_socket, workers).run()
 
 if __name__ == '__main__':
-    startup_server()
+    parser = argparse.ArgumentParser(description='Runs the Cloud Asset Uploader API server.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Run this many server processes sharing the port (0 for one per CPU core), '
+        'under a supervisor that replaces any that exit and replaces all of them on SIGHUP'
+    )
+    args = parser.parse_args()
+    if args.workers is None:
+        startup_server(args.port)
+    else:
+        startup_prefork_server(args.port, args.workers)
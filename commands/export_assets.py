@@ -0,0 +1,48 @@
+"""
+Exports every asset as NDJSON, one JSON object per line, reading the table
+through a server-side cursor so memory use stays flat however big it is.
+
+Uses POSTGRESQL_LIBPQ_CONN_STR, from the root of the repo:
+    PYTHONPATH=. python -m commands.export_assets > assets.ndjson
+"""
+import argparse
+import sys
+from database.database_accessor import DatabaseAccessor
+from methods.asset_methods import export_assets, EXPORT_CURSOR_NAME, EXPORT_ITERSIZE
+
+def export(output, itersize=EXPORT_ITERSIZE):
+    """
+    Writes the export to the file-like `output`, fetching `itersize` rows at a
+    time. Expects DatabaseAccessor to be connected.
+    :return: the number of assets exported.
+    """
+    count = 0
+    with DatabaseAccessor.checkout() as c, c.cursor(name=EXPORT_CURSOR_NAME) as cursor:
+        cursor.itersize = itersize
+        for chunk in export_assets(cursor):
+            output.write(chunk)
+            count += chunk.count('\n')
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='file to write to, instead of stdout')
+    parser.add_argument(
+        '--itersize', type=int, default=EXPORT_ITERSIZE,
+        help='rows fetched from the database per round trip (default: ASSET_EXPORT_ITERSIZE, or %(default)s)'
+    )
+    args = parser.parse_args()
+
+    DatabaseAccessor.connect(min_size=1, max_size=1)
+    try:
+        if args.output:
+            with open(args.output, 'w') as output:
+                count = export(output, args.itersize)
+        else:
+            count = export(sys.stdout, args.itersize)
+    finally:
+        DatabaseAccessor.disconnect()
+    print(f'Exported {count} assets', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
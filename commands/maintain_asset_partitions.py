@@ -0,0 +1,97 @@
+"""
+Creates the asset table's monthly partitions ahead of time, and archives old
+ones. Run it at least monthly, e.g. from cron.
+
+Makes sure this month and the next --months-ahead months have partitions,
+moving any of their assets that landed in the default partition into them.
+With --retain-months, every partition whose month ended more than that many
+months before this one began is detached: its assets can no longer be found,
+their keys can be used again, and the partition is moved into the
+asset_archive schema, to be dumped and dropped at leisure (or dropped right
+away, with --drop). Uses POSTGRESQL_LIBPQ_CONN_STR, from the root of the repo:
+    PYTHONPATH=. python -m commands.maintain_asset_partitions --retain-months 12
+"""
+import argparse
+import json
+from datetime import datetime
+from database.asset_partition_dao import AssetPartitionDao
+from database.database_accessor import DatabaseAccessor
+
+DEFAULT_MONTHS_AHEAD = 3
+ARCHIVE_SCHEMA = 'asset_archive'
+
+def _add_months(month, months):
+    """
+    :param month: the first instant of a month.
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+def maintain(months_ahead=DEFAULT_MONTHS_AHEAD, retain_months=None, drop=False, now=None):
+    """
+    Creates and archives partitions as of `now` (defaulting to the current
+    time). Each partition is created or archived in its own transaction.
+    Expects DatabaseAccessor to be connected.
+
+    :param retain_months: the number of whole months before this one to keep
+    partitions for. Leave out to keep every partition.
+    :param drop: drop old partitions instead of archiving them.
+    :return: a dict of the names of the partitions `created` and `archived`
+    (or `dropped`), and the number of assets in the ones archived or dropped.
+    """
+    this_month = (now or datetime.now()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+        partitions = AssetPartitionDao.list_partitions(cursor)
+    default = next((partition for partition in partitions if partition.start is None), None)
+    existing = {partition.start for partition in partitions}
+
+    stats = {
+        'created': [],
+        'dropped' if drop else 'archived': [],
+        'assets_removed': 0,
+    }
+    for months in range(months_ahead + 1):
+        start = _add_months(this_month, months)
+        if start in existing:
+            continue
+        with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+            partition = AssetPartitionDao.create_partition(start, _add_months(start, 1), cursor, default)
+        stats['created'].append(partition.name)
+
+    if retain_months is not None:
+        cutoff = _add_months(this_month, -retain_months)
+        for partition in partitions:
+            if partition.end is None or partition.end > cutoff:
+                continue
+            with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+                stats['assets_removed'] += AssetPartitionDao.detach_partition(
+                    partition, cursor, archive_schema=None if drop else ARCHIVE_SCHEMA
+                )
+            stats['dropped' if drop else 'archived'].append(partition.name)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        '--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD,
+        help='months after this one to create partitions for (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--retain-months', type=int,
+        help='whole months before this one to keep partitions for (default: keep them all)'
+    )
+    parser.add_argument('--drop', action='store_true', help=f'drop old partitions instead of moving them into {ARCHIVE_SCHEMA}')
+    args = parser.parse_args()
+    if args.months_ahead < 0:
+        parser.error('Expected --months-ahead to be at least 0')
+    if args.retain_months is not None and args.retain_months < 0:
+        parser.error('Expected --retain-months to be at least 0')
+
+    DatabaseAccessor.connect(min_size=1, max_size=1)
+    try:
+        print(json.dumps(maintain(args.months_ahead, args.retain_months, args.drop)))
+    finally:
+        DatabaseAccessor.disconnect()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Marks pending assets complete when their object is in S3, for clients that
+uploaded successfully but never called PUT /api/status.
+
+Pages through the bucket's listing and updates the matching assets a chunk
+of keys at a time, checkpointing after every chunk so that an interrupted
+run resumes where it left off. Uses POSTGRESQL_LIBPQ_CONN_STR and
+S3_BUCKET_NAME, from the root of the repo:
+    PYTHONPATH=. python -m commands.reconcile_bucket
+"""
+import argparse
+import json
+from database.asset_dao import AssetDao, UploadedStatus
+from database.database_accessor import DatabaseAccessor
+from database.reconcile_checkpoint_dao import ReconcileCheckpointDao
+from external_services.s3_service import S3Service, DEFAULT_BUCKET, MAX_LIST_PAGE_SIZE
+
+DEFAULT_CHUNK_SIZE = 10000
+
+def _chunks(pages, chunk_size):
+    chunk = []
+    for keys in pages:
+        chunk.extend(keys)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def reconcile(
+    bucket_name=DEFAULT_BUCKET,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    page_size=MAX_LIST_PAGE_SIZE,
+    restart=False
+):
+    """
+    Reconciles `bucket_name`, resuming from its checkpoint unless `restart`
+    is set. Each chunk of keys is matched with a single update, committed
+    together with the checkpoint, so a chunk is never half-applied.
+    Expects DatabaseAccessor to be connected.
+
+    :param chunk_size: the (minimum) number of keys matched per update.
+    :param page_size: the number of keys listed per S3 request.
+    :return: a dict counting the objects `listed` and the assets `completed`,
+    and the key the run `started_after`, if it resumed.
+    """
+    with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+        if restart:
+            ReconcileCheckpointDao.delete(bucket_name, cursor)
+            start_after = None
+        else:
+            start_after = ReconcileCheckpointDao.get_start_after(bucket_name, cursor)
+
+    stats = {
+        'started_after': start_after,
+        'listed': 0,
+        'completed': 0,
+    }
+    pages = S3Service.list_object_keys(bucket_name, start_after=start_after, page_size=page_size)
+    for keys in _chunks(pages, chunk_size):
+        with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+            completed = AssetDao.update_uploaded_status_by_bucket_and_keys(
+                bucket_name,
+                keys,
+                UploadedStatus.PENDING.value,
+                UploadedStatus.COMPLETE.value,
+                cursor,
+            )
+            # S3 lists keys in order, so everything up to the chunk's last key is done
+            ReconcileCheckpointDao.save(bucket_name, keys[-1], cursor)
+        stats['listed'] += len(keys)
+        stats['completed'] += len(completed)
+
+    # Finished the listing, so the next run starts from the top again
+    with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+        ReconcileCheckpointDao.delete(bucket_name, cursor)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket', default=DEFAULT_BUCKET, help='defaults to S3_BUCKET_NAME')
+    parser.add_argument(
+        '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='keys matched per update (default: %(default)s)'
+    )
+    parser.add_argument('--restart', action='store_true', help='ignore any checkpoint and start from the top')
+    args = parser.parse_args()
+    if not args.bucket:
+        parser.error('Expected --bucket or an S3_BUCKET_NAME env var to be set')
+
+    DatabaseAccessor.connect(min_size=1, max_size=1)
+    try:
+        print(json.dumps(reconcile(args.bucket, chunk_size=args.chunk_size, restart=args.restart)))
+    finally:
+        DatabaseAccessor.disconnect()
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from itertools import product
+from database.statement import Statement
 
 class UploadedStatus(Enum):
     PENDING = 'pending'
@@ -13,10 +15,164 @@ class AssetRow:
     bucket: str
     object_key: str
     create_date: datetime
+    # The id of the asset's in-progress S3 multipart upload, if it has one
+    upload_id: str = None
 
-ALL_COLUMN_NAMES = ['id', 'uploaded_status', 'bucket', 'object_key', 'create_date']
+ALL_COLUMN_NAMES = ['id', 'uploaded_status', 'bucket', 'object_key', 'create_date', 'upload_id']
 NON_PK_COLS = ALL_COLUMN_NAMES[1:]
 
+# Every statement is built once, here, rather than on every call
+_COLUMNS = ",".join(ALL_COLUMN_NAMES)
+_ASSET_COLUMNS = ",".join(f'asset.{column}' for column in ALL_COLUMN_NAMES)
+_INSERT_ROW_PLACEHOLDER = f"(nextval('asset_id_seq'),{','.join(['%s'] * len(NON_PK_COLS))})"
+_INSERT_ROW_TYPES = ('varchar', 'varchar', 'varchar', 'timestamp', 'varchar')
+
+# The asset table is partitioned by month of create_date (see migration 0005).
+# Assets are found through asset_key, which has every asset's (id, create_date),
+# so only the partition holding the asset is scanned. A single asset is matched
+# on a subquery rather than joined, as otherwise the planner would match asset.id
+# against the id given, and look for it in every partition.
+_FIND_BY_ID = '(id, create_date) = (select id, create_date from asset_key where id = %s)'
+_FIND_BY_BUCKET_AND_KEY = (
+    '(id, create_date) = (select id, create_date from asset_key where bucket = %s and object_key = %s)'
+)
+_FROM_ASSET_KEY = 'asset_key join asset on asset.id = asset_key.id and asset.create_date = asset_key.create_date'
+_MATCHES_ASSET_KEY = 'asset.id = asset_key.id and asset.create_date = asset_key.create_date'
+
+def _insert_sql(row_placeholders, on_conflict=''):
+    """
+    Inserts rows into asset_key and then asset, in a single statement, skipping
+    rows whose asset_key insert was skipped `on_conflict`.
+    """
+    return (
+        f'with v({_COLUMNS}) as (values {row_placeholders}), '
+        'k as (insert into asset_key(bucket,object_key,id,create_date) '
+        f'select bucket,object_key,id,create_date from v{on_conflict} returning id) '
+        f'insert into asset({_COLUMNS}) select {_COLUMNS} from v join k using (id) '
+        f'returning {_COLUMNS}'
+    )
+
+GET_BY_ID = Statement(
+    'asset_get_by_id',
+    f'select {_COLUMNS} from asset '
+    f'where {_FIND_BY_ID}',
+    ('bigint',),
+)
+GET_BY_IDS = Statement(
+    'asset_get_by_ids',
+    f'select {_ASSET_COLUMNS} from {_FROM_ASSET_KEY} '
+    'where asset_key.id = any(%s)',
+    ('bigint[]',),
+)
+GET_BY_BUCKET_AND_KEY = Statement(
+    'asset_get_by_bucket_and_key',
+    f'select {_COLUMNS} from asset '
+    f'where {_FIND_BY_BUCKET_AND_KEY}',
+    ('varchar', 'varchar'),
+)
+GET_BY_BUCKET_AND_KEY_FOR_UPDATE = Statement(
+    'asset_get_by_bucket_and_key_for_update',
+    f'select {_COLUMNS} from asset '
+    f'where {_FIND_BY_BUCKET_AND_KEY} '
+    'for update',
+    ('varchar', 'varchar'),
+)
+GET_BY_BUCKET_AND_KEYS = Statement(
+    'asset_get_by_bucket_and_keys',
+    f'select {_ASSET_COLUMNS} from {_FROM_ASSET_KEY} '
+    'where asset_key.bucket = %s and asset_key.object_key = any(%s)',
+    ('varchar', 'varchar[]'),
+)
+# Raises a unique violation of bucket_object_key_uq if the key is taken
+INSERT_ONE = Statement(
+    'asset_insert_one',
+    _insert_sql(_INSERT_ROW_PLACEHOLDER),
+    _INSERT_ROW_TYPES,
+)
+# Returns nothing if the key is taken, for insert_or_get to fetch the existing asset instead
+INSERT_OR_GET = Statement(
+    'asset_insert_or_get',
+    _insert_sql(_INSERT_ROW_PLACEHOLDER, ' on conflict (bucket, object_key) do nothing'),
+    _INSERT_ROW_TYPES,
+)
+UPDATE_UPLOADED_STATUS = Statement(
+    'asset_update_uploaded_status',
+    f'update asset set uploaded_status = %s where {_FIND_BY_ID} '
+    f'returning {_COLUMNS}',
+    ('varchar', 'bigint'),
+)
+# Leaves alone assets that aren't in `from_status`, or that have a multipart upload in progress
+UPDATE_UPLOADED_STATUS_BY_BUCKET_AND_KEYS = Statement(
+    'asset_update_uploaded_status_by_bucket_and_keys',
+    'update asset set uploaded_status = %s from asset_key '
+    f'where asset_key.bucket = %s and asset_key.object_key = any(%s) and {_MATCHES_ASSET_KEY} '
+    'and asset.uploaded_status = %s and asset.upload_id is null '
+    'returning asset.id',
+    ('varchar', 'varchar', 'varchar[]', 'varchar'),
+)
+UPDATE_UPLOADED_STATUS_BY_BUCKET_KEY_PAIRS = Statement(
+    'asset_update_uploaded_status_by_bucket_key_pairs',
+    'update asset set uploaded_status = %s '
+    'from unnest(%s, %s) as v(bucket, object_key) '
+    'join asset_key on asset_key.bucket = v.bucket and asset_key.object_key = v.object_key '
+    f'where {_MATCHES_ASSET_KEY} '
+    'and asset.uploaded_status = %s and asset.upload_id is null '
+    'returning asset.id',
+    ('varchar', 'varchar[]', 'varchar[]', 'varchar'),
+)
+SET_UPLOAD_ID = Statement(
+    'asset_set_upload_id',
+    f'update asset set upload_id = %s where {_FIND_BY_ID} '
+    f'returning {_COLUMNS}',
+    ('varchar', 'bigint'),
+)
+# Only touches the asset if `upload_id` is still its upload, so a stale request can't clobber a newer one
+FINISH_UPLOAD = Statement(
+    'asset_finish_upload',
+    f'update asset set uploaded_status = %s, upload_id = null where {_FIND_BY_ID} and upload_id = %s '
+    f'returning {_COLUMNS}',
+    ('varchar', 'bigint', 'varchar'),
+)
+# Never prepared: it runs on server-side cursors, which can only DECLARE a plain query
+SELECT_ALL = Statement(
+    'asset_select_all',
+    f'select {_COLUMNS} from asset',
+)
+
+# Optional filters for listing assets, in the order they appear in the where clause.
+# The last one is the keyset: the (create_date, id) of the previous page's last row.
+_LIST_PAGE_FILTERS = (
+    ('uploaded_status = %s', ('varchar',)),
+    ('bucket = %s', ('varchar',)),
+    ('create_date >= %s', ('timestamp',)),
+    ('create_date < %s', ('timestamp',)),
+    ('(create_date, id) > (%s, %s)', ('timestamp', 'bigint')),
+)
+
+def _list_page_statement(present):
+    conditions = [condition for (condition, _), used in zip(_LIST_PAGE_FILTERS, present) if used]
+    param_types = [
+        param_type
+        for (_, types), used in zip(_LIST_PAGE_FILTERS, present) if used
+        for param_type in types
+    ]
+    where = f'where {" and ".join(conditions)} ' if conditions else ''
+    return Statement(
+        'asset_list_page_' + ''.join('1' if used else '0' for used in present),
+        f'select {_COLUMNS} from asset '
+        f'{where}'
+        'order by create_date, id limit %s',
+        (*param_types, 'integer'),
+    )
+
+# One statement for every combination of filters, so each can be prepared.
+# Ordering by (create_date, id) makes every page an index range scan (see migration 0003), and
+# filtering on create_date only scans the partitions in range.
+LIST_PAGE = {
+    present: _list_page_statement(present)
+    for present in product((False, True), repeat=len(_LIST_PAGE_FILTERS))
+}
+
 class AssetDao:
     def _convert_to_asset_row(result_row):
         return AssetRow(*result_row)
@@ -28,15 +184,21 @@ class AssetDao:
         Returns an AssetRow if it exists.
         Returns None if the asset does not exist.
         """
-        cursor.execute(
-            f'select {",".join(ALL_COLUMN_NAMES)} from asset '
-            'where id = %s',
-            (asset_id,)
-        )
+        GET_BY_ID.execute(cursor, (asset_id,))
         result = cursor.fetchone()
         if result is None:
             return None
         return AssetDao._convert_to_asset_row(result)
+
+    @staticmethod
+    def get_by_ids(asset_ids, cursor):
+        """
+        Fetch every asset whose ID is one of `asset_ids`.
+        Returns a list of AssetRows, in no particular order. IDs without an
+        asset are simply absent from the result.
+        """
+        GET_BY_IDS.execute(cursor, (list(asset_ids),))
+        return [AssetDao._convert_to_asset_row(result) for result in cursor.fetchall()]
     
     @staticmethod
     def get_by_bucket_and_key(
@@ -49,16 +211,38 @@ class AssetDao:
         Returns an AssetRow if it exists.
         Returns None if the asset does not exist.
         """
-        cursor.execute(
-            f'select {",".join(ALL_COLUMN_NAMES)} from asset '
-            'where bucket = %s and object_key = %s',
-            (bucket, object_key)
-        )
+        GET_BY_BUCKET_AND_KEY.execute(cursor, (bucket, object_key))
         result = cursor.fetchone()
         if result is None:
             return None
         return AssetDao._convert_to_asset_row(result)
+
+    @staticmethod
+    def get_by_bucket_and_keys(
+        bucket,
+        object_keys,
+        cursor
+    ):
+        """
+        Fetch every asset in `bucket` whose object key is one of `object_keys`.
+        Returns a list of AssetRows, in no particular order. Keys without an
+        asset are simply absent from the result.
+        """
+        GET_BY_BUCKET_AND_KEYS.execute(cursor, (bucket, list(object_keys)))
+        return [AssetDao._convert_to_asset_row(result) for result in cursor.fetchall()]
     
+    @staticmethod
+    def iter_all(cursor):
+        """
+        Fetch every asset, in no particular order.
+        Returns a generator of AssetRows. Pass a named (server-side) cursor to
+        stream the table `cursor.itersize` rows at a time instead of loading
+        all of it into memory.
+        """
+        SELECT_ALL.execute(cursor, ())
+        for result in cursor:
+            yield AssetDao._convert_to_asset_row(result)
+
     @staticmethod
     def insert_one(asset_row, cursor):
         """
@@ -66,22 +250,217 @@ class AssetDao:
         Ignores any id that is set on asset_row.
         Returns the created AssetRow (with id populated) if successful.
         """
-
-        cursor.execute(
-            f'insert into asset({",".join(NON_PK_COLS)}) values('
-            f'{",".join(["%s"] * len(NON_PK_COLS))}) returning {",".join(ALL_COLUMN_NAMES)}',
-            (asset_row.uploaded_status, asset_row.bucket, asset_row.object_key, asset_row.create_date)
+        INSERT_ONE.execute(
+            cursor,
+            (asset_row.uploaded_status, asset_row.bucket, asset_row.object_key, asset_row.create_date, asset_row.upload_id)
         )
         result = cursor.fetchone()
         return AssetDao._convert_to_asset_row(result)
+
+    @staticmethod
+    def insert_or_get(asset_row, cursor):
+        """
+        Insert a new asset row, or fetch the existing one if an asset with the
+        same bucket and object key already exists.
+        Ignores any id that is set on asset_row.
+        Returns the created or existing AssetRow. An existing row keeps its
+        uploaded_status, so callers can tell whether it was already complete.
+
+        Unlike get_by_bucket_and_key followed by insert_one, this cannot lose
+        a race with a concurrent insert of the same key: the insert waits for
+        the other one to commit before skipping the key, and the existing row
+        is only fetched after that.
+        Either way, the row is left locked until the transaction ends, so
+        concurrent calls for the same key run one after the other.
+        Never returns None: should the existing row be deleted between the
+        insert and the fetch (e.g. by an archived partition), the insert is
+        tried again.
+        """
+        while True:
+            INSERT_OR_GET.execute(cursor, (
+                asset_row.uploaded_status,
+                asset_row.bucket,
+                asset_row.object_key,
+                asset_row.create_date,
+                asset_row.upload_id,
+            ))
+            result = cursor.fetchone()
+            if result is None:
+                GET_BY_BUCKET_AND_KEY_FOR_UPDATE.execute(cursor, (asset_row.bucket, asset_row.object_key))
+                result = cursor.fetchone()
+            if result is not None:
+                return AssetDao._convert_to_asset_row(result)
+
+    @staticmethod
+    def insert_many(asset_rows, cursor):
+        """
+        Insert new asset rows with a single multi-row insert.
+        Ignores any id that is set on the rows.
+        Rows whose bucket and object key already exist are skipped rather than
+        raising, so only the AssetRows actually created are returned.
+        """
+        if not asset_rows:
+            return []
+
+        # The SQL depends on the number of rows, so this one is never prepared
+        Statement(
+            'asset_insert_many',
+            _insert_sql(
+                ",".join([_INSERT_ROW_PLACEHOLDER] * len(asset_rows)),
+                ' on conflict (bucket, object_key) do nothing',
+            ),
+        ).execute(
+            cursor,
+            tuple(
+                value
+                for asset_row in asset_rows
+                for value in (
+                    asset_row.uploaded_status,
+                    asset_row.bucket,
+                    asset_row.object_key,
+                    asset_row.create_date,
+                    asset_row.upload_id,
+                )
+            )
+        )
+        return [AssetDao._convert_to_asset_row(result) for result in cursor.fetchall()]
     
     @staticmethod
     def update_uploaded_status(asset_id, new_status, cursor):
         """
         Updates the asset with id `asset_id` to have the status `new_status`
+        Returns the updated AssetRow if it exists.
+        Returns None if the asset does not exist.
+        """
+        UPDATE_UPLOADED_STATUS.execute(cursor, (new_status, asset_id))
+        result = cursor.fetchone()
+        if result is None:
+            return None
+        return AssetDao._convert_to_asset_row(result)
+
+    @staticmethod
+    def update_uploaded_statuses(updates, cursor):
+        """
+        Applies many status updates with a single update statement.
+
+        :param updates: a list of (asset_id, new_status) tuples. Each asset_id
+        should appear at most once.
+        :return: the ids of the assets that were updated. Ids that were not
+        returned do not exist.
+        """
+        if not updates:
+            return []
+
+        # The SQL depends on the number of updates, so this one is never prepared
+        Statement(
+            'asset_update_uploaded_statuses',
+            'update asset set uploaded_status = v.uploaded_status from (values '
+            f'{",".join(["(%s,%s)"] * len(updates))}'
+            ') as v(id, uploaded_status) join asset_key on asset_key.id = v.id '
+            f'where {_MATCHES_ASSET_KEY} returning asset.id',
+        ).execute(
+            cursor,
+            tuple(value for update in updates for value in update)
+        )
+        return [result[0] for result in cursor.fetchall()]
+
+    @staticmethod
+    def update_uploaded_status_by_bucket_and_keys(bucket, object_keys, from_status, new_status, cursor):
+        """
+        Updates every asset in `bucket` whose object key is one of `object_keys`
+        and whose status is `from_status` to have the status `new_status`, with a
+        single update statement. Assets with a multipart upload in progress are
+        left alone.
+        Returns the ids of the assets that were updated.
         """
-        cursor.execute(
-            'update asset set uploaded_status = %s where id = %s',
-            (new_status, asset_id)
+        UPDATE_UPLOADED_STATUS_BY_BUCKET_AND_KEYS.execute(
+            cursor,
+            (new_status, bucket, list(object_keys), from_status)
         )
+        return [result[0] for result in cursor.fetchall()]
+
+    @staticmethod
+    def update_uploaded_status_by_bucket_key_pairs(bucket_key_pairs, from_status, new_status, cursor):
+        """
+        Like update_uploaded_status_by_bucket_and_keys, but for objects that
+        may be in different buckets.
+
+        :param bucket_key_pairs: a list of (bucket, object_key) tuples, each
+        appearing at most once.
+        Returns the ids of the assets that were updated.
+        """
+        if not bucket_key_pairs:
+            return []
+
+        UPDATE_UPLOADED_STATUS_BY_BUCKET_KEY_PAIRS.execute(
+            cursor,
+            (
+                new_status,
+                [bucket for bucket, _ in bucket_key_pairs],
+                [object_key for _, object_key in bucket_key_pairs],
+                from_status,
+            )
+        )
+        return [result[0] for result in cursor.fetchall()]
+
+    @staticmethod
+    def set_upload_id(asset_id, upload_id, cursor):
+        """
+        Records `upload_id` as the multipart upload of the asset with id `asset_id`.
+        Returns the updated AssetRow if it exists.
+        Returns None if the asset does not exist.
+        """
+        SET_UPLOAD_ID.execute(cursor, (upload_id, asset_id))
+        result = cursor.fetchone()
+        if result is None:
+            return None
+        return AssetDao._convert_to_asset_row(result)
 
+    @staticmethod
+    def finish_upload(asset_id, upload_id, new_status, cursor):
+        """
+        Clears the multipart upload `upload_id` from the asset with id `asset_id`,
+        updating its status to `new_status`.
+        Returns the updated AssetRow if the asset exists and `upload_id` is its upload.
+        Returns None otherwise.
+        """
+        FINISH_UPLOAD.execute(cursor, (new_status, asset_id, upload_id))
+        result = cursor.fetchone()
+        if result is None:
+            return None
+        return AssetDao._convert_to_asset_row(result)
+
+    @staticmethod
+    def list_page(
+        limit,
+        cursor,
+        uploaded_status=None,
+        bucket=None,
+        created_after=None,
+        created_before=None,
+        after=None
+    ):
+        """
+        Fetch up to `limit` assets ordered by (create_date, id), optionally only
+        those with `uploaded_status`, in `bucket`, or created at or after
+        `created_after` and before `created_before`.
+
+        :param after: the (create_date, id) of the last asset of the previous
+        page, to fetch the page that follows it. Leave out for the first page.
+        Returns a list of AssetRows.
+        """
+        filter_params = (
+            (uploaded_status,),
+            (bucket,),
+            (created_after,),
+            (created_before,),
+            after,
+        )
+        present = tuple(params is not None and params[0] is not None for params in filter_params)
+        params = tuple(
+            param
+            for params, used in zip(filter_params, present) if used
+            for param in params
+        )
+        LIST_PAGE[present].execute(cursor, (*params, limit))
+        return [AssetDao._convert_to_asset_row(result) for result in cursor.fetchall()]
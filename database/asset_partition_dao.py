@@ -0,0 +1,116 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from database.statement import Statement
+
+@dataclass
+class AssetPartition:
+    name: str
+    # The partition holds assets created from `start` up to (but not including) `end`.
+    # Both are None for the default partition, which holds assets no other partition does.
+    start: datetime = None
+    end: datetime = None
+
+# Maintenance runs these rarely, so none of them are prepared
+LIST = Statement(
+    'asset_partition_list',
+    'select child.relname, pg_get_expr(child.relpartbound, child.oid) '
+    'from pg_inherits join pg_class child on child.oid = pg_inherits.inhrelid '
+    "where pg_inherits.inhparent = 'asset'::regclass",
+)
+
+_RANGE_BOUND = re.compile(r"FOR VALUES FROM \('([^']*)'\) TO \('([^']*)'\)")
+
+def _quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+class AssetPartitionDao:
+    """
+    Manages the asset table's monthly partitions (see migration 0005).
+    """
+    @staticmethod
+    def list_partitions(cursor):
+        """
+        Returns a list of the asset table's AssetPartitions, ordered by start,
+        with the default partition last.
+        """
+        LIST.execute(cursor, ())
+        partitions = []
+        for name, bound in cursor.fetchall():
+            match = _RANGE_BOUND.match(bound)
+            if match is None:
+                partitions.append(AssetPartition(name))
+            else:
+                partitions.append(AssetPartition(
+                    name,
+                    datetime.fromisoformat(match.group(1)),
+                    datetime.fromisoformat(match.group(2)),
+                ))
+        return sorted(partitions, key=lambda partition: (partition.start is None, partition.start or datetime.min))
+
+    @staticmethod
+    def create_partition(start, end, cursor, default=None):
+        """
+        Creates a partition for assets created from `start` up to `end`, named
+        after the month of `start`.
+
+        :param default: the default partition, if there is one. Any of its
+        assets in the new partition's range are moved into it, locking the
+        default partition against writes until the transaction ends.
+        Returns the created AssetPartition.
+        """
+        partition = AssetPartition(f'asset_{start:%Y_%m}', start, end)
+        name = _quote_ident(partition.name)
+        if default is None:
+            Statement(
+                'asset_partition_create',
+                f'create table {name} partition of asset for values from (%s) to (%s)',
+            ).execute(cursor, (start, end))
+            return partition
+
+        default_name = _quote_ident(default.name)
+        Statement(
+            'asset_partition_lock_default',
+            f'lock table {default_name} in exclusive mode',
+        ).execute(cursor, ())
+        Statement(
+            'asset_partition_create_detached',
+            f'create table {name} (like asset including defaults including constraints)',
+        ).execute(cursor, ())
+        Statement(
+            'asset_partition_move_from_default',
+            f'with moved as (delete from {default_name} where create_date >= %s and create_date < %s returning *) '
+            f'insert into {name} select * from moved',
+        ).execute(cursor, (start, end))
+        Statement(
+            'asset_partition_attach',
+            f'alter table asset attach partition {name} for values from (%s) to (%s)',
+        ).execute(cursor, (start, end))
+        return partition
+
+    @staticmethod
+    def detach_partition(partition, cursor, archive_schema=None):
+        """
+        Detaches `partition` from the asset table and deletes its assets'
+        asset_key rows, so they can no longer be found and their keys can be
+        used again. The partition itself is moved into `archive_schema`
+        (created if need be), or dropped if archive_schema is None.
+        Returns the number of assets detached.
+        """
+        name = _quote_ident(partition.name)
+        Statement(
+            'asset_partition_detach',
+            f'alter table asset detach partition {name}',
+        ).execute(cursor, ())
+        Statement(
+            'asset_partition_delete_keys',
+            f'delete from asset_key using {name} where asset_key.id = {name}.id',
+        ).execute(cursor, ())
+        detached = cursor.rowcount
+        if archive_schema is None:
+            Statement('asset_partition_drop', f'drop table {name}').execute(cursor, ())
+        else:
+            schema = _quote_ident(archive_schema)
+            Statement('asset_partition_create_archive', f'create schema if not exists {schema}').execute(cursor, ())
+            Statement('asset_partition_archive', f'alter table {name} set schema {schema}').execute(cursor, ())
+        return detached
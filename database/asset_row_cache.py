@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from database.asset_dao import AssetDao, UploadedStatus
+from database.database_accessor import DatabaseAccessor
+
+# Set ASSET_ROW_CACHE_MAX_SIZE to 0 to turn the cache off
+MAX_SIZE = 'ASSET_ROW_CACHE_MAX_SIZE'
+TTL = 'ASSET_ROW_CACHE_TTL_SECONDS'
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_TTL = 60 # seconds
+
+class AssetRowCache:
+    """
+    An in-process, read-through cache in front of AssetDao.get_by_id.
+
+    Only `complete` rows are cached: those are the only ones the access path can
+    hand out, and nothing changes them short of an explicit status update, which
+    must call `invalidate_after_commit`. A row read before an invalidation but
+    put after it is dropped rather than cached, and so is one read from a
+    replica, which may not have replayed the update yet. Entries also expire after `ttl`
+    seconds, which bounds how long another process's update can go unnoticed.
+    The least recently used entry is evicted once the cache holds `max_size` rows.
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # asset id -> (AssetRow, expires at)
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        # Bumped by every invalidation, so reads that raced one aren't cached
+        self._generation = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_size=int(os.getenv(MAX_SIZE, DEFAULT_MAX_SIZE)),
+            ttl=float(os.getenv(TTL, DEFAULT_TTL)),
+        )
+
+    def get_by_id(self, asset_id, cursor, populate=True):
+        """
+        Same contract as AssetDao.get_by_id, served from the cache when possible.
+
+        :param populate: whether a row read from the database may be cached.
+        Pass False when `cursor` is on a read replica.
+        """
+        asset = self._get(asset_id)
+        if asset is not None:
+            return asset
+
+        generation = self._generation
+        asset = AssetDao.get_by_id(asset_id, cursor)
+        if asset is not None and populate:
+            self._put(asset, generation)
+        return asset
+
+    def get_by_ids(self, asset_ids, cursor, populate=True):
+        """
+        Same contract as AssetDao.get_by_ids, fetching only the ids that
+        aren't cached, with a single query. `populate` is as for get_by_id.
+        """
+        assets = []
+        missing = set()
+        for asset_id in asset_ids:
+            asset = self._get(asset_id)
+            if asset is None:
+                missing.add(asset_id)
+            else:
+                assets.append(asset)
+
+        if missing:
+            generation = self._generation
+            for asset in AssetDao.get_by_ids(missing, cursor):
+                if populate:
+                    self._put(asset, generation)
+                assets.append(asset)
+        return assets
+
+    def invalidate(self, asset_id):
+        self.invalidate_many((asset_id,))
+
+    def invalidate_many(self, asset_ids):
+        with self._lock:
+            self._generation += 1
+            for asset_id in asset_ids:
+                if self._entries.pop(asset_id, None) is not None:
+                    self._invalidations += 1
+
+    def invalidate_after_commit(self, asset_ids, cursor):
+        """
+        Invalidates `asset_ids` once the transaction `cursor` is in commits.
+        Invalidating any sooner would let a read in between cache the old row.
+        """
+        asset_ids = list(asset_ids)
+        DatabaseAccessor.after_commit(cursor, lambda: self.invalidate_many(asset_ids))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+    def _get(self, asset_id):
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(asset_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            asset, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[asset_id]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(asset_id)
+            self._hits += 1
+            return asset
+
+    def _put(self, asset, generation):
+        if self.max_size <= 0 or asset.uploaded_status != UploadedStatus.COMPLETE.value:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[asset.id] = (asset, time.monotonic() + self.ttl)
+            self._entries.move_to_end(asset.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+asset_row_cache = AssetRowCache.from_env()
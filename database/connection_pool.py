@@ -0,0 +1,263 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeoutException(Exception):
+    pass
+
+class PoolClosedException(Exception):
+    pass
+
+class _PooledConnection:
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created_at = now
+        self.last_used_at = now
+        self.uses = 0
+
+class ConnectionPool:
+    """
+    A thread-safe pool of psycopg2 connections.
+
+    Connections are opened lazily up to `max_size`, handed out one per caller,
+    and returned to the pool when the caller is done with them. A caller that
+    finds the pool exhausted waits up to `checkout_timeout` seconds for a
+    connection to be returned before a PoolTimeoutException is raised.
+
+    :param connect: a zero-argument callable returning a new psycopg2 connection.
+    :param min_size: the number of connections opened up front.
+    :param max_size: the maximum number of connections open at once.
+    :param checkout_timeout: seconds to wait for a free connection.
+    :param max_uses: recycle a connection after this many checkouts (None for no limit).
+    :param max_age: recycle a connection after it has been open this many seconds
+    (None for no limit).
+    :param health_check_after: ping a connection on checkout if it has sat idle
+    for at least this many seconds (None to never ping).
+    """
+    def __init__(
+        self,
+        connect,
+        min_size=1,
+        max_size=10,
+        checkout_timeout=30.0,
+        max_uses=None,
+        max_age=None,
+        health_check_after=30.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(
+                f'Invalid pool size: min_size={min_size}, max_size={max_size}'
+            )
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.health_check_after = health_check_after
+
+        self._connect = connect
+        self._condition = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+
+        self._waiters = 0
+        self._checkouts = 0
+        self._checkout_timeouts = 0
+        self._checkout_wait_total = 0.0
+        self._checkout_wait_max = 0.0
+        self._opened = 0
+        self._recycled = 0
+        self._health_check_failures = 0
+
+        for _ in range(min_size):
+            with self._condition:
+                self._size += 1
+            self._idle.append(self._open())
+
+    @contextmanager
+    def connection(self):
+        """
+        Check a connection out of the pool for the duration of the `with` block.
+
+        The connection is returned to the pool afterwards. Any transaction
+        left open on it is rolled back, and connections that look broken are
+        closed instead of being reused.
+        """
+        pooled = self._checkout()
+        discard = False
+        try:
+            yield pooled.connection
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self._checkin(pooled, discard)
+
+    def close(self):
+        """
+        Close every idle connection and refuse further checkouts.
+        Connections currently checked out are closed as they are returned.
+        """
+        with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled.connection)
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool's size and checkout metrics.
+        """
+        with self._condition:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiters': self._waiters,
+                'checkouts': self._checkouts,
+                'checkout_timeouts': self._checkout_timeouts,
+                'checkout_wait_seconds_total': self._checkout_wait_total,
+                'checkout_wait_seconds_max': self._checkout_wait_max,
+                'connections_opened': self._opened,
+                'connections_recycled': self._recycled,
+                'health_check_failures': self._health_check_failures,
+            }
+
+    def _checkout(self):
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        pooled = None
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolClosedException('Connection pool is closed')
+                if self._idle:
+                    # LIFO, so a quiet server keeps reusing its warmest connections
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve a slot now, open the connection outside the lock
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._checkout_timeouts += 1
+                    raise PoolTimeoutException(
+                        f'Timed out after {self.checkout_timeout}s waiting for a database connection'
+                    )
+                self._waiters += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+        try:
+            pooled = self._open() if pooled is None else self._validate(pooled)
+        except Exception:
+            self._release_slot()
+            raise
+
+        waited = time.monotonic() - started
+        with self._condition:
+            self._checkouts += 1
+            self._checkout_wait_total += waited
+            self._checkout_wait_max = max(self._checkout_wait_max, waited)
+        pooled.uses += 1
+        return pooled
+
+    def _checkin(self, pooled, discard=False):
+        connection = pooled.connection
+        if not discard and not connection.closed:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+        now = time.monotonic()
+        if not discard and self._is_expired(pooled, now):
+            discard = True
+            with self._condition:
+                self._recycled += 1
+
+        if discard or connection.closed:
+            self._close_quietly(connection)
+            self._release_slot()
+            return
+
+        pooled.last_used_at = now
+        with self._condition:
+            if not self._closed:
+                self._idle.append(pooled)
+                self._condition.notify()
+                return
+        self._close_quietly(connection)
+        self._release_slot()
+
+    def _validate(self, pooled):
+        """
+        Make sure an idle connection is still usable before handing it out,
+        replacing it with a fresh one if it is not.
+        """
+        now = time.monotonic()
+        if pooled.connection.closed:
+            return self._replace(pooled)
+        if self._is_expired(pooled, now):
+            with self._condition:
+                self._recycled += 1
+            return self._replace(pooled)
+        if (
+            self.health_check_after is not None
+            and now - pooled.last_used_at >= self.health_check_after
+        ):
+            try:
+                with pooled.connection.cursor() as cursor:
+                    cursor.execute('select 1')
+                pooled.connection.rollback()
+            except psycopg2.Error:
+                with self._condition:
+                    self._health_check_failures += 1
+                return self._replace(pooled)
+        return pooled
+
+    def _is_expired(self, pooled, now):
+        if self.max_uses is not None and pooled.uses >= self.max_uses:
+            return True
+        if self.max_age is not None and now - pooled.created_at >= self.max_age:
+            return True
+        return False
+
+    def _replace(self, pooled):
+        self._close_quietly(pooled.connection)
+        return self._open()
+
+    def _open(self):
+        connection = self._connect()
+        with self._condition:
+            self._opened += 1
+        return _PooledConnection(connection, time.monotonic())
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
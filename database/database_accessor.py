@@ -1,29 +1,162 @@
 import psycopg2
 import os
+from contextlib import contextmanager, ExitStack
+from database.connection_pool import ConnectionPool
+from database.replica_set import ReplicaSet
+from database.statement import PreparingConnection
+from metrics.request_metrics import request_metrics
 
 CONNECTION_ARGS = 'POSTGRESQL_LIBPQ_CONN_STR'
 TEST_DB_CONN_ARGS = 'host=localhost port=5432 dbname=test_db'
+# Read replicas' connection strings, separated by semicolons, for checkout(readonly=True)
+REPLICA_CONNECTION_ARGS = 'POSTGRESQL_REPLICA_LIBPQ_CONN_STRS'
+REPLICA_MAX_LAG = 'POSTGRESQL_REPLICA_MAX_LAG_SECONDS'
+REPLICA_LAG_CHECK_INTERVAL = 'POSTGRESQL_REPLICA_LAG_CHECK_INTERVAL'
+REPLICA_RETRY_AFTER = 'POSTGRESQL_REPLICA_RETRY_AFTER'
+DEFAULT_REPLICA_MAX_LAG = 5.0 # seconds
+DEFAULT_REPLICA_LAG_CHECK_INTERVAL = 1.0 # seconds
+DEFAULT_REPLICA_RETRY_AFTER = 10.0 # seconds
+
+# Pool settings, each of which can be overridden with an env var of the same name
+POOL_MIN_SIZE = 'POSTGRESQL_POOL_MIN_SIZE'
+POOL_MAX_SIZE = 'POSTGRESQL_POOL_MAX_SIZE'
+POOL_CHECKOUT_TIMEOUT = 'POSTGRESQL_POOL_CHECKOUT_TIMEOUT'
+POOL_MAX_USES = 'POSTGRESQL_POOL_MAX_USES'
+POOL_MAX_AGE = 'POSTGRESQL_POOL_MAX_AGE'
+POOL_HEALTH_CHECK_AFTER = 'POSTGRESQL_POOL_HEALTH_CHECK_AFTER'
+
+POOL_DEFAULTS = {
+    POOL_MIN_SIZE: 1,
+    # Matches CherryPy's default server.thread_pool, so no worker thread ever waits
+    POOL_MAX_SIZE: 10,
+    POOL_CHECKOUT_TIMEOUT: 30.0, # seconds
+    POOL_MAX_USES: 50000,
+    POOL_MAX_AGE: 60 * 60, # 1 hour
+    POOL_HEALTH_CHECK_AFTER: 30.0, # seconds idle
+}
+
+def _pool_setting(name):
+    default = POOL_DEFAULTS[name]
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return type(default)(value)
+
+def _connect(connection_string):
+    return psycopg2.connect(connection_string, connection_factory=PreparingConnection)
 
 class DatabaseAccessor:
-    connection = None
+    pool = None
+    replicas = None
     def __init__(self):
         raise Exception('Not to be instantiated')
-    
+
     @classmethod
-    def connect(cls, testing=False):
+    def connect(cls, testing=False, replica_connection_strings=None, **pool_options):
+        """
+        Opens the connection pool shared by every request thread, and one
+        for each read replica.
+
+        :param testing: connect to the local test database instead of POSTGRESQL_LIBPQ_CONN_STR.
+        :param replica_connection_strings: the read replicas to use, instead of
+        those in POSTGRESQL_REPLICA_LIBPQ_CONN_STRS.
+        :param pool_options: overrides for the ConnectionPool keyword arguments;
+        anything not given falls back to its POSTGRESQL_POOL_* env var, then to POOL_DEFAULTS.
+        """
         connection_string = TEST_DB_CONN_ARGS if testing else os.getenv(CONNECTION_ARGS)
         if not connection_string:
             raise RuntimeError('Expected a POSTGRESQL_LIBPQ_CONN_STR env var to be set')
-        if cls.connection is not None:
+        if cls.pool is not None:
             # Don't allow reconnects...should probably warn here,
             # as it means a developer made a mistake
             return
-        cls.connection = psycopg2.connect(connection_string)
-        
+        options = {
+            'min_size': _pool_setting(POOL_MIN_SIZE),
+            'max_size': _pool_setting(POOL_MAX_SIZE),
+            'checkout_timeout': _pool_setting(POOL_CHECKOUT_TIMEOUT),
+            'max_uses': _pool_setting(POOL_MAX_USES) or None,
+            'max_age': _pool_setting(POOL_MAX_AGE) or None,
+            'health_check_after': _pool_setting(POOL_HEALTH_CHECK_AFTER),
+            **pool_options,
+        }
+        cls.pool = ConnectionPool(lambda: _connect(connection_string), **options)
+        if replica_connection_strings is None:
+            replica_connection_strings = os.getenv(REPLICA_CONNECTION_ARGS, '').split(';')
+        replica_connection_strings = [part.strip() for part in replica_connection_strings if part.strip()]
+        if replica_connection_strings:
+            cls.replicas = ReplicaSet.connect(
+                replica_connection_strings,
+                _connect,
+                options,
+                max_lag=float(os.getenv(REPLICA_MAX_LAG, DEFAULT_REPLICA_MAX_LAG)),
+                lag_check_interval=float(os.getenv(REPLICA_LAG_CHECK_INTERVAL, DEFAULT_REPLICA_LAG_CHECK_INTERVAL)),
+                retry_after=float(os.getenv(REPLICA_RETRY_AFTER, DEFAULT_REPLICA_RETRY_AFTER)),
+            )
+
     @classmethod
-    def get_connection(cls):
-        if not cls.connection:
+    def disconnect(cls):
+        if cls.pool is not None:
+            cls.pool.close()
+            cls.pool = None
+        if cls.replicas is not None:
+            cls.replicas.close()
+            cls.replicas = None
+
+    @classmethod
+    def get_pool(cls):
+        if not cls.pool:
             raise RuntimeError(
-                'Could not find database connection. Did you call connect() first?'
+                'Could not find database connection pool. Did you call connect() first?'
             )
-        return cls.connection
+        return cls.pool
+
+    @classmethod
+    @contextmanager
+    def checkout(cls, readonly=False):
+        """
+        Checks a connection out of the pool and runs the `with` block in a
+        transaction on it, which is committed if the block succeeds and rolled
+        back if it raises.
+
+        :param readonly: for reads that can be served from slightly stale data,
+        which use a read replica when there's one within
+        POSTGRESQL_REPLICA_MAX_LAG_SECONDS of the primary, and the primary otherwise.
+        Anything that writes, or has to see a write it just made, mustn't set it.
+        """
+        with ExitStack() as stack:
+            with request_metrics.timer('checkout'):
+                connection = None
+                if readonly and cls.replicas is not None:
+                    connection = stack.enter_context(cls.replicas.connection())
+                if connection is None:
+                    connection = stack.enter_context(cls.get_pool().connection())
+            connection.after_commit = []
+            try:
+                with connection:
+                    yield connection
+                for callback in connection.after_commit:
+                    callback()
+            finally:
+                connection.after_commit = None
+
+    @staticmethod
+    def after_commit(cursor, callback):
+        """
+        Calls `callback` once the transaction `cursor` is in has committed, or
+        right away if `cursor` isn't in a transaction from checkout (e.g. it's
+        on an autocommitting connection). It isn't called if the transaction
+        rolls back.
+        """
+        callbacks = getattr(cursor.connection, 'after_commit', None)
+        if isinstance(callbacks, list):
+            callbacks.append(callback)
+        else:
+            callback()
+
+    @staticmethod
+    def on_replica(connection):
+        """
+        :return: whether a connection from checkout(readonly=True) is to a
+        read replica, and so might not have the latest writes yet.
+        """
+        return getattr(connection, 'replica', None) is not None
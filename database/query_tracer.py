@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+from metrics.request_metrics import request_metrics
+
+logger = logging.getLogger('slow_query')
+
+# Statements taking at least this long are logged (0 turns the slow query log off)
+SLOW_QUERY_THRESHOLD_MS = 'SLOW_QUERY_THRESHOLD_MS'
+# At most this many slow queries are logged a minute; the rest are only counted
+SLOW_QUERY_LOG_MAX_PER_MINUTE = 'SLOW_QUERY_LOG_MAX_PER_MINUTE'
+# Set to 'off' to log slow queries without their EXPLAIN (ANALYZE, BUFFERS) plan
+SLOW_QUERY_EXPLAIN = 'SLOW_QUERY_EXPLAIN'
+DEFAULT_SLOW_QUERY_THRESHOLD_MS = 500
+DEFAULT_SLOW_QUERY_LOG_MAX_PER_MINUTE = 10
+
+_EXPLAIN_SAVEPOINT = 'slow_query_explain'
+
+class _StatementStats:
+    __slots__ = ('calls', 'errors', 'rows', 'seconds_total', 'seconds_max', 'slow')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+        self.slow = 0
+
+class QueryTracer:
+    """
+    Keeps per-statement aggregates of every Statement run (calls, failures,
+    rows, time), and logs statements slower than `threshold` seconds along
+    with the endpoint that ran them and, if `explain` is set, their
+    EXPLAIN (ANALYZE, BUFFERS) plan.
+
+    EXPLAIN ANALYZE runs the statement a second time, so it is done in a
+    savepoint that is rolled back, leaving the caller's transaction as it
+    was (bar any sequence values the second run used up). Logging is
+    limited to `max_logs_per_minute`; slow queries past that are counted,
+    and the count is reported with the next one that is logged.
+    """
+    def __init__(
+        self,
+        threshold=DEFAULT_SLOW_QUERY_THRESHOLD_MS / 1000,
+        max_logs_per_minute=DEFAULT_SLOW_QUERY_LOG_MAX_PER_MINUTE,
+        explain=True,
+        clock=time.monotonic
+    ):
+        self.threshold = threshold
+        self.max_logs_per_minute = max_logs_per_minute
+        self.explain = explain
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._window_start = None
+        self._window_logs = 0
+        self._unlogged = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            threshold=float(os.getenv(SLOW_QUERY_THRESHOLD_MS, DEFAULT_SLOW_QUERY_THRESHOLD_MS)) / 1000,
+            max_logs_per_minute=int(os.getenv(SLOW_QUERY_LOG_MAX_PER_MINUTE, DEFAULT_SLOW_QUERY_LOG_MAX_PER_MINUTE)),
+            explain=os.getenv(SLOW_QUERY_EXPLAIN, 'on') != 'off',
+        )
+
+    def _statement_stats(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _StatementStats()
+        return stats
+
+    def record_failure(self, statement):
+        with self._lock:
+            stats = self._statement_stats(statement.name)
+            stats.calls += 1
+            stats.errors += 1
+
+    def record(self, statement, cursor, executed_sql, params, seconds):
+        """
+        Records a statement that ran successfully on `cursor`, as `executed_sql`
+        with `params`, in `seconds`.
+        """
+        rowcount = cursor.rowcount
+        rows = rowcount if isinstance(rowcount, int) and rowcount >= 0 else None
+        slow = 0 < self.threshold <= seconds
+        with self._lock:
+            stats = self._statement_stats(statement.name)
+            stats.calls += 1
+            stats.rows += rows or 0
+            stats.seconds_total += seconds
+            stats.seconds_max = max(stats.seconds_max, seconds)
+            if not slow:
+                return
+            stats.slow += 1
+            unlogged = self._take_log_slot()
+            if unlogged is None:
+                return
+
+        plan = self._explain(cursor, executed_sql, params) if self.explain else None
+        logger.warning(
+            'Slow query: %s took %.1fms, %s rows, from %s%s%s',
+            statement.name,
+            seconds * 1000,
+            'unknown' if rows is None else rows,
+            request_metrics.current_endpoint() or 'outside a request',
+            f' ({unlogged} more slow queries not logged)' if unlogged else '',
+            f'\n{plan}' if plan else '',
+        )
+
+    def _take_log_slot(self):
+        """
+        :return: how many slow queries went unlogged before this one, or None
+        if this one can't be logged either. Must hold the lock.
+        """
+        now = self.clock()
+        if self._window_start is None or now - self._window_start >= 60:
+            self._window_start = now
+            self._window_logs = 0
+        if self._window_logs >= self.max_logs_per_minute:
+            self._unlogged += 1
+            return None
+        self._window_logs += 1
+        unlogged, self._unlogged = self._unlogged, 0
+        return unlogged
+
+    def _explain(self, cursor, executed_sql, params):
+        connection = cursor.connection
+        # A cursor of its own, so the caller can still fetch its results
+        explain_cursor = connection.cursor()
+        if connection.autocommit:
+            begin, rollback, release = 'begin', 'rollback', None
+        else:
+            begin = f'savepoint {_EXPLAIN_SAVEPOINT}'
+            rollback = f'rollback to savepoint {_EXPLAIN_SAVEPOINT}'
+            release = f'release savepoint {_EXPLAIN_SAVEPOINT}'
+        try:
+            explain_cursor.execute(begin)
+            try:
+                explain_cursor.execute(f'explain (analyze, buffers) {executed_sql}', params)
+                plan = '\n'.join(row[0] for row in explain_cursor.fetchall())
+            finally:
+                explain_cursor.execute(rollback)
+                if release:
+                    explain_cursor.execute(release)
+            return plan
+        except Exception:
+            logger.exception('Could not explain slow query')
+            return None
+        finally:
+            explain_cursor.close()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._window_start = None
+            self._window_logs = 0
+            self._unlogged = 0
+
+    def stats(self):
+        """
+        :return: a dict of each statement's name to its aggregates.
+        """
+        with self._lock:
+            return {
+                name: {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'rows': stats.rows,
+                    'seconds_total': stats.seconds_total,
+                    'seconds_max': stats.seconds_max,
+                    'slow': stats.slow,
+                }
+                for name, stats in self._stats.items()
+            }
+
+query_tracer = QueryTracer.from_env()
@@ -0,0 +1,49 @@
+from database.statement import Statement
+
+GET_START_AFTER = Statement(
+    'reconcile_checkpoint_get_start_after',
+    'select start_after from reconcile_checkpoint where bucket = %s',
+    ('varchar',),
+)
+SAVE = Statement(
+    'reconcile_checkpoint_save',
+    'insert into reconcile_checkpoint(bucket, start_after, update_date) values(%s, %s, now()) '
+    'on conflict (bucket) do update set start_after = excluded.start_after, update_date = excluded.update_date',
+    ('varchar', 'varchar'),
+)
+DELETE = Statement(
+    'reconcile_checkpoint_delete',
+    'delete from reconcile_checkpoint where bucket = %s',
+    ('varchar',),
+)
+
+class ReconcileCheckpointDao:
+    """
+    Remembers how far through a bucket's listing reconciliation has got, so
+    that an interrupted run can resume instead of starting over.
+    """
+    @staticmethod
+    def get_start_after(bucket, cursor):
+        """
+        Fetch the last object key reconciled in `bucket`.
+        Returns None if there's no reconciliation of the bucket in progress.
+        """
+        GET_START_AFTER.execute(cursor, (bucket,))
+        result = cursor.fetchone()
+        if result is None:
+            return None
+        return result[0]
+
+    @staticmethod
+    def save(bucket, start_after, cursor):
+        """
+        Records `start_after` as the last object key reconciled in `bucket`.
+        """
+        SAVE.execute(cursor, (bucket, start_after))
+
+    @staticmethod
+    def delete(bucket, cursor):
+        """
+        Forgets the reconciliation of `bucket` in progress, if there is one.
+        """
+        DELETE.execute(cursor, (bucket,))
@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager, ExitStack
+import psycopg2
+from psycopg2.extensions import parse_dsn
+from database.connection_pool import ConnectionPool, PoolTimeoutException
+
+logger = logging.getLogger('replica_set')
+
+# How far a replica's replay is behind the primary, in seconds. A replica that
+# is streaming from the primary (and has heard from it within the WAL receiver's
+# default timeout) and has replayed everything it has received isn't behind,
+# however long ago its last replayed transaction was. Otherwise it's as far
+# behind as its last replayed transaction, which overstates the lag of a replica
+# of an idle primary, but never counts one that has lost the primary as fresh.
+# One that isn't in recovery at all is the primary.
+LAG_SQL = '''
+select case
+    when not pg_is_in_recovery() then 0
+    when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() and exists (
+        select from pg_stat_wal_receiver
+        where status = 'streaming' and last_msg_receipt_time > now() - interval '1 minute'
+    ) then 0
+    else extract(epoch from now() - pg_last_xact_replay_timestamp())
+end
+'''
+
+def replica_name(connection_string, index):
+    """
+    :return: the replica's host:port, to tell it apart in logs and metrics.
+    """
+    try:
+        parsed = parse_dsn(connection_string)
+    except psycopg2.ProgrammingError:
+        return str(index)
+    return f"{parsed.get('host', 'localhost')}:{parsed.get('port', 5432)}"
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self.checked_at = None
+        self.available = True
+        self.reads = 0
+        self.lag_checks = 0
+        self.failures = 0
+
+class ReplicaSet:
+    """
+    Hands out connections to read replicas, in turn, for reads that can be
+    served from slightly stale data.
+
+    A replica is only used while its lag, measured at most every
+    `lag_check_interval` seconds (on the connection about to be handed out),
+    is at most `max_lag` seconds. One that can't be connected to is left
+    alone for `retry_after` seconds. When no replica is usable, `connection`
+    yields None, for the caller to use the primary instead.
+
+    :param pools: a dict of each replica's name to its ConnectionPool.
+    """
+    def __init__(self, pools, max_lag=5.0, lag_check_interval=1.0, retry_after=10.0, clock=time.monotonic):
+        self.replicas = [Replica(name, pool) for name, pool in pools.items()]
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.retry_after = retry_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next = 0
+        self._primary_fallbacks = 0
+
+    @classmethod
+    def connect(cls, connection_strings, connect, pool_options, **options):
+        """
+        :param connect: a callable opening a connection from a connection string.
+        :param pool_options: ConnectionPool keyword arguments for every replica's pool.
+        Pools start empty, so a replica that's down doesn't stop the server starting.
+        """
+        pools = {}
+        for index, connection_string in enumerate(connection_strings):
+            name = replica_name(connection_string, index)
+            pools[name] = ConnectionPool(
+                lambda connection_string=connection_string, name=name: _connect_replica(
+                    connect, connection_string, name
+                ),
+                **{**pool_options, 'min_size': 0}
+            )
+        return cls(pools, **options)
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks a connection out of the next usable replica's pool for the
+        duration of the `with` block, yielding None if no replica is usable.
+        """
+        for replica in self._in_turn():
+            with ExitStack() as stack:
+                try:
+                    connection = stack.enter_context(replica.pool.connection())
+                    usable = self._check_lag(replica, connection)
+                except PoolTimeoutException:
+                    # Busy rather than down, so it's tried again next time
+                    continue
+                except psycopg2.Error as e:
+                    self._mark_unavailable(replica, e)
+                    continue
+                if not usable:
+                    continue
+                with self._lock:
+                    replica.reads += 1
+                yield connection
+                return
+        with self._lock:
+            self._primary_fallbacks += 1
+        yield None
+
+    def close(self):
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'replicas': len(self.replicas),
+                'available': sum(replica.available for replica in self.replicas),
+                'primary_fallbacks': self._primary_fallbacks,
+            }
+
+    def replica_stats(self):
+        """
+        :return: a dict of each replica's name to its last measured lag, and how
+        often it's been read from.
+        """
+        with self._lock:
+            return {
+                replica.name: {
+                    'available': replica.available,
+                    'lag_seconds': replica.lag,
+                    'reads': replica.reads,
+                    'lag_checks': replica.lag_checks,
+                    'failures': replica.failures,
+                } for replica in self.replicas
+            }
+
+    def _in_turn(self):
+        """
+        Yields the replicas worth trying, starting after the last one used.
+        """
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        now = self._clock()
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.available or now - replica.checked_at >= self.retry_after:
+                yield replica
+
+    def _check_lag(self, replica, connection):
+        """
+        :return: whether the replica is within max_lag, measuring its lag on
+        `connection` first if the last measurement is out of date.
+        """
+        now = self._clock()
+        with self._lock:
+            due = replica.checked_at is None or now - replica.checked_at >= self.lag_check_interval
+            if due:
+                # Claimed, so other threads go by the last measurement in the meantime
+                replica.checked_at = now
+                replica.lag_checks += 1
+        if due:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+            connection.rollback()
+            with self._lock:
+                # Replayed nothing yet, so how far behind is unknown
+                replica.lag = None if lag is None else float(lag)
+                replica.available = True
+            if replica.lag is None or replica.lag > self.max_lag:
+                logger.warning(f'Replica {replica.name} is {replica.lag}s behind, reading from the primary')
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    def _mark_unavailable(self, replica, error):
+        logger.warning(f'Could not use replica {replica.name}, retrying in {self.retry_after}s: {error}')
+        with self._lock:
+            replica.available = False
+            replica.checked_at = self._clock()
+            replica.lag = None
+            replica.failures += 1
+
+def _connect_replica(connect, connection_string, name):
+    connection = connect(connection_string)
+    # Read by DatabaseAccessor.on_replica
+    connection.replica = name
+    return connection
@@ -0,0 +1,82 @@
+import os
+import time
+from psycopg2 import extensions
+from database.query_tracer import query_tracer
+from metrics.request_metrics import request_metrics
+
+# Set to 'off' to always send statements as plain SQL instead of PREPAREing them
+PREPARED_STATEMENTS = 'POSTGRESQL_PREPARED_STATEMENTS'
+
+class PreparingConnection(extensions.connection):
+    """
+    A psycopg2 connection that remembers which Statements have been PREPAREd
+    on it. Prepared statements live as long as the database session does, so
+    each pooled connection prepares a statement the first time it runs it and
+    reuses the server-side plan from then on.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+class Statement:
+    """
+    A named SQL statement, built once rather than on every call.
+
+    :param name: a unique name, used as the name of the server-side prepared statement.
+    :param sql: the statement, with psycopg2 `%s` placeholders.
+    :param param_types: the Postgres types of the placeholders, in order. Statements
+    without param_types (e.g. ones whose SQL varies with the number of rows) are
+    never prepared.
+    """
+    use_prepared_statements = os.getenv(PREPARED_STATEMENTS, 'on') != 'off'
+
+    def __init__(self, name, sql, param_types=None):
+        self.name = name
+        self.sql = sql
+        self.param_types = param_types
+        self.prepare_sql = None
+        self.execute_sql = None
+        if param_types is not None:
+            parts = sql.split('%s')
+            if len(parts) - 1 != len(param_types):
+                raise ValueError(
+                    f'Statement {name} has {len(parts) - 1} placeholders but {len(param_types)} param_types'
+                )
+            numbered = parts[0] + ''.join(
+                f'${position}{part}' for position, part in enumerate(parts[1:], start=1)
+            )
+            self.prepare_sql = f'prepare {name}({",".join(param_types)}) as {numbered}'
+            self.execute_sql = f'execute {name}({",".join(["%s"] * len(param_types))})'
+
+    def execute(self, cursor, params):
+        """
+        Runs the statement on `cursor`, as a prepared statement when the
+        cursor's connection supports it and prepared statements are switched on.
+        """
+        with request_metrics.query_timer(self.name):
+            start = time.perf_counter()
+            try:
+                executed_sql = self._execute(cursor, params)
+            except Exception:
+                query_tracer.record_failure(self)
+                raise
+            query_tracer.record(self, cursor, executed_sql, params, time.perf_counter() - start)
+
+    def _execute(self, cursor, params):
+        """
+        :return: the SQL that was run with `params`.
+        """
+        prepared = getattr(cursor.connection, 'prepared_statements', None)
+        if (
+            self.execute_sql is None
+            or not Statement.use_prepared_statements
+            or not isinstance(prepared, set)
+        ):
+            cursor.execute(self.sql, params)
+            return self.sql
+
+        if self.name not in prepared:
+            cursor.execute(self.prepare_sql)
+            prepared.add(self.name)
+        cursor.execute(self.execute_sql, params)
+        return self.execute_sql
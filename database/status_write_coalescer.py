@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from database.asset_dao import AssetDao
+from database.database_accessor import DatabaseAccessor
+
+# Set STATUS_WRITE_COALESCER to 'on' to group-commit PUT /api/status updates
+ENABLED = 'STATUS_WRITE_COALESCER'
+FLUSH_INTERVAL_MS = 'STATUS_WRITE_COALESCER_FLUSH_INTERVAL_MS'
+MAX_BATCH_SIZE = 'STATUS_WRITE_COALESCER_MAX_BATCH_SIZE'
+MAX_QUEUE_DEPTH = 'STATUS_WRITE_COALESCER_MAX_QUEUE_DEPTH'
+DEFAULT_FLUSH_INTERVAL_MS = 5
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_MAX_QUEUE_DEPTH = 10000
+
+class StatusWriteQueueFullException(Exception):
+    pass
+
+class _QueuedUpdate:
+    __slots__ = ('asset_id', 'new_status', 'queued_at', 'future')
+
+    def __init__(self, asset_id, new_status):
+        self.asset_id = asset_id
+        self.new_status = new_status
+        self.queued_at = time.monotonic()
+        self.future = Future()
+
+def _apply_status_updates(updates):
+    with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+        return AssetDao.update_uploaded_statuses(updates, cursor)
+
+class StatusWriteCoalescer:
+    """
+    Group-commits status updates: `submit` queues an update and blocks until a
+    flusher thread has applied it, together with every other update queued in
+    the meantime, in a single transaction. So each caller still only hears back
+    once its update is durable, but a burst of updates costs one commit (and one
+    fsync) per batch instead of one per update.
+
+    A batch is flushed `flush_interval` seconds after its first update was
+    queued, or as soon as `max_batch_size` updates are waiting, whichever is
+    first. `submit` refuses updates once `max_queue_depth` are waiting. Should
+    a batch fail, each asset's update in it is applied again in a transaction
+    of its own, so only the updates that fail by themselves fail.
+
+    :param apply: takes a list of (asset_id, new_status) tuples, each asset_id
+    appearing once, applies them in one transaction and returns the updated ids.
+    """
+    def __init__(
+        self,
+        apply=_apply_status_updates,
+        enabled=False,
+        flush_interval=DEFAULT_FLUSH_INTERVAL_MS / 1000,
+        max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+        max_queue_depth=DEFAULT_MAX_QUEUE_DEPTH
+    ):
+        self.apply = apply
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.max_queue_depth = max_queue_depth
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._flusher = None
+        self._closing = False
+        self._flushes = 0
+        self._flushed_updates = 0
+        self._failed_flushes = 0
+        self._rejected_updates = 0
+        self._largest_batch = 0
+        self._flush_seconds_total = 0.0
+        self._flush_seconds_max = 0.0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv(ENABLED, 'off') == 'on',
+            flush_interval=float(os.getenv(FLUSH_INTERVAL_MS, DEFAULT_FLUSH_INTERVAL_MS)) / 1000,
+            max_batch_size=int(os.getenv(MAX_BATCH_SIZE, DEFAULT_MAX_BATCH_SIZE)),
+            max_queue_depth=int(os.getenv(MAX_QUEUE_DEPTH, DEFAULT_MAX_QUEUE_DEPTH)),
+        )
+
+    def submit(self, asset_id, new_status):
+        """
+        Queues an update of asset `asset_id` to `new_status`, and waits for the
+        batch it lands in to commit. Updates to the same asset in one batch are
+        applied in the order they were submitted, so the last one wins.
+
+        Returns True if the asset was updated, or False if it does not exist.
+        Raises StatusWriteQueueFullException if too many updates are waiting
+        already, and re-raises whatever made its batch fail to commit.
+        """
+        update = _QueuedUpdate(asset_id, new_status)
+        with self._condition:
+            if len(self._queue) >= self.max_queue_depth:
+                self._rejected_updates += 1
+                raise StatusWriteQueueFullException(
+                    f'Too many status updates are waiting to be written ({self.max_queue_depth})'
+                )
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='status-write-coalescer', daemon=True)
+                self._flusher.start()
+            self._queue.append(update)
+            self._condition.notify()
+        return update.future.result()
+
+    def close(self):
+        """
+        Flushes whatever is queued and stops the flusher thread. The coalescer
+        can still be used afterwards; the next `submit` starts a new flusher.
+        """
+        with self._condition:
+            flusher = self._flusher
+            self._closing = True
+            self._condition.notify()
+        if flusher is not None:
+            flusher.join()
+        with self._condition:
+            self._flusher = None
+            self._closing = False
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                if self._closing:
+                    return None
+                self._condition.wait()
+            deadline = self._queue[0].queued_at + self.flush_interval
+            while len(self._queue) < self.max_batch_size and not self._closing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch_size))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch):
+        statuses = {}
+        for update in batch:
+            statuses[update.asset_id] = update.new_status
+
+        start = time.monotonic()
+        errors = {}
+        try:
+            updated_ids = set(self.apply(sorted(statuses.items())))
+        except Exception as e:
+            with self._condition:
+                self._failed_flushes += 1
+            if len(statuses) == 1:
+                updated_ids = set()
+                errors = dict.fromkeys(statuses, e)
+            else:
+                updated_ids, errors = self._apply_one_by_one(statuses)
+        committed_at = time.monotonic()
+
+        flush_seconds = committed_at - start
+        wait_seconds = [committed_at - update.queued_at for update in batch]
+        with self._condition:
+            self._flushes += 1
+            self._flushed_updates += sum(1 for update in batch if update.asset_id not in errors)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._flush_seconds_total += flush_seconds
+            self._flush_seconds_max = max(self._flush_seconds_max, flush_seconds)
+            self._wait_seconds_total += sum(wait_seconds)
+            self._wait_seconds_max = max(self._wait_seconds_max, *wait_seconds)
+        for update in batch:
+            if update.asset_id in errors:
+                update.future.set_exception(errors[update.asset_id])
+            else:
+                update.future.set_result(update.asset_id in updated_ids)
+
+    def _apply_one_by_one(self, statuses):
+        """
+        :return: the ids of the assets updated, and a dict of the ids of those
+        whose update failed to what it failed with.
+        """
+        updated_ids = set()
+        errors = {}
+        for asset_id, new_status in sorted(statuses.items()):
+            try:
+                updated_ids.update(self.apply([(asset_id, new_status)]))
+            except Exception as e:
+                errors[asset_id] = e
+        return updated_ids, errors
+
+    def stats(self):
+        """
+        `flush_seconds` is the time spent applying and committing batches, and
+        `wait_seconds` the time from an update being queued to its batch committing.
+        """
+        with self._condition:
+            return {
+                'enabled': self.enabled,
+                'queue_depth': len(self._queue),
+                'max_queue_depth': self.max_queue_depth,
+                'flushes': self._flushes,
+                'failed_flushes': self._failed_flushes,
+                'flushed_updates': self._flushed_updates,
+                'rejected_updates': self._rejected_updates,
+                'largest_batch': self._largest_batch,
+                'flush_seconds_total': self._flush_seconds_total,
+                'flush_seconds_max': self._flush_seconds_max,
+                'wait_seconds_total': self._wait_seconds_total,
+                'wait_seconds_max': self._wait_seconds_max,
+            }
+
+status_write_coalescer = StatusWriteCoalescer.from_env()
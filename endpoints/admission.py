@@ -0,0 +1,195 @@
+import logging
+import os
+import threading
+import time
+import cherrypy
+from endpoints.routing import endpoint_name
+
+logger = logging.getLogger('admission')
+
+# Set ADMISSION_CONTROL to 'on' to limit how many requests each endpoint serves at once
+ENABLED = 'ADMISSION_CONTROL'
+MAX_CONCURRENT = 'ADMISSION_MAX_CONCURRENT'
+MAX_QUEUE = 'ADMISSION_MAX_QUEUE'
+MAX_WAIT_MS = 'ADMISSION_MAX_WAIT_MS'
+RETRY_AFTER_SECONDS = 'ADMISSION_RETRY_AFTER_SECONDS'
+# Per-endpoint overrides of the limits above, e.g. '/api/upload=2:2,/api/access=6:4'
+LIMITS = 'ADMISSION_LIMITS'
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_MAX_QUEUE = 2
+DEFAULT_MAX_WAIT_MS = 1000
+DEFAULT_RETRY_AFTER_SECONDS = 1
+
+class AdmissionRejectedException(Exception):
+    pass
+
+class ServiceUnavailableError(cherrypy.HTTPError):
+    """
+    A 503 with a Retry-After header, which CherryPy would otherwise strip
+    from error responses.
+    """
+    def __init__(self, message, retry_after):
+        super().__init__(503, message=message)
+        self.retry_after = retry_after
+
+    def set_response(self):
+        super().set_response()
+        cherrypy.serving.response.headers['Retry-After'] = str(self.retry_after)
+
+class Bulkhead:
+    """
+    Lets at most `max_concurrent` requests in at once, with up to `max_queue`
+    more waiting (for at most `max_wait` seconds) for one of them to finish.
+    Anything beyond that is rejected straight away.
+    """
+    def __init__(self, max_concurrent, max_queue, max_wait):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._active = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    def acquire(self):
+        """
+        Raises AdmissionRejectedException if the queue is full, or no slot
+        frees up within `max_wait`.
+        """
+        with self._condition:
+            if self._active >= self.max_concurrent:
+                if self._queued >= self.max_queue:
+                    self._rejected += 1
+                    raise AdmissionRejectedException(
+                        f'Too many requests in progress ({self.max_concurrent}) and waiting ({self.max_queue})'
+                    )
+                self._queued += 1
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while self._active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timed_out += 1
+                            raise AdmissionRejectedException(
+                                f'Timed out after waiting {self.max_wait}s for a request to finish'
+                            )
+                        self._condition.wait(remaining)
+                finally:
+                    self._queued -= 1
+            self._active += 1
+            self._admitted += 1
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'active': self._active,
+                'queued': self._queued,
+                'admitted': self._admitted,
+                'rejected': self._rejected,
+                'timed_out': self._timed_out,
+            }
+
+def parse_limits(limits):
+    """
+    :param limits: e.g. '/api/upload=2:2,/api/access=6:4', each endpoint's
+    max concurrent requests and max queued requests.
+    :return: a dict of each endpoint to a (max_concurrent, max_queue) tuple.
+    """
+    parsed = {}
+    for part in filter(None, (part.strip() for part in limits.split(','))):
+        endpoint, _, limit = part.partition('=')
+        max_concurrent, _, max_queue = limit.partition(':')
+        try:
+            parsed[endpoint.rstrip('/')] = (int(max_concurrent), int(max_queue))
+        except ValueError:
+            raise ValueError(f'Invalid {LIMITS} entry {part!r}, expected <endpoint>=<max concurrent>:<max queue>')
+    return parsed
+
+class AdmissionController:
+    """
+    A Bulkhead for every endpoint, so a burst of requests to one endpoint
+    can only tie up its own share of CherryPy's worker threads (its
+    `max_concurrent` plus `max_queue`), and is shed with a 503 beyond that
+    instead of slowing down every other endpoint.
+    """
+    def __init__(
+        self,
+        enabled=False,
+        max_concurrent=DEFAULT_MAX_CONCURRENT,
+        max_queue=DEFAULT_MAX_QUEUE,
+        max_wait=DEFAULT_MAX_WAIT_MS / 1000,
+        retry_after=DEFAULT_RETRY_AFTER_SECONDS,
+        limits=None
+    ):
+        self.enabled = enabled
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.limits = limits or {}
+        self._lock = threading.Lock()
+        self._bulkheads = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv(ENABLED, 'off') == 'on',
+            max_concurrent=int(os.getenv(MAX_CONCURRENT, DEFAULT_MAX_CONCURRENT)),
+            max_queue=int(os.getenv(MAX_QUEUE, DEFAULT_MAX_QUEUE)),
+            max_wait=float(os.getenv(MAX_WAIT_MS, DEFAULT_MAX_WAIT_MS)) / 1000,
+            retry_after=int(os.getenv(RETRY_AFTER_SECONDS, DEFAULT_RETRY_AFTER_SECONDS)),
+            limits=parse_limits(os.getenv(LIMITS, '')),
+        )
+
+    def bulkhead(self, endpoint):
+        bulkhead = self._bulkheads.get(endpoint)
+        if bulkhead is None:
+            with self._lock:
+                bulkhead = self._bulkheads.get(endpoint)
+                if bulkhead is None:
+                    max_concurrent, max_queue = self.limits.get(endpoint, (self.max_concurrent, self.max_queue))
+                    bulkhead = self._bulkheads[endpoint] = Bulkhead(max_concurrent, max_queue, self.max_wait)
+        return bulkhead
+
+    def reset(self):
+        with self._lock:
+            self._bulkheads.clear()
+
+    def stats(self):
+        """
+        :return: a dict of each endpoint that has had a request to its limits,
+        how many of its requests are in progress and queued, and how many have
+        been admitted and turned away.
+        """
+        with self._lock:
+            bulkheads = dict(self._bulkheads)
+        return {endpoint: bulkhead.stats() for endpoint, bulkhead in bulkheads.items()}
+
+admission_controller = AdmissionController.from_env()
+
+def _admit():
+    if not admission_controller.enabled:
+        return
+    request = cherrypy.serving.request
+    # Anything that didn't route to an endpoint shares one bulkhead
+    bulkhead = admission_controller.bulkhead(endpoint_name(request))
+    try:
+        bulkhead.acquire()
+    except AdmissionRejectedException as e:
+        logger.warning(f'Shed {request.method} {request.path_info}: {e}')
+        raise ServiceUnavailableError(str(e), admission_controller.retry_after)
+    # Runs once the response has been sent, including a streamed one
+    request.hooks.attach('on_end_request', bulkhead.release)
+
+# Switched on with 'tools.admission.on', for every endpoint but /api/metrics. Runs
+# after request_metrics starts timing, so shed requests are still counted.
+cherrypy.tools.admission = cherrypy.Tool('on_start_resource', _admit, priority=60)
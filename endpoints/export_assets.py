@@ -0,0 +1,31 @@
+import logging
+import traceback
+from contextlib import ExitStack
+import cherrypy
+from database.database_accessor import DatabaseAccessor
+from database.connection_pool import PoolTimeoutException
+from methods.asset_methods import export_assets, EXPORT_CURSOR_NAME, EXPORT_ITERSIZE
+
+logger = logging.getLogger('export_assets')
+
+@cherrypy.expose
+class ExportAssetsEndpoint:
+    # Mounted under /api/assets, so switch off the JSON encoding it would inherit from there
+    @cherrypy.config(**{'response.stream': True, 'tools.json_out.on': False})
+    def GET(self):
+        # The body is streamed after GET returns, so the connection and its
+        # server-side cursor have to outlive this method
+        resources = ExitStack()
+        try:
+            c = resources.enter_context(DatabaseAccessor.checkout())
+            cursor = resources.enter_context(c.cursor(name=EXPORT_CURSOR_NAME))
+        except PoolTimeoutException as e:
+            resources.close()
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(503, message=str(e))
+        cursor.itersize = EXPORT_ITERSIZE
+        # Runs once the body has been sent, or the client has gone away
+        cherrypy.request.hooks.attach('on_end_request', resources.close)
+
+        cherrypy.response.headers['Content-Type'] = 'application/x-ndjson'
+        return (chunk.encode() for chunk in export_assets(cursor))
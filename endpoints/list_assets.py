@@ -0,0 +1,38 @@
+import logging
+import traceback
+import cherrypy
+from database.database_accessor import DatabaseAccessor
+from database.connection_pool import PoolTimeoutException
+from methods.asset_methods import list_assets, ListAssetsInvalidArgsException
+
+logger = logging.getLogger('list_assets')
+
+@cherrypy.expose
+@cherrypy.tools.json_out()
+class ListAssetsEndpoint:
+    def GET(
+        self,
+        uploaded_status=None,
+        bucket=None,
+        created_after=None,
+        created_before=None,
+        limit=None,
+        cursor=None
+    ):
+        try:
+            # `cursor` is the page cursor, so the database cursor needs another name
+            with DatabaseAccessor.checkout() as c, c.cursor() as db_cursor:
+                return list_assets({
+                    'uploaded_status': uploaded_status,
+                    'bucket': bucket,
+                    'created_after': created_after,
+                    'created_before': created_before,
+                    'limit': limit,
+                    'cursor': cursor,
+                }, db_cursor)
+        except ListAssetsInvalidArgsException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(400, message=str(e))
+        except PoolTimeoutException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(503, message=str(e))
@@ -0,0 +1,74 @@
+import json
+import cherrypy
+from database.asset_row_cache import asset_row_cache
+from database.database_accessor import DatabaseAccessor
+from database.query_tracer import query_tracer
+from database.status_write_coalescer import status_write_coalescer
+from endpoints.admission import admission_controller
+from endpoints.routing import endpoint_name
+from external_services.s3_service import S3Service
+from metrics.request_metrics import request_metrics, render_stats, render_labelled_stats
+
+def _begin_request():
+    request = cherrypy.serving.request
+    # Labelled by endpoint rather than path, so junk paths can't add new labels
+    request_metrics.begin_request(endpoint_name(request), request.method)
+    request.hooks.attach('on_end_request', _end_request)
+
+def _end_request():
+    request_metrics.end_request(str(cherrypy.serving.response.status).split(' ', 1)[0])
+
+# Switched on with 'tools.request_metrics.on', for every endpoint but /api/metrics itself
+cherrypy.tools.request_metrics = cherrypy.Tool('on_start_resource', _begin_request)
+
+def json_handler(*args, **kwargs):
+    """
+    Stands in for the json_out tool's own handler. The response is encoded
+    here rather than while it is written out, so encoding can be timed.
+    """
+    value = cherrypy.serving.request._json_inner_handler(*args, **kwargs)
+    with request_metrics.timer('serialize'):
+        return encode_json(value)
+
+def encode_json(value):
+    return json.dumps(value).encode('utf-8')
+
+@cherrypy.expose
+class MetricsEndpoint:
+    def GET(self):
+        lines = request_metrics.render()
+        if DatabaseAccessor.pool is not None:
+            lines += render_stats('pool', DatabaseAccessor.pool.stats(), counters={
+                'checkouts',
+                'checkout_timeouts',
+                'checkout_wait_seconds_total',
+                'connections_opened',
+                'connections_recycled',
+                'health_check_failures',
+            })
+        if DatabaseAccessor.replicas is not None:
+            lines += render_stats('replicas', DatabaseAccessor.replicas.stats(), counters={'primary_fallbacks'})
+            lines += render_labelled_stats('replica', 'replica', DatabaseAccessor.replicas.replica_stats(), counters={
+                'reads', 'lag_checks', 'failures'
+            })
+        lines += render_stats('asset_row_cache', asset_row_cache.stats(), counters={
+            'hits', 'misses', 'evictions', 'expirations', 'invalidations'
+        })
+        lines += render_stats('signed_url_cache', S3Service.signed_url_cache.stats(), counters={
+            'hits', 'misses', 'evictions'
+        })
+        lines += render_stats('status_write_coalescer', status_write_coalescer.stats(), counters={
+            'flushes',
+            'failed_flushes',
+            'flushed_updates',
+            'rejected_updates',
+            'flush_seconds_total',
+            'wait_seconds_total',
+        })
+        lines += render_labelled_stats('statement', 'statement', query_tracer.stats(), counters={
+            'calls', 'errors', 'rows', 'seconds_total', 'slow'
+        })
+        lines += render_labelled_stats('admission', 'endpoint', admission_controller.stats(), counters={
+            'admitted', 'rejected', 'timed_out'
+        })
+        return '\n'.join(lines) + '\n'
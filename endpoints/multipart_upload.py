@@ -0,0 +1,55 @@
+import logging
+import traceback
+import cherrypy
+from database.database_accessor import DatabaseAccessor
+from database.connection_pool import PoolTimeoutException
+from external_services.s3_service import S3ServiceException, S3ServiceInvalidArgsException
+from methods.multipart_upload_methods import (
+    initiate_multipart_upload,
+    complete_multipart_upload,
+    abort_multipart_upload,
+    MultipartUploadInvalidArgsException,
+    AssetNotFoundException,
+)
+
+logger = logging.getLogger('multipart_upload')
+
+def _resolve(method, json):
+    try:
+        with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+            return method(json, cursor)
+    except AssetNotFoundException as e:
+        raise cherrypy.HTTPError(404, message=str(e))
+    except MultipartUploadInvalidArgsException as e:
+        logger.error(traceback.format_exc())
+        raise cherrypy.HTTPError(400, message=str(e))
+    except S3ServiceInvalidArgsException as s3e:
+        logger.error(traceback.format_exc())
+        raise cherrypy.HTTPError(400, message=str(s3e))
+    except S3ServiceException as s3e:
+        logger.error(traceback.format_exc())
+        raise cherrypy.HTTPError(500, message=str(s3e))
+    except PoolTimeoutException as e:
+        logger.error(traceback.format_exc())
+        raise cherrypy.HTTPError(503, message=str(e))
+
+@cherrypy.expose
+@cherrypy.tools.json_out()
+@cherrypy.tools.json_in()
+class MultipartUploadEndpoint:
+    def POST(self):
+        return _resolve(initiate_multipart_upload, cherrypy.request.json)
+
+@cherrypy.expose
+@cherrypy.tools.json_out()
+@cherrypy.tools.json_in()
+class CompleteMultipartUploadEndpoint:
+    def POST(self):
+        return _resolve(complete_multipart_upload, cherrypy.request.json)
+
+@cherrypy.expose
+@cherrypy.tools.json_out()
+@cherrypy.tools.json_in()
+class AbortMultipartUploadEndpoint:
+    def POST(self):
+        return _resolve(abort_multipart_upload, cherrypy.request.json)
@@ -0,0 +1,16 @@
+import cherrypy
+
+UNMATCHED = 'unmatched'
+
+def endpoint_name(request):
+    """
+    :return: the path of the endpoint `request` was routed to, without any
+    extra path segments the dispatcher passed on to its handler, or
+    `UNMATCHED` if it wasn't routed to one. There's a bounded set of these,
+    however many distinct paths clients send.
+    """
+    if not isinstance(request.handler, cherrypy.dispatch.PageHandler):
+        return UNMATCHED
+    # Split the way the dispatcher does, so empty segments don't throw the count off
+    segments = [segment for segment in (request.script_name + request.path_info).split('/') if segment]
+    return '/' + '/'.join(segments[:len(segments) - len(request.handler.args)])
@@ -0,0 +1,25 @@
+import logging
+import traceback
+import cherrypy
+from database.database_accessor import DatabaseAccessor
+from database.connection_pool import PoolTimeoutException
+from methods.s3_event_methods import ingest_s3_events, S3EventInvalidArgsException
+
+logger = logging.getLogger('s3_events')
+
+@cherrypy.expose
+@cherrypy.tools.json_out()
+# SNS posts its notifications as text/plain
+@cherrypy.tools.json_in(content_type=['application/json', 'text/plain'])
+class S3EventsEndpoint:
+    def POST(self):
+        json = cherrypy.request.json
+        try:
+            with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+                return ingest_s3_events(json, cursor)
+        except S3EventInvalidArgsException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(400, message=str(e))
+        except PoolTimeoutException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(503, message=str(e))
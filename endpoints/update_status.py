@@ -2,8 +2,14 @@ import logging
 import traceback
 import cherrypy
 from database.database_accessor import DatabaseAccessor
+from database.connection_pool import PoolTimeoutException
+from database.status_write_coalescer import status_write_coalescer, StatusWriteQueueFullException
 from methods.asset_methods import (
-    change_asset_upload_status, ChangeUploadStatusInvalidArgsException, AssetNotFoundException
+    change_asset_upload_status,
+    change_asset_upload_status_coalesced,
+    change_asset_upload_statuses,
+    ChangeUploadStatusInvalidArgsException,
+    AssetNotFoundException,
 )
 
 logger = logging.getLogger('update_status')
@@ -14,12 +20,32 @@ logger = logging.getLogger('update_status')
 class UpdateAssetStatusEndpoint:
     def PUT(self):
         json = cherrypy.request.json
-        with DatabaseAccessor.get_connection() as c:
-            try:
-                with c.cursor() as cursor:
-                    return change_asset_upload_status(json, cursor)
-            except AssetNotFoundException as e:
-                raise cherrypy.HTTPError(404, message=str(e))
-            except ChangeUploadStatusInvalidArgsException as e:
-                logger.error(traceback.format_exc())
-                raise cherrypy.HTTPError(400, message=str(e))
+        try:
+            if status_write_coalescer.enabled:
+                return change_asset_upload_status_coalesced(json)
+            with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+                return change_asset_upload_status(json, cursor)
+        except AssetNotFoundException as e:
+            raise cherrypy.HTTPError(404, message=str(e))
+        except ChangeUploadStatusInvalidArgsException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(400, message=str(e))
+        except (PoolTimeoutException, StatusWriteQueueFullException) as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(503, message=str(e))
+
+@cherrypy.expose
+@cherrypy.tools.json_out()
+@cherrypy.tools.json_in()
+class BatchUpdateAssetStatusEndpoint:
+    def PUT(self):
+        json = cherrypy.request.json
+        try:
+            with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+                return change_asset_upload_statuses(json, cursor)
+        except ChangeUploadStatusInvalidArgsException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(400, message=str(e))
+        except PoolTimeoutException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(503, message=str(e))
@@ -2,8 +2,11 @@ import logging
 import traceback
 import cherrypy
 from database.database_accessor import DatabaseAccessor
+from database.connection_pool import PoolTimeoutException
 from external_services.s3_service import S3ServiceException, S3ServiceInvalidArgsException
-from methods.s3_access_methods import initiate_upload, UploadInvalidArgsException
+from methods.s3_access_methods import (
+    initiate_upload, initiate_batch_upload, UploadInvalidArgsException
+)
 
 logger = logging.getLogger('upload_asset')
 
@@ -13,16 +16,34 @@ logger = logging.getLogger('upload_asset')
 class UploadAssetEndpoint:
     def POST(self):
         json = cherrypy.request.json
-        with DatabaseAccessor.get_connection() as c:
-            try:
-                with c.cursor() as cursor:
-                    return initiate_upload(json, cursor)
-            except UploadInvalidArgsException as ue:
-                logger.error(traceback.format_exc())
-                raise cherrypy.HTTPError(400, message=str(ue))
-            except S3ServiceInvalidArgsException as s3e:
-                logger.error(traceback.format_exc())
-                raise cherrypy.HTTPError(400, message=str(s3e))
-            except S3ServiceException as s3e:
-                logger.error(traceback.format_exc())
-                raise cherrypy.HTTPError(500, message=str(s3e))
+        try:
+            with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+                return initiate_upload(json, cursor)
+        except UploadInvalidArgsException as ue:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(400, message=str(ue))
+        except S3ServiceInvalidArgsException as s3e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(400, message=str(s3e))
+        except S3ServiceException as s3e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(500, message=str(s3e))
+        except PoolTimeoutException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(503, message=str(e))
+
+@cherrypy.expose
+@cherrypy.tools.json_out()
+@cherrypy.tools.json_in()
+class BatchUploadAssetEndpoint:
+    def POST(self):
+        json = cherrypy.request.json
+        try:
+            with DatabaseAccessor.checkout() as c, c.cursor() as cursor:
+                return initiate_batch_upload(json, cursor)
+        except UploadInvalidArgsException as ue:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(400, message=str(ue))
+        except PoolTimeoutException as e:
+            logger.error(traceback.format_exc())
+            raise cherrypy.HTTPError(503, message=str(e))
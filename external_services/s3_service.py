@@ -1,7 +1,11 @@
 import os
+import threading
+import time
 from enum import Enum
-import boto3
 from botocore.exceptions import ClientError
+from external_services.signed_url_cache import SignedUrlCache
+from external_services.sigv4_presigner import SigV4Presigner
+from metrics.request_metrics import request_metrics
 
 
 class S3ClientMethod(Enum):
@@ -17,11 +21,46 @@ class S3ServiceInvalidArgsException(Exception):
 DEFAULT_EXPIRATION = 60 # 1 minute
 MAX_EXPIRATION_TIME = 60 * 30 # 30 minutes
 DEFAULT_BUCKET = os.getenv('S3_BUCKET_NAME')
+# S3's own limit on the number of parts in a multipart upload
+MAX_PART_COUNT = 10000
+# S3's own limit on the number of keys in a page of ListObjectsV2
+MAX_LIST_PAGE_SIZE = 1000
+# Errors S3 returns for a bad request from our client, rather than a failure on S3's end
+CLIENT_ERROR_CODES = {'NoSuchUpload', 'InvalidPart', 'InvalidPartOrder', 'EntityTooSmall'}
+# Set to 'on' to sign URLs with SigV4Presigner instead of boto3 wherever it can
+NATIVE_PRESIGNER = 'S3_NATIVE_PRESIGNER'
 
 class S3Service():
-    s3_client = boto3.client('s3')
+    # Built on first use by get_client, since importing boto3 and loading the
+    # S3 service model is the slowest part of starting up
+    s3_client = None
+    _client_lock = threading.Lock()
+    # Only GET URLs are reused; every upload gets a freshly signed policy
+    signed_url_cache = SignedUrlCache.from_env()
+    use_native_presigner = os.getenv(NATIVE_PRESIGNER, 'off') == 'on'
+    _presigner = None
 
     @classmethod
+    def get_client(cls):
+        if cls.s3_client is None:
+            with cls._client_lock:
+                if cls.s3_client is None:
+                    import boto3
+                    cls.s3_client = boto3.client('s3')
+        return cls.s3_client
+
+    @classmethod
+    def _get_presigner(cls):
+        if not cls.use_native_presigner:
+            return None
+        # The presigner learns from, and has to match, whichever client is in use
+        s3_client = cls.get_client()
+        if cls._presigner is None or cls._presigner.s3_client is not s3_client:
+            cls._presigner = SigV4Presigner(s3_client)
+        return cls._presigner
+
+    @classmethod
+    @request_metrics.timed('sign')
     def create_signed_url(
         cls,
         s3_client_method,
@@ -35,6 +74,7 @@ class S3Service():
         :param object_key: The key used in S3 as the name of the asset.
         :param bucket_name: Bucket name in S3.
         :param expiration: Expiration time for the URL, in seconds.  Cannot be more than 30 mins.
+        A GET URL signed earlier may be returned instead, see SignedUrlCache.
         :return: signed URL.
         """ 
         if object_key is None:
@@ -56,8 +96,13 @@ class S3Service():
                     'Key': object_key,
                 }
 
+                presigner = cls._get_presigner()
                 if s3_client_method == S3ClientMethod.POST_OBJECT:
-                    return cls.s3_client.generate_presigned_post(
+                    if presigner is not None:
+                        signed_post = presigner.generate_presigned_post(bucket_name, object_key, expiration)
+                        if signed_post is not None:
+                            return signed_post
+                    return cls.get_client().generate_presigned_post(
                         bucket_name,
                         object_key,
                         Fields={},
@@ -65,13 +110,172 @@ class S3Service():
                         ExpiresIn=expiration
                     )
 
-                return cls.s3_client.generate_presigned_url(
-                    s3_client_method.value,
-                    Params=params,
-                    ExpiresIn=expiration
-                )
+                cache_key = (bucket_name, object_key, s3_client_method.value)
+                signed_url = cls.signed_url_cache.get(cache_key, expiration)
+                if signed_url is not None:
+                    return signed_url
+
+                signed_at = time.time()
+                if presigner is not None:
+                    signed_url = presigner.generate_presigned_url(bucket_name, object_key, expiration)
+                if signed_url is None:
+                    signed_url = cls.get_client().generate_presigned_url(
+                        s3_client_method.value,
+                        Params=params,
+                        ExpiresIn=expiration
+                    )
+                cls.signed_url_cache.put(cache_key, signed_url, expiration, signed_at)
+                return signed_url
             except ClientError as ce:
                 raise S3ServiceException('Failed to generate signed URL', ce) 
         
         raise S3ServiceInvalidArgsException(f'Unrecognized or unsupported S3 Method: {str(s3_client_method)}')
-            
+
+    @classmethod
+    def _raise_for_client_error(cls, message, ce):
+        if ce.response.get('Error', {}).get('Code') in CLIENT_ERROR_CODES:
+            raise S3ServiceInvalidArgsException(f'{message}: {ce.response["Error"].get("Message")}')
+        raise S3ServiceException(message, ce)
+
+    @classmethod
+    def create_multipart_upload(cls, object_key, bucket_name=DEFAULT_BUCKET):
+        """Start a multipart upload of an S3 object.
+
+        :param object_key: The key used in S3 as the name of the asset.
+        :param bucket_name: Bucket name in S3.
+        :return: the upload's id.
+        """
+        try:
+            response = cls.get_client().create_multipart_upload(Bucket=bucket_name, Key=object_key)
+        except ClientError as ce:
+            cls._raise_for_client_error('Failed to create multipart upload', ce)
+        return response['UploadId']
+
+    @classmethod
+    def create_signed_part_urls(
+        cls,
+        object_key,
+        upload_id,
+        part_count,
+        bucket_name=DEFAULT_BUCKET,
+        expiration=DEFAULT_EXPIRATION
+    ):
+        """Create signed URLs to upload every part of a multipart upload.
+
+        :param object_key: The key used in S3 as the name of the asset.
+        :param upload_id: The id of the multipart upload, from create_multipart_upload.
+        :param part_count: The number of parts. URLs are signed for parts 1 through part_count.
+        :param bucket_name: Bucket name in S3.
+        :param expiration: Expiration time for the URLs, in seconds.  Cannot be more than 30 mins.
+        :return: a list of signed URLs, the first being for part 1.
+        """
+        if not 1 <= part_count <= MAX_PART_COUNT:
+            raise S3ServiceInvalidArgsException(
+                f'Could not create signed part URLs: there must be between 1 and {MAX_PART_COUNT} parts.'
+            )
+        if expiration > MAX_EXPIRATION_TIME:
+            raise S3ServiceInvalidArgsException(
+                'Could not create signed part URLs: '
+                'expiration time was too long. Try a shorter duration.'
+            )
+
+        part_numbers = range(1, part_count + 1)
+        presigner = cls._get_presigner()
+        if presigner is not None:
+            signed_urls = presigner.generate_presigned_part_urls(
+                bucket_name, object_key, upload_id, part_numbers, expiration
+            )
+            if signed_urls is not None:
+                return signed_urls
+
+        s3_client = cls.get_client()
+        try:
+            return [
+                s3_client.generate_presigned_url(
+                    'upload_part',
+                    Params={
+                        'Bucket': bucket_name,
+                        'Key': object_key,
+                        'UploadId': upload_id,
+                        'PartNumber': part_number,
+                    },
+                    ExpiresIn=expiration
+                )
+                for part_number in part_numbers
+            ]
+        except ClientError as ce:
+            raise S3ServiceException('Failed to generate signed URL', ce)
+
+    @classmethod
+    def complete_multipart_upload(cls, object_key, upload_id, parts=None, bucket_name=DEFAULT_BUCKET):
+        """Complete a multipart upload, assembling its parts into the S3 object.
+
+        :param object_key: The key used in S3 as the name of the asset.
+        :param upload_id: The id of the multipart upload.
+        :param parts: a list of (part number, ETag) tuples for the uploaded parts.
+        If None, the parts S3 has received are listed and used instead.
+        :param bucket_name: Bucket name in S3.
+        """
+        s3_client = cls.get_client()
+        try:
+            if parts is None:
+                parts = []
+                paginator = s3_client.get_paginator('list_parts')
+                for page in paginator.paginate(Bucket=bucket_name, Key=object_key, UploadId=upload_id):
+                    parts.extend((part['PartNumber'], part['ETag']) for part in page.get('Parts', []))
+            if not parts:
+                raise S3ServiceInvalidArgsException(
+                    'Could not complete multipart upload: no parts have been uploaded.'
+                )
+            s3_client.complete_multipart_upload(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    'Parts': [
+                        {'PartNumber': part_number, 'ETag': etag}
+                        for part_number, etag in sorted(parts)
+                    ],
+                },
+            )
+        except ClientError as ce:
+            cls._raise_for_client_error('Failed to complete multipart upload', ce)
+
+    @classmethod
+    def abort_multipart_upload(cls, object_key, upload_id, bucket_name=DEFAULT_BUCKET):
+        """Abort a multipart upload, discarding any parts uploaded so far.
+        Aborting an upload that no longer exists is not an error.
+
+        :param object_key: The key used in S3 as the name of the asset.
+        :param upload_id: The id of the multipart upload.
+        :param bucket_name: Bucket name in S3.
+        """
+        try:
+            cls.get_client().abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+        except ClientError as ce:
+            if ce.response.get('Error', {}).get('Code') == 'NoSuchUpload':
+                return
+            raise S3ServiceException('Failed to abort multipart upload', ce)
+
+    @classmethod
+    def list_object_keys(cls, bucket_name=DEFAULT_BUCKET, start_after=None, page_size=MAX_LIST_PAGE_SIZE):
+        """List the keys of every object in a bucket, a page at a time, in
+        ascending (UTF-8 binary) order.
+
+        :param bucket_name: Bucket name in S3.
+        :param start_after: Only list keys that come after this one, e.g. the last
+        key of a previous listing, to pick up where it left off.
+        :param page_size: The most keys to fetch per request, at most 1000.
+        :return: a generator of lists of keys, one list per page.
+        """
+        params = {
+            'Bucket': bucket_name,
+            'PaginationConfig': {'PageSize': page_size},
+        }
+        if start_after:
+            params['StartAfter'] = start_after
+        try:
+            for page in cls.get_client().get_paginator('list_objects_v2').paginate(**params):
+                yield [content['Key'] for content in page.get('Contents', [])]
+        except ClientError as ce:
+            raise S3ServiceException('Failed to list objects', ce)
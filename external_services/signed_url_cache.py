@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Set SIGNED_URL_CACHE_MAX_SIZE to 0 to turn the cache off
+MAX_SIZE = 'SIGNED_URL_CACHE_MAX_SIZE'
+MIN_REMAINING_FRACTION = 'SIGNED_URL_CACHE_MIN_REMAINING_FRACTION'
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_MIN_REMAINING_FRACTION = 1.0
+
+class SignedUrlCache:
+    """
+    Remembers signed URLs so that repeat requests for the same object get the
+    same URL back, which saves signing it again and lets browsers and CDNs
+    cache the download.
+
+    A cached URL is reused while it has at least `min_remaining_fraction` of
+    the requested lifetime left. The default of 1 never hands out a URL that
+    expires sooner than requested, so a URL is only reused for requests that
+    ask for a shorter lifetime than it was signed with. Lowering it trades
+    that guarantee for more reuse, e.g. at 0.5 a request for a 60 second URL
+    can be handed one that is only valid for 30 more seconds.
+    The least recently used URL is evicted once the cache holds `max_size`.
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, min_remaining_fraction=DEFAULT_MIN_REMAINING_FRACTION):
+        self.max_size = max_size
+        self.min_remaining_fraction = min_remaining_fraction
+        self._lock = threading.Lock()
+        # (bucket, object key, client method) -> (signed URL, expires at)
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_size=int(os.getenv(MAX_SIZE, DEFAULT_MAX_SIZE)),
+            min_remaining_fraction=float(
+                os.getenv(MIN_REMAINING_FRACTION, DEFAULT_MIN_REMAINING_FRACTION)
+            ),
+        )
+
+    def get(self, key, expiration):
+        """
+        Returns the cached URL for `key` if it is still valid for long enough
+        to satisfy a request for a URL lasting `expiration` seconds, else None.
+        """
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                url, expires_at = entry
+                if expires_at - time.time() >= expiration * self.min_remaining_fraction:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return url
+            self._misses += 1
+            return None
+
+    def put(self, key, url, expiration, signed_at):
+        """
+        :param signed_at: the time.time() at which `url` was signed, valid
+        for `expiration` seconds from then.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (url, signed_at + expiration)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+            }
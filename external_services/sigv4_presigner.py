@@ -0,0 +1,319 @@
+import base64
+import datetime
+import hmac
+import json
+import threading
+import time
+from collections import namedtuple
+from functools import partial
+from hashlib import sha256
+from urllib.parse import quote, unquote, urlsplit
+from botocore.exceptions import BotoCoreError, ClientError
+
+ALGORITHM = 'AWS4-HMAC-SHA256'
+SIGV4_TIMESTAMP = '%Y%m%dT%H%M%SZ'
+ISO8601 = '%Y-%m-%dT%H:%M:%SZ'
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+# Characters botocore leaves unescaped in object keys and query string values
+KEY_SAFE_CHARS = '/~'
+QUERY_SAFE_CHARS = '-._~'
+
+PROBE_KEY = 'sigv4-presigner-probe'
+PROBE_UPLOAD_ID = 'sigv4-presigner-probe-upload'
+PROBE_EXPIRES = 60
+CREDENTIALS_TTL = 60 # seconds
+MAX_SIGNING_KEYS = 16
+
+# Where and how a bucket's requests are signed, learned from botocore's own output
+_Endpoint = namedtuple('_Endpoint', ['base_url', 'host', 'path', 'region', 'service'])
+_UNSUPPORTED = object()
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode('utf-8'), sha256).digest()
+
+def _host_from_url(url):
+    parts = urlsplit(url)
+    host = parts.hostname
+    if parts.port is not None and parts.port != {'http': 80, 'https': 443}.get(parts.scheme):
+        host = f'{host}:{parts.port}'
+    return host
+
+class SigV4Presigner:
+    """
+    Signs S3 GET URLs and POST policies with Signature Version 4 locally,
+    producing exactly what the given boto3 client's generate_presigned_url and
+    generate_presigned_post would, without building a botocore request (and
+    running its event hooks and endpoint resolution) for every call.
+
+    The first time a bucket is signed for, the presigner asks the client to
+    sign a probe and learns the bucket's URL and signing region from it. It
+    then re-signs the probe itself, and only takes over for that bucket if its
+    output matches botocore's byte for byte. Anything else (SigV2 signing,
+    extra signed headers, keys ending in ${filename}, ...) is reported as
+    unsupported by returning None, and the caller should use the client instead.
+    """
+    def __init__(self, s3_client, credentials_ttl=CREDENTIALS_TTL):
+        self.s3_client = s3_client
+        self.credentials_ttl = credentials_ttl
+        self._lock = threading.Lock()
+        self._url_endpoints = {} # bucket -> _Endpoint or _UNSUPPORTED
+        self._part_url_endpoints = {}
+        self._post_endpoints = {}
+        self._signing_keys = {} # (secret key, date, region, service) -> signing key
+        self._credentials = None
+        self._credentials_expire_at = 0
+
+    def generate_presigned_url(self, bucket, object_key, expires_in):
+        """
+        :return: the same URL as s3_client.generate_presigned_url('get_object', ...),
+        or None if it can't be signed locally.
+        """
+        if not object_key:
+            return None
+        endpoint = self._get_endpoint(
+            self._url_endpoints,
+            bucket,
+            partial(self._calibrate_url, 'get_object', 'GET', {}, ()),
+        )
+        if endpoint is None:
+            return None
+        credentials = self._get_credentials()
+        if credentials is None:
+            return None
+        return self._presign_url(endpoint, credentials, 'GET', object_key, (), expires_in, _utcnow())
+
+    def generate_presigned_part_urls(self, bucket, object_key, upload_id, part_numbers, expires_in):
+        """
+        :return: the URLs s3_client.generate_presigned_url('upload_part', ...) would
+        give for each of `part_numbers` of the multipart upload `upload_id`, in
+        order, or None if they can't be signed locally.
+        """
+        if not object_key:
+            return None
+        endpoint = self._get_endpoint(
+            self._part_url_endpoints,
+            bucket,
+            partial(
+                self._calibrate_url,
+                'upload_part',
+                'PUT',
+                {'UploadId': PROBE_UPLOAD_ID, 'PartNumber': 1},
+                (('uploadId', PROBE_UPLOAD_ID), ('partNumber', '1')),
+            ),
+        )
+        if endpoint is None:
+            return None
+        credentials = self._get_credentials()
+        if credentials is None:
+            return None
+        # Every part shares the timestamp, so the signing key is only looked up once
+        now = _utcnow()
+        return [
+            self._presign_url(
+                endpoint,
+                credentials,
+                'PUT',
+                object_key,
+                (('uploadId', upload_id), ('partNumber', str(part_number))),
+                expires_in,
+                now,
+            )
+            for part_number in part_numbers
+        ]
+
+    def generate_presigned_post(self, bucket, object_key, expires_in):
+        """
+        :return: the same url and fields as s3_client.generate_presigned_post(
+        bucket, object_key, Fields={}, Conditions=[], ...), or None if they
+        can't be signed locally.
+        """
+        if not object_key or object_key.endswith('${filename}'):
+            return None
+        endpoint = self._get_endpoint(self._post_endpoints, bucket, self._calibrate_post)
+        if endpoint is None:
+            return None
+        credentials = self._get_credentials()
+        if credentials is None:
+            return None
+        now = _utcnow()
+        expiration = (now + datetime.timedelta(seconds=expires_in)).strftime(ISO8601)
+        return self._presign_post(endpoint, credentials, bucket, object_key, expiration, now)
+
+    def _get_endpoint(self, endpoints, bucket, calibrate):
+        endpoint = endpoints.get(bucket)
+        if endpoint is None:
+            try:
+                endpoint = calibrate(bucket)
+            except (BotoCoreError, ClientError):
+                # e.g. no credentials or an invalid bucket name: leave it to the
+                # client to raise, and try again next time
+                return None
+            with self._lock:
+                endpoints[bucket] = endpoint
+        return None if endpoint is _UNSUPPORTED else endpoint
+
+    def _get_credentials(self):
+        now = time.monotonic()
+        if self._credentials is None or now >= self._credentials_expire_at:
+            credentials = self.s3_client._get_credentials()
+            # Refreshable credentials refresh themselves, if due, when frozen
+            frozen = credentials.get_frozen_credentials() if credentials is not None else None
+            with self._lock:
+                self._credentials = frozen
+                self._credentials_expire_at = now + self.credentials_ttl
+        return self._credentials
+
+    def _signing_key(self, credentials, date, endpoint):
+        cache_key = (credentials.secret_key, date, endpoint.region, endpoint.service)
+        signing_key = self._signing_keys.get(cache_key)
+        if signing_key is None:
+            k_date = _hmac(f'AWS4{credentials.secret_key}'.encode('utf-8'), date)
+            k_region = _hmac(k_date, endpoint.region)
+            k_service = _hmac(k_region, endpoint.service)
+            signing_key = _hmac(k_service, 'aws4_request')
+            with self._lock:
+                # Keys are only good for a day, so there's no point being clever about eviction
+                if len(self._signing_keys) >= MAX_SIGNING_KEYS:
+                    self._signing_keys.clear()
+                self._signing_keys[cache_key] = signing_key
+        return signing_key
+
+    def _sign(self, credentials, endpoint, timestamp, string_to_sign):
+        signing_key = self._signing_key(credentials, timestamp[:8], endpoint)
+        return hmac.new(signing_key, string_to_sign.encode('utf-8'), sha256).hexdigest()
+
+    def _presign_url(self, endpoint, credentials, http_method, object_key, operation_params, expires_in, now):
+        """
+        :param operation_params: (name, value) query string parameters of the
+        operation itself, which botocore writes ahead of the auth parameters.
+        """
+        timestamp = now.strftime(SIGV4_TIMESTAMP)
+        credential = f'{credentials.access_key}/{timestamp[:8]}/{endpoint.region}/{endpoint.service}/aws4_request'
+        # In the order botocore writes them, which isn't quite sorted
+        params = [
+            *operation_params,
+            ('X-Amz-Algorithm', ALGORITHM),
+            ('X-Amz-Credential', credential),
+            ('X-Amz-Date', timestamp),
+            ('X-Amz-Expires', str(expires_in)),
+            ('X-Amz-SignedHeaders', 'host'),
+        ]
+        if credentials.token is not None:
+            params.append(('X-Amz-Security-Token', credentials.token))
+        encoded = [
+            (quote(name, safe=QUERY_SAFE_CHARS), quote(value, safe=QUERY_SAFE_CHARS))
+            for name, value in params
+        ]
+        query = '&'.join(f'{name}={value}' for name, value in encoded)
+        canonical_query = '&'.join(f'{name}={value}' for name, value in sorted(encoded))
+
+        quoted_key = quote(object_key, safe=KEY_SAFE_CHARS)
+        canonical_request = (
+            f'{http_method}\n{endpoint.path}{quoted_key}\n{canonical_query}\n'
+            f'host:{endpoint.host}\n\nhost\n{UNSIGNED_PAYLOAD}'
+        )
+        string_to_sign = '\n'.join([
+            ALGORITHM,
+            timestamp,
+            f'{timestamp[:8]}/{endpoint.region}/{endpoint.service}/aws4_request',
+            sha256(canonical_request.encode('utf-8')).hexdigest(),
+        ])
+        signature = self._sign(credentials, endpoint, timestamp, string_to_sign)
+        return f'{endpoint.base_url}{quoted_key}?{query}&X-Amz-Signature={signature}'
+
+    def _presign_post(self, endpoint, credentials, bucket, object_key, expiration, now):
+        timestamp = now.strftime(SIGV4_TIMESTAMP)
+        credential = f'{credentials.access_key}/{timestamp[:8]}/{endpoint.region}/{endpoint.service}/aws4_request'
+        fields = {
+            'key': object_key,
+            'x-amz-algorithm': ALGORITHM,
+            'x-amz-credential': credential,
+            'x-amz-date': timestamp,
+        }
+        conditions = [
+            {'bucket': bucket},
+            {'key': object_key},
+            {'x-amz-algorithm': ALGORITHM},
+            {'x-amz-credential': credential},
+            {'x-amz-date': timestamp},
+        ]
+        if credentials.token is not None:
+            fields['x-amz-security-token'] = credentials.token
+            conditions.append({'x-amz-security-token': credentials.token})
+
+        policy = {'expiration': expiration, 'conditions': conditions}
+        fields['policy'] = base64.b64encode(json.dumps(policy).encode('utf-8')).decode('utf-8')
+        # For a POST, the policy itself is the string to sign
+        fields['x-amz-signature'] = self._sign(credentials, endpoint, timestamp, fields['policy'])
+        return {'url': endpoint.base_url, 'fields': fields}
+
+    def _calibrate_url(self, client_method, http_method, api_params, operation_params, bucket):
+        probe = self.s3_client.generate_presigned_url(
+            client_method,
+            Params={'Bucket': bucket, 'Key': PROBE_KEY, **api_params},
+            ExpiresIn=PROBE_EXPIRES
+        )
+        url, _, query = probe.partition('?')
+        params = dict(pair.partition('=')[::2] for pair in query.split('&'))
+        if (
+            params.get('X-Amz-Algorithm') != ALGORITHM
+            or params.get('X-Amz-SignedHeaders') != 'host'
+            or not url.endswith('/' + PROBE_KEY)
+        ):
+            return _UNSUPPORTED
+
+        endpoint = self._endpoint(url[:-len(PROBE_KEY)], unquote(params['X-Amz-Credential']))
+        if endpoint is None:
+            return _UNSUPPORTED
+        credentials = self._get_credentials()
+        now = datetime.datetime.strptime(params['X-Amz-Date'], SIGV4_TIMESTAMP)
+        if (
+            credentials is None
+            or self._presign_url(
+                endpoint, credentials, http_method, PROBE_KEY, operation_params, PROBE_EXPIRES, now
+            ) != probe
+        ):
+            return _UNSUPPORTED
+        return endpoint
+
+    def _calibrate_post(self, bucket):
+        probe = self.s3_client.generate_presigned_post(
+            bucket,
+            PROBE_KEY,
+            Fields={},
+            Conditions=[],
+            ExpiresIn=PROBE_EXPIRES
+        )
+        fields = probe['fields']
+        if fields.get('x-amz-algorithm') != ALGORITHM or 'x-amz-credential' not in fields:
+            return _UNSUPPORTED
+
+        endpoint = self._endpoint(probe['url'], fields['x-amz-credential'])
+        if endpoint is None:
+            return _UNSUPPORTED
+        credentials = self._get_credentials()
+        now = datetime.datetime.strptime(fields['x-amz-date'], SIGV4_TIMESTAMP)
+        # botocore reads the clock separately for the policy's expiration, so take it from the probe
+        expiration = json.loads(base64.b64decode(fields['policy']))['expiration']
+        if (
+            credentials is None
+            or self._presign_post(endpoint, credentials, bucket, PROBE_KEY, expiration, now) != probe
+        ):
+            return _UNSUPPORTED
+        return endpoint
+
+    def _endpoint(self, base_url, credential):
+        scope = credential.split('/')
+        if len(scope) != 5 or scope[4] != 'aws4_request':
+            return None
+        parts = urlsplit(base_url)
+        return _Endpoint(
+            base_url=base_url,
+            host=_host_from_url(base_url),
+            path=parts.path or '/',
+            region=scope[2],
+            service=scope[3],
+        )
@@ -1,10 +1,22 @@
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timezone
+from itertools import islice
 from database.asset_dao import UploadedStatus, AssetDao
+from database.asset_row_cache import asset_row_cache
+from database.status_write_coalescer import status_write_coalescer
 
 
 """
 "Public" functions that live here essentially map to endpoints 1:1.
 """
 
+# asset.id is a bigint
+MIN_ASSET_ID = -2 ** 63
+MAX_ASSET_ID = 2 ** 63 - 1
+
 class ChangeUploadStatusInvalidArgsException(Exception):
     pass
 
@@ -21,6 +33,8 @@ def _check_valid_change_upload_status_request(request):
         raise ChangeUploadStatusInvalidArgsException('Missing key: uploaded_status')
     if not isinstance(asset_id, int):
         raise ChangeUploadStatusInvalidArgsException(f'Invalid key: asset_id, Value: {asset_id} is not an int')
+    if not MIN_ASSET_ID <= asset_id <= MAX_ASSET_ID:
+        raise ChangeUploadStatusInvalidArgsException(f'Invalid key: asset_id, Value: {asset_id} is out of range')
     
     try:
         UploadedStatus(uploaded_status)
@@ -37,14 +51,220 @@ def change_asset_upload_status(request, cursor):
     the asset's id and the new upload status.
     """
     _check_valid_change_upload_status_request(request)
-    asset = AssetDao.get_by_id(request['asset_id'], cursor)
+    asset = AssetDao.update_uploaded_status(request['asset_id'], request['uploaded_status'], cursor)
 
     if not asset:
         raise AssetNotFoundException(f'Asset with id {request["asset_id"]} not found')
-    
-    AssetDao.update_uploaded_status(request['asset_id'], request['uploaded_status'], cursor)
+    asset_row_cache.invalidate_after_commit([asset.id], cursor)
 
     return {
         'success': True,
         'uploaded_status': request['uploaded_status'],
     }
+
+# resolving function for /api/status, when status writes are coalesced
+def change_asset_upload_status_coalesced(request):
+    """
+    Behaves exactly like `change_asset_upload_status`, but hands the update to
+    the status write coalescer, which commits it together with any other
+    updates made around the same time. Returns once it has been committed.
+    """
+    _check_valid_change_upload_status_request(request)
+    if not status_write_coalescer.submit(request['asset_id'], request['uploaded_status']):
+        raise AssetNotFoundException(f'Asset with id {request["asset_id"]} not found')
+    asset_row_cache.invalidate(request['asset_id'])
+
+    return {
+        'success': True,
+        'uploaded_status': request['uploaded_status'],
+    }
+
+MAX_BATCH_STATUS_UPDATE_SIZE = 5000
+
+def _check_valid_batch_change_upload_status_request(request):
+    updates = request.get('updates', None)
+
+    if updates is None:
+        raise ChangeUploadStatusInvalidArgsException('Missing key: updates')
+    if not isinstance(updates, list):
+        raise ChangeUploadStatusInvalidArgsException(f'Invalid key: updates, Value: {updates} is not a list')
+    if len(updates) > MAX_BATCH_STATUS_UPDATE_SIZE:
+        raise ChangeUploadStatusInvalidArgsException(
+            f'Invalid key: updates, at most {MAX_BATCH_STATUS_UPDATE_SIZE} updates can be made at once'
+        )
+
+    for index, update in enumerate(updates):
+        if not isinstance(update, dict):
+            raise ChangeUploadStatusInvalidArgsException(
+                f'Invalid update at index {index}: {update} is not an object'
+            )
+        try:
+            _check_valid_change_upload_status_request(update)
+        except ChangeUploadStatusInvalidArgsException as e:
+            raise ChangeUploadStatusInvalidArgsException(f'Invalid update at index {index}: {e}')
+
+# resolving function for /api/status/batch
+def change_asset_upload_statuses(request, cursor):
+    """
+    Updates many assets to have new statuses, using a single update statement.
+    The batch is validated up front, so either every update is applied or,
+    if any of them is malformed, none are.
+
+    Should an asset_id appear more than once, its last update wins, exactly as
+    if the updates had been made one at a time in order.
+
+    :param request: a dict with key `updates`, a list of dicts shaped like the
+    `request` taken by `change_asset_upload_status`.
+    :return: a dict listing the asset ids that were `updated` and those that were `not_found`.
+    """
+    _check_valid_batch_change_upload_status_request(request)
+
+    statuses = {}
+    for update in request['updates']:
+        statuses[update['asset_id']] = update['uploaded_status']
+
+    updated_ids = set(AssetDao.update_uploaded_statuses(sorted(statuses.items()), cursor))
+    asset_row_cache.invalidate_after_commit(updated_ids, cursor)
+
+    return {
+        'success': True,
+        'updated': [asset_id for asset_id in statuses if asset_id in updated_ids],
+        'not_found': [asset_id for asset_id in statuses if asset_id not in updated_ids],
+    }
+
+class ListAssetsInvalidArgsException(Exception):
+    pass
+
+def _asset_to_json(asset):
+    return {
+        'asset_id': asset.id,
+        'uploaded_status': asset.uploaded_status,
+        'bucket': asset.bucket,
+        'object_key': asset.object_key,
+        'create_date': asset.create_date.isoformat(),
+    }
+
+DEFAULT_LIST_PAGE_SIZE = 100
+MAX_LIST_PAGE_SIZE = 1000
+
+def _encode_list_cursor(asset):
+    """
+    The cursor for the page after `asset` is its (create_date, id), made opaque
+    so that clients don't come to depend on what's inside it.
+    """
+    keyset = json.dumps([asset.create_date.isoformat(), asset.id])
+    return base64.urlsafe_b64encode(keyset.encode()).decode()
+
+def _decode_list_cursor(cursor):
+    try:
+        create_date, asset_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(asset_id, int):
+            raise ValueError(asset_id)
+        return datetime.fromisoformat(create_date), asset_id
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ListAssetsInvalidArgsException(f'Invalid key: cursor, Value: {cursor} is not a cursor from a previous page')
+
+def _parse_list_date(key, value):
+    if value is None:
+        return None
+    try:
+        # fromisoformat doesn't take a trailing Z until python 3.11
+        date = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        raise ListAssetsInvalidArgsException(f'Invalid key: {key}, Value: {value} is not an ISO 8601 date')
+    # create_date is stored as a UTC timestamp without a time zone
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+def _check_valid_list_assets_request(request):
+    # A query parameter given more than once comes through as a list
+    for key in ('uploaded_status', 'bucket', 'created_after', 'created_before', 'limit', 'cursor'):
+        value = request.get(key, None)
+        if value is not None and not isinstance(value, str):
+            raise ListAssetsInvalidArgsException(f'Invalid key: {key}, Value: {value} is not a string')
+
+    uploaded_status = request.get('uploaded_status', None)
+    limit = request.get('limit', None)
+
+    if uploaded_status is not None:
+        try:
+            UploadedStatus(uploaded_status)
+        except ValueError:
+            raise ListAssetsInvalidArgsException(
+                f'Invalid key: uploaded_status, Value: {uploaded_status} is not one of {[s.value for s in UploadedStatus]}')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ListAssetsInvalidArgsException(f'Invalid key: limit, Value: {limit} is not an int')
+        if not 1 <= limit <= MAX_LIST_PAGE_SIZE:
+            raise ListAssetsInvalidArgsException(
+                f'Invalid key: limit, Value: {limit} is not between 1 and {MAX_LIST_PAGE_SIZE}'
+            )
+
+# resolving function for /api/assets
+def list_assets(request, cursor):
+    """
+    Lists assets a page at a time, oldest first, optionally filtered by status,
+    bucket and creation date.
+
+    Pages are fetched by keyset rather than by offset: each page picks up after
+    the (create_date, id) of the last asset on the page before it, so any page
+    costs the same to fetch as the first, and assets created while paging
+    don't shift later pages around.
+
+    :param request: a dict with keys `uploaded_status`, `bucket`, `created_after`,
+    `created_before`, `limit` and `cursor`, all optional. The dates are ISO 8601,
+    with `created_after` inclusive and `created_before` exclusive, and `limit` is
+    the page size. `cursor` is the `next_cursor` returned with the previous page.
+    :return: a dict with keys `assets`, the page, and `next_cursor`, which is None
+    on the last page.
+    """
+    _check_valid_list_assets_request(request)
+    limit = int(request.get('limit') or DEFAULT_LIST_PAGE_SIZE)
+    after = request.get('cursor')
+
+    # Fetch one extra asset to find out whether there is another page after this one
+    assets = AssetDao.list_page(
+        limit + 1,
+        cursor,
+        uploaded_status=request.get('uploaded_status'),
+        bucket=request.get('bucket'),
+        created_after=_parse_list_date('created_after', request.get('created_after')),
+        created_before=_parse_list_date('created_before', request.get('created_before')),
+        after=_decode_list_cursor(after) if after else None,
+    )
+    page = assets[:limit]
+
+    return {
+        'assets': [_asset_to_json(asset) for asset in page],
+        'next_cursor': _encode_list_cursor(page[-1]) if len(assets) > limit else None,
+    }
+
+# The name of the server-side cursor that exports read through
+EXPORT_CURSOR_NAME = 'asset_export'
+# Rows fetched per round trip to the database while exporting, which is also
+# how many rows go into each chunk of the export
+EXPORT_ITERSIZE = int(os.getenv('ASSET_EXPORT_ITERSIZE', 10000))
+
+# resolving function for /api/assets/export
+def export_assets(cursor):
+    """
+    Exports every asset as NDJSON, one JSON object per line shaped like the
+    assets returned by `list_assets`, in no particular order.
+
+    :param cursor: a named (server-side) cursor, e.g. from
+    `connection.cursor(name=EXPORT_CURSOR_NAME)`, so that only `cursor.itersize`
+    rows are held in memory at a time however big the table is.
+    :return: a generator of strings, each holding up to `cursor.itersize` lines.
+    """
+    assets = AssetDao.iter_all(cursor)
+    while True:
+        chunk = ''.join(
+            json.dumps(_asset_to_json(asset)) + '\n'
+            for asset in islice(assets, cursor.itersize)
+        )
+        if not chunk:
+            return
+        yield chunk
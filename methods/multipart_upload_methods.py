@@ -0,0 +1,219 @@
+from datetime import datetime
+from external_services.s3_service import (
+    S3Service,
+    S3ServiceException,
+    S3ServiceInvalidArgsException,
+    DEFAULT_BUCKET,
+    MAX_PART_COUNT,
+)
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.asset_row_cache import asset_row_cache
+
+"""
+"Public" functions that live here essentially map to endpoints 1:1.
+"""
+
+MIB = 1024 * 1024
+# S3 rejects parts (other than the last) smaller than 5MiB, or any part over 5GiB
+MIN_PART_SIZE = 5 * MIB
+MAX_PART_SIZE = 5 * 1024 * MIB
+DEFAULT_PART_SIZE = 64 * MIB
+
+class MultipartUploadInvalidArgsException(Exception):
+    pass
+
+class AssetNotFoundException(Exception):
+    pass
+
+def _check_valid_multipart_upload_request(upload_request):
+    object_key = upload_request.get('object_key', None)
+    size = upload_request.get('size', None)
+    part_size = upload_request.get('part_size', None)
+    expiration = upload_request.get('expires_in', None)
+
+    if object_key is None:
+        raise MultipartUploadInvalidArgsException('Missing key: object_key')
+    if not isinstance(object_key, str):
+        raise MultipartUploadInvalidArgsException(f'Invalid key: object_key, Value: {object_key} is not a string')
+    if size is None:
+        raise MultipartUploadInvalidArgsException('Missing key: size')
+    if not isinstance(size, int) or size < 1:
+        raise MultipartUploadInvalidArgsException(f'Invalid key: size, Value: {size} is not a positive int')
+    if part_size is not None:
+        if not isinstance(part_size, int):
+            raise MultipartUploadInvalidArgsException(f'Invalid key: part_size, Value: {part_size} is not an int')
+        if not MIN_PART_SIZE <= part_size <= MAX_PART_SIZE:
+            raise MultipartUploadInvalidArgsException(
+                f'Invalid key: part_size, Value: {part_size} is not between {MIN_PART_SIZE} and {MAX_PART_SIZE}'
+            )
+        if -(-size // part_size) > MAX_PART_COUNT:
+            raise MultipartUploadInvalidArgsException(
+                f'Invalid key: part_size, Value: {part_size} would split the upload into more than '
+                f'{MAX_PART_COUNT} parts'
+            )
+    if expiration is not None and not isinstance(expiration, int):
+        raise MultipartUploadInvalidArgsException(f'Invalid key: expires_in, Value: {expiration} is not an int')
+
+def _pick_part_size(size):
+    """
+    The default part size, or the smallest whole number of MiB that keeps
+    an upload of `size` bytes within MAX_PART_COUNT parts.
+    """
+    smallest = -(-size // MAX_PART_COUNT)
+    return max(DEFAULT_PART_SIZE, -(-smallest // MIB) * MIB)
+
+# resolving function for /api/upload/multipart
+def initiate_multipart_upload(upload_request, cursor):
+    """
+    Starts an S3 multipart upload for an asset and signs a URL to PUT each of
+    its parts to, all in one response, so clients can upload the parts in parallel.
+    The upload's id is recorded on the asset, which is created if it doesn't
+    exist yet. If the asset already has a multipart upload in progress, that
+    upload is aborted and replaced.
+
+    If the combination of bucket and key already exists in the database and is
+    complete, an error is raised and no action is taken.
+
+    :param upload_request: a dict with keys `object_key`, `size`, `part_size` and
+    `expires_in`, denoting the asset's name, its size in bytes, the size in bytes
+    of each part (all but the last) and the amount of time, in seconds, that the
+    signed URLs should last. `part_size` defaults to 64MiB, or larger if needed to
+    keep within S3's limit of 10000 parts.
+    """
+    _check_valid_multipart_upload_request(upload_request)
+    object_key = upload_request['object_key']
+    size = upload_request['size']
+    part_size = upload_request.get('part_size') or _pick_part_size(size)
+    part_count = -(-size // part_size)
+    expiration = upload_request.get('expires_in')
+
+    new_asset = AssetRow(
+        id=None,
+        uploaded_status=UploadedStatus.PENDING.value,
+        bucket=DEFAULT_BUCKET,
+        object_key=object_key,
+        create_date=datetime.utcnow(),
+    )
+    # The upsert leaves the asset's row locked until we commit, so concurrent
+    # requests for the same key can't both replace its upload id
+    asset = AssetDao.insert_or_get(new_asset, cursor)
+    if asset.uploaded_status == UploadedStatus.COMPLETE.value:
+        raise MultipartUploadInvalidArgsException('Upload already complete, try another object_key.')
+
+    upload_id = S3Service.create_multipart_upload(object_key, bucket_name=asset.bucket)
+    try:
+        if expiration:
+            part_urls = S3Service.create_signed_part_urls(
+                object_key,
+                upload_id,
+                part_count,
+                bucket_name=asset.bucket,
+                expiration=expiration,
+            )
+        else:
+            part_urls = S3Service.create_signed_part_urls(
+                object_key,
+                upload_id,
+                part_count,
+                bucket_name=asset.bucket,
+            )
+    except (S3ServiceInvalidArgsException, S3ServiceException):
+        S3Service.abort_multipart_upload(object_key, upload_id, bucket_name=asset.bucket)
+        raise
+
+    AssetDao.set_upload_id(asset.id, upload_id, cursor)
+    if asset.upload_id is not None:
+        S3Service.abort_multipart_upload(object_key, asset.upload_id, bucket_name=asset.bucket)
+
+    return {
+        'asset_id': asset.id,
+        'upload_id': upload_id,
+        'part_size': part_size,
+        'parts': [
+            {'part_number': part_number, 'url': url}
+            for part_number, url in enumerate(part_urls, start=1)
+        ],
+    }
+
+def _check_valid_finish_request(finish_request):
+    asset_id = finish_request.get('asset_id', None)
+
+    if asset_id is None:
+        raise MultipartUploadInvalidArgsException('Missing key: asset_id')
+    if not isinstance(asset_id, int):
+        raise MultipartUploadInvalidArgsException(f'Invalid key: asset_id, Value: {asset_id} is not an int')
+
+def _check_valid_parts(parts):
+    if not isinstance(parts, list):
+        raise MultipartUploadInvalidArgsException(f'Invalid key: parts, Value: {parts} is not a list')
+    for index, part in enumerate(parts):
+        if (
+            not isinstance(part, dict)
+            or not isinstance(part.get('part_number'), int)
+            or not isinstance(part.get('etag'), str)
+        ):
+            raise MultipartUploadInvalidArgsException(
+                f'Invalid part at index {index}: expected an object with an int part_number and a string etag'
+            )
+
+def _get_asset_with_upload(asset_id, cursor):
+    asset = AssetDao.get_by_id(asset_id, cursor)
+    if not asset:
+        raise AssetNotFoundException(f'Asset with id {asset_id} not found')
+    if asset.upload_id is None:
+        raise MultipartUploadInvalidArgsException(f'Asset with id {asset_id} has no multipart upload in progress.')
+    return asset
+
+# resolving function for /api/upload/multipart/complete
+def complete_multipart_upload(complete_request, cursor):
+    """
+    Completes an asset's multipart upload, assembling its parts into the
+    object in S3, and marks the asset as complete.
+
+    :param complete_request: a dict with keys `asset_id` and `parts`, denoting
+    the asset's id and, optionally, a list of `{part_number, etag}` objects for
+    the uploaded parts, with each ETag as S3 returned it when the part was PUT.
+    If `parts` is left out, every part S3 has received is used.
+    """
+    _check_valid_finish_request(complete_request)
+    parts = complete_request.get('parts')
+    if parts is not None:
+        _check_valid_parts(parts)
+        parts = [(part['part_number'], part['etag']) for part in parts]
+
+    asset = _get_asset_with_upload(complete_request['asset_id'], cursor)
+    S3Service.complete_multipart_upload(
+        asset.object_key,
+        asset.upload_id,
+        parts=parts,
+        bucket_name=asset.bucket,
+    )
+    if not AssetDao.finish_upload(asset.id, asset.upload_id, UploadedStatus.COMPLETE.value, cursor):
+        raise MultipartUploadInvalidArgsException(
+            f'The multipart upload for asset with id {asset.id} was finished or replaced by another request.'
+        )
+    asset_row_cache.invalidate_after_commit([asset.id], cursor)
+
+    return {
+        'success': True,
+        'asset_id': asset.id,
+        'uploaded_status': UploadedStatus.COMPLETE.value,
+    }
+
+# resolving function for /api/upload/multipart/abort
+def abort_multipart_upload(abort_request, cursor):
+    """
+    Aborts an asset's multipart upload, discarding any parts uploaded so far.
+    The asset itself is kept, with its status unchanged.
+
+    :param abort_request: a dict with key `asset_id`, denoting the asset's id.
+    """
+    _check_valid_finish_request(abort_request)
+    asset = _get_asset_with_upload(abort_request['asset_id'], cursor)
+    S3Service.abort_multipart_upload(asset.object_key, asset.upload_id, bucket_name=asset.bucket)
+    AssetDao.finish_upload(asset.id, asset.upload_id, asset.uploaded_status, cursor)
+
+    return {
+        'success': True,
+        'asset_id': asset.id,
+    }
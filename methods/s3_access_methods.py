@@ -7,6 +7,7 @@ from external_services.s3_service import (
     DEFAULT_BUCKET
 )
 from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.asset_row_cache import asset_row_cache
 
 """
 "Public" functions that live here essentially map to endpoints 1:1.
@@ -34,8 +35,9 @@ def initiate_upload(upload_request, cursor):
     table. Should it not, the exception is exposed to the user and no
     information is persisted.
 
-    If the combination of bucket and key already exist in the database, an error
-    is raised and no action is taken.
+    If the combination of bucket and key already exists in the database and is
+    still pending, that asset is reused. If it is complete, an error is raised
+    and no action is taken.
 
     :param upload_request: a dict with keys `object_key` and `expires_in`, denoting
     the asset's name and the amount of time, in seconds, that the signed URL should last.
@@ -45,22 +47,16 @@ def initiate_upload(upload_request, cursor):
     object_key = upload_request['object_key']
     expiration = upload_request.get('expires_in')
 
-    asset = AssetDao.get_by_bucket_and_key(
-        DEFAULT_BUCKET,
-        object_key,
-        cursor,
+    new_asset = AssetRow(
+        id=None,
+        uploaded_status=UploadedStatus.PENDING.value,
+        bucket=DEFAULT_BUCKET,
+        object_key=object_key,
+        create_date=datetime.utcnow(),
     )
+    asset = AssetDao.insert_or_get(new_asset, cursor)
 
-    if not asset:
-        new_asset = AssetRow(
-            id=None,
-            uploaded_status=UploadedStatus.PENDING.value,
-            bucket=DEFAULT_BUCKET,
-            object_key=object_key,
-            create_date=datetime.utcnow(),
-        )
-        asset = AssetDao.insert_one(new_asset, cursor)
-    elif asset.uploaded_status == UploadedStatus.COMPLETE.value:
+    if asset.uploaded_status == UploadedStatus.COMPLETE.value:
         raise UploadInvalidArgsException('Upload already complete, try another object_key.')
 
     if expiration:
@@ -81,6 +77,128 @@ def initiate_upload(upload_request, cursor):
         'asset_id': asset.id,
     }
 
+MAX_BATCH_UPLOAD_SIZE = 5000
+
+def _check_valid_batch_upload_request(batch_request):
+    uploads = batch_request.get('uploads', None)
+
+    if uploads is None:
+        raise UploadInvalidArgsException('Missing key: uploads')
+    if not isinstance(uploads, list):
+        raise UploadInvalidArgsException(f'Invalid key: uploads, Value: {uploads} is not a list')
+    if len(uploads) > MAX_BATCH_UPLOAD_SIZE:
+        raise UploadInvalidArgsException(
+            f'Invalid key: uploads, at most {MAX_BATCH_UPLOAD_SIZE} uploads can be requested at once'
+        )
+
+# resolving function for /api/upload/batch
+def initiate_batch_upload(batch_request, cursor):
+    """
+    Creates signed URLs for many post_object operations at once.
+    Behaves like `initiate_upload` for every entry in the batch, except that
+    an entry that fails (bad arguments, an already completed asset, a signing
+    error) gets an `error` in its result instead of failing the whole batch.
+
+    Existing assets are looked up with a single query, and assets are only
+    written for entries whose URL was signed, using a single multi-row insert.
+
+    :param batch_request: a dict with key `uploads`, a list of dicts shaped like
+    the `upload_request` taken by `initiate_upload`.
+    :return: a dict with key `results`, holding one result per upload, in request order.
+    """
+    _check_valid_batch_upload_request(batch_request)
+    uploads = batch_request['uploads']
+    results = [None] * len(uploads)
+
+    valid_uploads = {}
+    for index, upload_request in enumerate(uploads):
+        if not isinstance(upload_request, dict):
+            results[index] = {
+                'object_key': None,
+                'error': f'Invalid upload: {upload_request} is not an object',
+            }
+            continue
+        try:
+            _check_valid_upload_request(upload_request)
+            valid_uploads[index] = upload_request
+        except UploadInvalidArgsException as e:
+            results[index] = {
+                'object_key': upload_request.get('object_key'),
+                'error': str(e),
+            }
+
+    object_keys = {upload_request['object_key'] for upload_request in valid_uploads.values()}
+    assets = {
+        asset.object_key: asset
+        for asset in AssetDao.get_by_bucket_and_keys(DEFAULT_BUCKET, object_keys, cursor)
+    }
+
+    signed = {}
+    for index, upload_request in valid_uploads.items():
+        object_key = upload_request['object_key']
+        asset = assets.get(object_key)
+        if asset and asset.uploaded_status == UploadedStatus.COMPLETE.value:
+            results[index] = {
+                'object_key': object_key,
+                'error': 'Upload already complete, try another object_key.',
+            }
+            continue
+
+        expiration = upload_request.get('expires_in')
+        try:
+            if expiration:
+                signed[index] = S3Service.create_signed_url(
+                    S3ClientMethod.POST_OBJECT,
+                    object_key,
+                    expiration=expiration,
+                )
+            else:
+                signed[index] = S3Service.create_signed_url(
+                    S3ClientMethod.POST_OBJECT,
+                    object_key,
+                )
+        except (S3ServiceInvalidArgsException, S3ServiceException) as e:
+            results[index] = {
+                'object_key': object_key,
+                'error': str(e),
+            }
+
+    create_date = datetime.utcnow()
+    new_keys = {
+        valid_uploads[index]['object_key'] for index in signed
+    } - assets.keys()
+    new_assets = [
+        AssetRow(
+            id=None,
+            uploaded_status=UploadedStatus.PENDING.value,
+            bucket=DEFAULT_BUCKET,
+            object_key=object_key,
+            create_date=create_date,
+        )
+        for object_key in sorted(new_keys)
+    ]
+    for asset in AssetDao.insert_many(new_assets, cursor):
+        assets[asset.object_key] = asset
+
+    # Anything we tried to insert but didn't get back was inserted by a
+    # concurrent request after our lookup, so go fetch those rows too
+    raced_keys = new_keys - assets.keys()
+    if raced_keys:
+        for asset in AssetDao.get_by_bucket_and_keys(DEFAULT_BUCKET, raced_keys, cursor):
+            assets[asset.object_key] = asset
+
+    for index, signed_info in signed.items():
+        object_key = valid_uploads[index]['object_key']
+        results[index] = {
+            'object_key': object_key,
+            'signed_info': signed_info,
+            'asset_id': assets[object_key].id,
+        }
+
+    return {
+        'results': results,
+    }
+
 class AccessInvalidArgsException(Exception):
     pass
 
@@ -104,8 +222,11 @@ def _check_valid_access_request(access_request):
         except ValueError:
             raise AccessInvalidArgsException(f'Invalid key: expires_in, Value: {expiration} is not an int')
 
+def _is_complete(asset):
+    return asset is not None and asset.uploaded_status == UploadedStatus.COMPLETE.value
+
 # resolving function for /api/access
-def initiate_access(access_request, cursor):
+def initiate_access(access_request, cursor, primary_checkout=None):
     """
     Creates a signed URL for a get_object operation.
     The signed URL can only be created for the asset if its uploaded_status
@@ -113,11 +234,17 @@ def initiate_access(access_request, cursor):
 
     :param access_request: a dict with keys `asset_id` and `expires_in`, denoting
     the asset's name and the amount of time, in seconds, that the signed URL should last.
+    :param primary_checkout: when `cursor` is on a read replica, DatabaseAccessor.checkout,
+    to look the asset up again on the primary if the replica doesn't have it as complete (yet).
     """
     _check_valid_access_request(access_request)
     asset_id = int(access_request['asset_id'])
     expiration = access_request.get('expires_in')
-    asset = AssetDao.get_by_id(asset_id, cursor)
+    # Only the primary's rows are cached: a replica may not have replayed a status update yet
+    asset = asset_row_cache.get_by_id(asset_id, cursor, populate=primary_checkout is None)
+    if not _is_complete(asset) and primary_checkout is not None:
+        with primary_checkout() as c, c.cursor() as primary_cursor:
+            asset = asset_row_cache.get_by_id(asset_id, primary_cursor)
     if not asset:
         raise AssetNotFoundException(f'Asset with id {asset_id} not found')
 
@@ -144,5 +271,88 @@ def initiate_access(access_request, cursor):
         'asset_id': asset.id,
     }
 
+MAX_BATCH_ACCESS_SIZE = 1000
+
+def _check_valid_batch_access_request(batch_request):
+    asset_ids = batch_request.get('asset_ids', None)
+    expiration = batch_request.get('expires_in', None)
 
+    if asset_ids is None:
+        raise AccessInvalidArgsException('Missing key: asset_ids')
+    if not isinstance(asset_ids, list):
+        raise AccessInvalidArgsException(f'Invalid key: asset_ids, Value: {asset_ids} is not a list')
+    if len(asset_ids) > MAX_BATCH_ACCESS_SIZE:
+        raise AccessInvalidArgsException(
+            f'Invalid key: asset_ids, at most {MAX_BATCH_ACCESS_SIZE} assets can be accessed at once'
+        )
+    if expiration is not None and not isinstance(expiration, int):
+        raise AccessInvalidArgsException(f'Invalid key: expires_in, Value: {expiration} is not an int')
 
+# resolving function for /api/access/batch
+def initiate_batch_access(batch_request, cursor, primary_checkout=None):
+    """
+    Creates signed URLs for get_object operations on many assets at once,
+    looking every asset that isn't cached up with a single query.
+    An asset that can't be accessed (an invalid id, a missing asset, an
+    incomplete upload, a signing error) gets an entry in `errors` instead of
+    failing the whole batch.
+
+    :param batch_request: a dict with keys `asset_ids` and `expires_in`, denoting
+    the assets' ids and the amount of time, in seconds, that every signed URL should last.
+    :param primary_checkout: when `cursor` is on a read replica, DatabaseAccessor.checkout,
+    to look assets up again on the primary if the replica doesn't have them as complete (yet).
+    :return: a dict with keys `urls` and `errors`, each mapping an asset id to its
+    signed URL or error message respectively.
+    """
+    _check_valid_batch_access_request(batch_request)
+    expiration = batch_request.get('expires_in')
+
+    urls = {}
+    errors = {}
+    asset_ids = []
+    for asset_id in batch_request['asset_ids']:
+        try:
+            _check_valid_access_request({'asset_id': asset_id})
+            asset_ids.append(int(asset_id))
+        except (AccessInvalidArgsException, TypeError):
+            errors[str(asset_id)] = f'Invalid asset_id, Value: {asset_id} is not an int'
+
+    assets = {
+        asset.id: asset
+        for asset in asset_row_cache.get_by_ids(set(asset_ids), cursor, populate=primary_checkout is None)
+    }
+    behind = {asset_id for asset_id in asset_ids if not _is_complete(assets.get(asset_id))}
+    if behind and primary_checkout is not None:
+        with primary_checkout() as c, c.cursor() as primary_cursor:
+            assets.update((asset.id, asset) for asset in asset_row_cache.get_by_ids(behind, primary_cursor))
+
+    for asset_id in asset_ids:
+        asset = assets.get(asset_id)
+        if not asset:
+            errors[str(asset_id)] = f'Asset with id {asset_id} not found'
+            continue
+        if asset.uploaded_status != UploadedStatus.COMPLETE.value:
+            errors[str(asset_id)] = 'Asset upload is not yet completed.'
+            continue
+
+        try:
+            if expiration:
+                urls[str(asset_id)] = S3Service.create_signed_url(
+                    S3ClientMethod.GET_OBJECT,
+                    asset.object_key,
+                    bucket_name=asset.bucket,
+                    expiration=expiration,
+                )
+            else:
+                urls[str(asset_id)] = S3Service.create_signed_url(
+                    S3ClientMethod.GET_OBJECT,
+                    asset.object_key,
+                    bucket_name=asset.bucket,
+                )
+        except (S3ServiceInvalidArgsException, S3ServiceException) as e:
+            errors[str(asset_id)] = str(e)
+
+    return {
+        'urls': urls,
+        'errors': errors,
+    }
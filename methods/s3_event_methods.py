@@ -0,0 +1,95 @@
+import json
+from urllib.parse import unquote_plus
+from database.asset_dao import AssetDao, UploadedStatus
+from database.asset_row_cache import asset_row_cache
+
+"""
+"Public" functions that live here essentially map to endpoints 1:1.
+"""
+
+class S3EventInvalidArgsException(Exception):
+    pass
+
+MAX_EVENT_RECORDS = 10000
+
+def _load_json(message, description):
+    try:
+        return json.loads(message)
+    except (TypeError, ValueError):
+        raise S3EventInvalidArgsException(f'Invalid {description}: it is not JSON')
+
+def _s3_records(payload):
+    """
+    Yields every S3 event record in `payload`, unwrapping it from however it
+    was delivered: an S3 event as-is (e.g. to Lambda), an SNS notification
+    holding one, or an SQS batch whose message bodies hold either of those.
+    """
+    if not isinstance(payload, dict):
+        raise S3EventInvalidArgsException(f'Invalid event: {payload} is not an object')
+
+    # SNS, which delivers the S3 event as a JSON string. Anything else SNS
+    # sends (e.g. a SubscriptionConfirmation) has no S3 records in it.
+    if 'Type' in payload:
+        if payload['Type'] == 'Notification':
+            yield from _s3_records(_load_json(payload.get('Message'), 'SNS message'))
+        return
+
+    records = payload.get('Records', [])
+    if not isinstance(records, list):
+        raise S3EventInvalidArgsException(f'Invalid key: Records, Value: {records} is not a list')
+    for record in records:
+        if not isinstance(record, dict):
+            raise S3EventInvalidArgsException(f'Invalid record: {record} is not an object')
+        # SQS, which delivers each S3 event or SNS notification as a JSON string
+        if record.get('eventSource') == 'aws:sqs':
+            yield from _s3_records(_load_json(record.get('body'), 'SQS message body'))
+        elif record.get('eventSource') == 'aws:s3':
+            yield record
+    # Anything else, e.g. the s3:TestEvent sent when notifications are set up, is ignored
+
+def _created_object(record):
+    if not str(record.get('eventName', '')).startswith('ObjectCreated:'):
+        return None
+    try:
+        bucket = record['s3']['bucket']['name']
+        object_key = record['s3']['object']['key']
+    except (KeyError, TypeError):
+        raise S3EventInvalidArgsException(f'Invalid record: {record} has no s3.bucket.name or s3.object.key')
+    # S3 URL-encodes keys in events, with spaces as '+'
+    return bucket, unquote_plus(object_key)
+
+# resolving function for /api/events/s3
+def ingest_s3_events(payload, cursor):
+    """
+    Marks the assets of objects that S3 reports as created complete, from S3
+    event notifications delivered directly, through SNS, or through SQS.
+
+    Every object in the payload is matched and updated with a single statement,
+    and only assets that are still pending (and don't have a multipart upload
+    in progress) are touched, so delivering the same events again is harmless.
+
+    :param payload: an S3 event, SNS notification or SQS batch, as described in `_s3_records`.
+    :return: a dict counting the `records` that reported a created object, and
+    listing the ids of the assets that were `completed` by them.
+    """
+    created = [_created_object(record) for record in _s3_records(payload)]
+    created = [bucket_and_key for bucket_and_key in created if bucket_and_key is not None]
+    if len(created) > MAX_EVENT_RECORDS:
+        raise S3EventInvalidArgsException(
+            f'Invalid event: at most {MAX_EVENT_RECORDS} records can be ingested at once'
+        )
+
+    # Retries and multipart uploads can report the same object more than once
+    completed = AssetDao.update_uploaded_status_by_bucket_key_pairs(
+        sorted(set(created)),
+        UploadedStatus.PENDING.value,
+        UploadedStatus.COMPLETE.value,
+        cursor,
+    )
+    asset_row_cache.invalidate_after_commit(completed, cursor)
+
+    return {
+        'success': True,
+        'records': len(created),
+        'completed': sorted(completed),
+    }
@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+
+# Set REQUEST_METRICS to 'on' to time requests, and the phases of each, for GET /api/metrics
+ENABLED = 'REQUEST_METRICS'
+PREFIX = 'cloud_asset'
+# Upper bounds, in seconds, of the histogram buckets
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+REQUEST_SECONDS = 'request_duration_seconds'
+PHASE_SECONDS = 'phase_duration_seconds'
+QUERY_SECONDS = 'query_duration_seconds'
+REQUESTS = 'requests_total'
+
+_HELP = {
+    REQUEST_SECONDS: ('histogram', 'Time from routing a request to finishing its response.'),
+    PHASE_SECONDS: (
+        'histogram',
+        'Time a request spent checking out a database connection, signing S3 URLs or serializing its response.'
+    ),
+    QUERY_SECONDS: ('histogram', 'Time a request spent running each SQL statement.'),
+    REQUESTS: ('counter', 'Requests finished, by response status code.'),
+}
+_LABEL_NAMES = {
+    REQUEST_SECONDS: ('endpoint', 'method'),
+    PHASE_SECONDS: ('endpoint', 'phase'),
+    QUERY_SECONDS: ('endpoint', 'statement'),
+    REQUESTS: ('endpoint', 'method', 'code'),
+}
+
+_NOT_TIMED = nullcontext()
+
+class _Histogram:
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self, bucket_count):
+        # One more than there are buckets, for observations above the largest
+        self.counts = [0] * (bucket_count + 1)
+        self.sum = 0.0
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, self.labels, time.perf_counter() - self.start)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value)
+
+class RequestMetrics:
+    """
+    Histograms of how long requests take, broken down by endpoint into the
+    time spent checking out a database connection, running each SQL
+    statement, signing S3 URLs and serializing the response, and a count of
+    requests by status code.
+
+    Each request thread says which endpoint it is serving with
+    `begin_request` (see `current_endpoint`), and everything it times until
+    `end_request` is recorded against that endpoint. Work done outside of a
+    request (e.g. by commands, or the status write coalescer's flusher)
+    isn't recorded.
+
+    When disabled, `timer` hands back a shared no-op context manager and
+    nothing is recorded, so instrumented code costs an attribute lookup.
+    """
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._histograms = {}
+        self._counters = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(enabled=os.getenv(ENABLED, 'off') == 'on')
+
+    def begin_request(self, endpoint, method):
+        # The endpoint is noted even when disabled, for current_endpoint
+        self._local.request = (endpoint, method, time.perf_counter() if self.enabled else None)
+
+    def end_request(self, status_code):
+        request = getattr(self._local, 'request', None)
+        if request is None:
+            return
+        self._local.request = None
+        endpoint, method, start = request
+        if start is None:
+            return
+        self.observe(REQUEST_SECONDS, (endpoint, method), time.perf_counter() - start)
+        with self._lock:
+            key = (REQUESTS, (endpoint, method, str(status_code)))
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def current_endpoint(self):
+        """
+        :return: the endpoint this thread is serving, or None outside of a request.
+        """
+        request = getattr(self._local, 'request', None)
+        return request[0] if request else None
+
+    def timer(self, phase):
+        """
+        :return: a context manager that records how long its block took as
+        `phase` of the current request.
+        """
+        request = getattr(self._local, 'request', None) if self.enabled else None
+        if request is None:
+            return _NOT_TIMED
+        return _Timer(self, PHASE_SECONDS, (request[0], phase))
+
+    def query_timer(self, statement_name):
+        request = getattr(self._local, 'request', None) if self.enabled else None
+        if request is None:
+            return _NOT_TIMED
+        return _Timer(self, QUERY_SECONDS, (request[0], statement_name))
+
+    def timed(self, phase):
+        """
+        Decorates a function so every call to it is timed as `phase`.
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(phase):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, name, labels, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = _Histogram(len(self.buckets))
+            histogram.counts[index] += 1
+            histogram.sum += seconds
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """
+        :return: every histogram and counter, in the Prometheus text format.
+        """
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name in (REQUEST_SECONDS, PHASE_SECONDS, QUERY_SECONDS, REQUESTS):
+            metric_type, help_text = _HELP[name]
+            label_names = _LABEL_NAMES[name]
+            lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}_{name} {metric_type}')
+            if metric_type == 'counter':
+                for (counter_name, labels), value in sorted(counters.items()):
+                    if counter_name == name:
+                        lines.append(f'{PREFIX}_{name}{_format_labels(label_names, labels)} {value}')
+                continue
+            for (histogram_name, labels), (counts, total) in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for upper_bound, count in zip((*self.buckets, '+Inf'), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels((*label_names, 'le'), (*labels, upper_bound))
+                    lines.append(f'{PREFIX}_{name}_bucket{bucket_labels} {cumulative}')
+                lines.append(f'{PREFIX}_{name}_sum{_format_labels(label_names, labels)} {_format_value(total)}')
+                lines.append(f'{PREFIX}_{name}_count{_format_labels(label_names, labels)} {cumulative}')
+        return lines
+
+def render_stats(name, stats, counters=()):
+    """
+    Turns one of the `stats()` dicts kept by the pool, caches and coalescer
+    into Prometheus gauges, and counters for the keys in `counters`.
+
+    :param name: prefixed to each key, e.g. 'pool' for `cloud_asset_pool_idle`.
+    """
+    return render_labelled_stats(name, None, {None: stats}, counters)
+
+def render_labelled_stats(name, label_name, stats_by_label, counters=()):
+    """
+    Like `render_stats`, for a dict of stats dicts (all with the same keys),
+    each labelled with `label_name` set to its key in `stats_by_label`.
+    """
+    lines = []
+    keys = next(iter(stats_by_label.values()), {}).keys()
+    for key in keys:
+        metric = f'{PREFIX}_{name}_{key}'
+        values = [
+            (label, stats[key])
+            for label, stats in sorted(stats_by_label.items(), key=lambda item: str(item[0]))
+            if stats.get(key) is not None
+        ]
+        if not values:
+            continue
+        if key in counters:
+            if not metric.endswith('_total'):
+                metric += '_total'
+            lines.append(f'# TYPE {metric} counter')
+        else:
+            lines.append(f'# TYPE {metric} gauge')
+        for label, value in values:
+            labels = _format_labels((label_name,), (label,)) if label_name else ''
+            lines.append(f'{metric}{labels} {_format_value(value)}')
+    return lines
+
+request_metrics = RequestMetrics.from_env()
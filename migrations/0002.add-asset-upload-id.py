@@ -0,0 +1,11 @@
+from yoyo import step
+steps = [
+   step(
+       '''
+       alter table asset add column upload_id varchar(1024)
+       ''',
+       '''
+       alter table asset drop column upload_id
+       ''',
+   ),
+]
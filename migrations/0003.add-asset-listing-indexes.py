@@ -0,0 +1,28 @@
+from yoyo import step
+
+# Postgres can't build an index concurrently inside a transaction, and building
+# them concurrently keeps the asset table writable while they build
+__transactional__ = False
+
+# Listing assets pages by (create_date, id), so these make each page an index
+# range scan that starts where the last one left off, however deep it is
+steps = [
+   step(
+       '''
+       create index concurrently if not exists asset_create_date_id_idx
+       on asset(create_date, id)
+       ''',
+       '''
+       drop index concurrently if exists asset_create_date_id_idx
+       ''',
+   ),
+   step(
+       '''
+       create index concurrently if not exists asset_uploaded_status_create_date_id_idx
+       on asset(uploaded_status, create_date, id)
+       ''',
+       '''
+       drop index concurrently if exists asset_uploaded_status_create_date_id_idx
+       ''',
+   ),
+]
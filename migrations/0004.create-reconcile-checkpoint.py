@@ -0,0 +1,15 @@
+from yoyo import step
+steps = [
+   step(
+       '''
+       create table reconcile_checkpoint(
+           bucket varchar(255) primary key,
+           start_after varchar(1024) not null,
+           update_date timestamp not null default now()
+       )
+       ''',
+       '''
+       drop table reconcile_checkpoint
+       ''',
+   ),
+]
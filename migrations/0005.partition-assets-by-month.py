@@ -0,0 +1,85 @@
+from yoyo import step
+
+# Partitions the asset table by month of create_date, so that old months can be
+# detached (and archived or dropped) without deleting rows, and each month's
+# indexes stay the size of a month. See commands/maintain_asset_partitions.py.
+#
+# A unique constraint on a partitioned table has to include the partition key,
+# so bucket_object_key_uq moves to asset_key, which holds every asset's
+# (bucket, object_key) along with the (id, create_date) that finds its row.
+#
+# Copies the whole table, holding a lock on it throughout.
+steps = [
+   step(
+       '''
+       alter sequence asset_id_seq owned by none;
+       alter table asset rename to asset_unpartitioned;
+
+       create table asset(
+           id bigint not null default nextval('asset_id_seq'),
+           uploaded_status varchar(255) not null,
+           bucket varchar(255) not null,
+           object_key varchar(255) not null,
+           create_date timestamp not null default now(),
+           upload_id varchar(1024)
+       ) partition by range (create_date);
+
+       -- A month for every month there are assets in, and the three months to come
+       do $$
+       declare
+           month timestamp := date_trunc('month', coalesce((select min(create_date) from asset_unpartitioned), now()));
+       begin
+           while month < date_trunc('month', now()) + interval '4 months' loop
+               execute format(
+                   'create table %I partition of asset for values from (%L) to (%L)',
+                   to_char(month, '"asset_"YYYY_MM'), month, month + interval '1 month'
+               );
+               month := month + interval '1 month';
+           end loop;
+       end
+       $$;
+       -- Catches assets dated past the last month, until it's created
+       create table asset_default partition of asset default;
+
+       create table asset_key(
+           bucket varchar(255) not null,
+           object_key varchar(255) not null,
+           id bigint not null,
+           create_date timestamp not null
+       );
+
+       insert into asset select * from asset_unpartitioned;
+       insert into asset_key select bucket, object_key, id, create_date from asset_unpartitioned;
+       drop table asset_unpartitioned;
+
+       alter table asset add constraint asset_pkey primary key (id, create_date);
+       create index asset_create_date_id_idx on asset(create_date, id);
+       create index asset_uploaded_status_create_date_id_idx on asset(uploaded_status, create_date, id);
+       alter table asset_key add constraint bucket_object_key_uq primary key (bucket, object_key);
+       alter table asset_key add constraint asset_key_id_uq unique (id);
+       alter sequence asset_id_seq owned by asset.id;
+       ''',
+       '''
+       alter sequence asset_id_seq owned by none;
+       alter table asset rename to asset_partitioned;
+
+       create table asset(
+           id bigint not null default nextval('asset_id_seq'),
+           uploaded_status varchar(255) not null,
+           bucket varchar(255) not null,
+           object_key varchar(255) not null,
+           create_date timestamp not null default now(),
+           upload_id varchar(1024)
+       );
+       insert into asset select * from asset_partitioned;
+       drop table asset_partitioned;
+       drop table asset_key;
+
+       alter table asset add constraint asset_pkey primary key (id);
+       alter table asset add constraint bucket_object_key_uq unique (bucket, object_key);
+       create index asset_create_date_id_idx on asset(create_date, id);
+       create index asset_uploaded_status_create_date_id_idx on asset(uploaded_status, create_date, id);
+       alter sequence asset_id_seq owned by asset.id;
+       ''',
+   ),
+]
@@ -0,0 +1,270 @@
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+import cherrypy
+from cherrypy._cpwsgi_server import CPWSGIServer
+from cherrypy.process.servers import ServerAdapter
+
+logger = logging.getLogger('prefork')
+
+# Seconds a stopping worker gets to finish the requests it's serving before it is killed
+WORKER_STOP_TIMEOUT = 30.0
+# A worker that exits within this many seconds of starting is replaced after a delay,
+# which doubles (up to MAX_RESTART_DELAY) for as long as workers keep exiting that soon
+MIN_WORKER_UPTIME = 5.0
+RESTART_DELAY = 0.5
+MAX_RESTART_DELAY = 30.0
+
+_SIGNALS = {signal.SIGCHLD, signal.SIGHUP, signal.SIGINT, signal.SIGTERM}
+
+def open_listening_socket(host, port, backlog):
+    """
+    Binds and listens on (host, port) once, in the supervisor, for every
+    worker to accept connections from.
+    """
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Inherited by every accepted connection, as with cherrypy.server's own socket
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.bind((host, port))
+        sock.listen(backlog)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+class _SharedSocketWSGIServer(CPWSGIServer):
+    def __init__(self, listen_socket):
+        super().__init__(cherrypy.server)
+        self.listen_socket = listen_socket
+
+    def bind(self, family, type, proto=0):
+        # A copy, since stopping closes it and the socket is still needed by the next worker forked
+        sock = self.socket = self.listen_socket.dup()
+        self.bind_addr = sock.getsockname()[:2]
+        return sock
+
+class SharedSocketServer(ServerAdapter):
+    """
+    Serves cherrypy.tree, with cherrypy.server's settings, from a socket that
+    is already listening. Used by workers in place of cherrypy.server, which
+    waits for its port to be free before starting and after stopping, and so
+    can't share one.
+    """
+    def __init__(self, bus, listen_socket):
+        super().__init__(bus, _SharedSocketWSGIServer(listen_socket))
+
+    @property
+    def description(self):
+        host, port = self.httpserver.listen_socket.getsockname()[:2]
+        return f'http://{host}:{port} (shared)'
+
+def use_listening_socket(listen_socket):
+    """
+    Has cherrypy.engine serve from `listen_socket`, in a worker, instead of
+    from cherrypy.server. Call it once CherryPy is configured, as the server
+    settings are read here.
+    """
+    cherrypy.server.unsubscribe()
+    SharedSocketServer(cherrypy.engine, listen_socket).subscribe()
+    # SIGHUP is for the supervisor, which reloads by replacing its workers.
+    # CherryPy would otherwise re-exec the worker as the whole server again
+    cherrypy.engine.signal_handler.handlers.pop('SIGHUP', None)
+
+def _describe_exit(status):
+    if os.WIFSIGNALED(status):
+        return f'was killed by signal {os.WTERMSIG(status)}'
+    return f'exited with code {os.WEXITSTATUS(status)}'
+
+class PreforkSupervisor:
+    """
+    Forks `workers` processes that each run `serve(listen_socket)`, and keeps
+    that many running until it is told to stop. All of them accept
+    connections from the one listening socket, so one that is stopping or
+    starting never causes a connection to be refused; it just waits in the
+    socket's backlog for another worker.
+
+    Signals:
+    - SIGHUP: reloads, starting a fresh set of workers and then stopping the
+      old ones with SIGTERM, which lets them finish the requests they're serving.
+    - SIGTERM, SIGINT: stops every worker with SIGTERM (killing those that
+      are still running after `stop_timeout`), then returns from run().
+    A worker that exits by itself is replaced.
+
+    Workers ignore SIGHUP and SIGINT, which a terminal sends to the whole
+    process group, leaving it to the supervisor to act on them.
+    """
+    def __init__(
+        self,
+        serve,
+        listen_socket,
+        workers,
+        stop_timeout=WORKER_STOP_TIMEOUT,
+        min_uptime=MIN_WORKER_UPTIME,
+        restart_delay=RESTART_DELAY,
+        max_restart_delay=MAX_RESTART_DELAY
+    ):
+        if workers < 1:
+            raise ValueError(f'Expected at least 1 worker, got {workers}')
+        self.serve = serve
+        self.listen_socket = listen_socket
+        self.workers = workers
+        self.stop_timeout = stop_timeout
+        self.min_uptime = min_uptime
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        # pid -> when it was started, for every worker that hasn't been reaped
+        self._started = {}
+        # pid -> when to kill it (None once it has been), for workers that were sent SIGTERM
+        self._stopping = {}
+        self._next_restart_delay = 0
+        self._restart_at = None
+        self._signal_mask = None
+
+    def run(self):
+        # Signals are waited for, rather than handled, so they're dealt with one at a time between forks
+        self._signal_mask = signal.pthread_sigmask(signal.SIG_BLOCK, _SIGNALS)
+        try:
+            self._start_workers()
+            while True:
+                signum = self._wait_for_signal()
+                if signum == signal.SIGCHLD:
+                    self._reap()
+                elif signum == signal.SIGHUP:
+                    self._reload()
+                elif signum in (signal.SIGINT, signal.SIGTERM):
+                    logger.info(f'Stopping {len(self._started)} workers')
+                    break
+                self._kill_overdue()
+                self._start_workers()
+        finally:
+            self._stop_all()
+            signal.pthread_sigmask(signal.SIG_SETMASK, self._signal_mask)
+
+    def _worker_pids(self):
+        # Leaving out any being stopped
+        return sorted(pid for pid in self._started if pid not in self._stopping)
+
+    def _wait_for_signal(self):
+        """
+        :return: the signal received, or None if it's time to start or kill a worker first.
+        """
+        deadlines = [deadline for deadline in self._stopping.values() if deadline is not None]
+        if self._restart_at is not None:
+            deadlines.append(self._restart_at)
+        if not deadlines:
+            return signal.sigwaitinfo(_SIGNALS).si_signo
+        info = signal.sigtimedwait(_SIGNALS, max(0, min(deadlines) - time.monotonic()))
+        return info.si_signo if info else None
+
+    def _start_workers(self):
+        if self._restart_at is not None:
+            if time.monotonic() < self._restart_at:
+                return
+            self._restart_at = None
+        for _ in range(self.workers - len(self._worker_pids())):
+            self._fork()
+
+    def _fork(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self._started[pid] = time.monotonic()
+        logger.info(f'Started worker {pid}')
+
+    def _run_worker(self):
+        code = 1
+        try:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.pthread_sigmask(signal.SIG_SETMASK, self._signal_mask)
+            self.serve(self.listen_socket)
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # Never return into the supervisor's loop, or run its cleanup
+            os._exit(code)
+
+    def _reap(self):
+        while self._started:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self._started.pop(pid, None)
+            if started is None:
+                continue
+            if pid in self._stopping:
+                del self._stopping[pid]
+                logger.info(f'Worker {pid} {_describe_exit(status)} after being stopped')
+                continue
+            uptime = time.monotonic() - started
+            if uptime >= self.min_uptime:
+                self._next_restart_delay = 0
+                logger.warning(f'Worker {pid} {_describe_exit(status)} after {uptime:.1f}s, replacing it')
+                continue
+            # Workers that exit together are replaced together, after the one delay
+            if self._restart_at is None:
+                self._next_restart_delay = min(
+                    max(self.restart_delay, self._next_restart_delay * 2), self.max_restart_delay
+                )
+                self._restart_at = time.monotonic() + self._next_restart_delay
+            logger.error(
+                f'Worker {pid} {_describe_exit(status)} {uptime:.1f}s after starting, '
+                f'replacing it in {max(0, self._restart_at - time.monotonic()):.1f}s'
+            )
+
+    def _reload(self):
+        old_pids = self._worker_pids()
+        logger.info(f'Reloading, replacing workers {old_pids}')
+        # Asked for explicitly, so it doesn't wait out a restart delay
+        self._restart_at = None
+        self._next_restart_delay = 0
+        for _ in range(self.workers):
+            self._fork()
+        self._terminate(old_pids)
+
+    def _terminate(self, pids):
+        deadline = time.monotonic() + self.stop_timeout
+        for pid in pids:
+            self._stopping[pid] = deadline
+            self._signal(pid, signal.SIGTERM)
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self._stopping.items()):
+            if deadline is not None and deadline <= now:
+                logger.warning(f'Worker {pid} took longer than {self.stop_timeout}s to stop, killing it')
+                self._signal(pid, signal.SIGKILL)
+                self._stopping[pid] = None
+
+    def _stop_all(self):
+        self._restart_at = None
+        self._terminate(self._worker_pids())
+        while self._started:
+            signum = self._wait_for_signal()
+            if signum == signal.SIGCHLD:
+                self._reap()
+            elif signum in (signal.SIGINT, signal.SIGTERM):
+                # Asked twice, so don't wait for requests to finish
+                for pid in self._started:
+                    self._stopping[pid] = 0
+            self._kill_overdue()
+
+    @staticmethod
+    def _signal(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            # Already exited, and waiting to be reaped
+            pass
@@ -57,3 +57,71 @@ class ApiUploadIntegrationTest(BaseIntegrationTest):
             self.assertTrue(
                 'Asset upload is not yet completed.' in response.content.decode()
             )
+
+    def test_batch_access_request(self):
+        with self.connection.cursor() as cur:
+            completed_asset_row = AssetDao.insert_one(AssetRow(
+                id=None,
+                uploaded_status=UploadedStatus.COMPLETE.value,
+                bucket=DEFAULT_BUCKET,
+                object_key='abc',
+                create_date=datetime.now(),
+            ), cur)
+            pending_asset_row = AssetDao.insert_one(AssetRow(
+                id=None,
+                uploaded_status=UploadedStatus.PENDING.value,
+                bucket=DEFAULT_BUCKET,
+                object_key='def',
+                create_date=datetime.now(),
+            ), cur)
+
+        with run_server():
+            response = self.request(
+                'post',
+                '/access/batch',
+                data=json.dumps({
+                    'asset_ids': [completed_asset_row.id, pending_asset_row.id, 1337],
+                    'expires_in': 120,
+                }),
+            )
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), {
+                'urls': {
+                    str(completed_asset_row.id): self.get_object_url_response,
+                },
+                'errors': {
+                    str(pending_asset_row.id): 'Asset upload is not yet completed.',
+                    '1337': 'Asset with id 1337 not found',
+                },
+            })
+
+    def test_access_request_after_status_change(self):
+        with self.connection.cursor() as cur:
+            completed_asset_row = AssetDao.insert_one(AssetRow(
+                id=None,
+                uploaded_status=UploadedStatus.COMPLETE.value,
+                bucket=DEFAULT_BUCKET,
+                object_key='abc',
+                create_date=datetime.now(),
+            ), cur)
+
+        with run_server():
+            response = self.request('get', f'/access?asset_id={completed_asset_row.id}')
+            self.assertEqual(response.status_code, 200)
+
+            response = self.request(
+                'put',
+                '/status',
+                data=json.dumps({
+                    'asset_id': completed_asset_row.id,
+                    'uploaded_status': UploadedStatus.PENDING.value,
+                })
+            )
+            self.assertEqual(response.status_code, 200)
+
+            response = self.request('get', f'/access?asset_id={completed_asset_row.id}')
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(
+                'Asset upload is not yet completed.' in response.content.decode()
+            )
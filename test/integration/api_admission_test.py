@@ -0,0 +1,122 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import patch
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from endpoints.admission import admission_controller
+from external_services.s3_service import DEFAULT_BUCKET
+from .base_integration_test import BaseIntegrationTest
+from .test_utils import run_server
+
+class ApiAdmissionIntegrationTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        with self.connection.cursor() as cur:
+            self.asset = AssetDao.insert_one(AssetRow(
+                id=None,
+                uploaded_status=UploadedStatus.COMPLETE.value,
+                bucket=DEFAULT_BUCKET,
+                object_key='abc',
+                create_date=datetime.now(),
+            ), cur)
+        self.s3_client_mock.generate_presigned_url.return_value = 'yay://a.url.com'
+        # Uploads hang until released, so they pile up
+        self.release_uploads = threading.Event()
+        self.uploads_started = threading.Semaphore(0)
+
+        def generate_presigned_post(*args, **kwargs):
+            self.uploads_started.release()
+            self.release_uploads.wait(10)
+            return {'url': 'yay://a.url.com', 'fields': {}}
+        self.s3_client_mock.generate_presigned_post.side_effect = generate_presigned_post
+        admission_controller.reset()
+
+    def tearDown(self):
+        self.release_uploads.set()
+        admission_controller.reset()
+        super().tearDown()
+
+    def upload(self, object_key):
+        return self.request('post', '/upload', data=json.dumps({'object_key': object_key}))
+
+    @patch.object(admission_controller, 'limits', {'/api/upload': (1, 1)})
+    @patch.object(admission_controller, 'max_wait', 10)
+    @patch.object(admission_controller, 'enabled', True)
+    def test_burst_is_shed_on_its_own_endpoint(self):
+        with run_server(), ThreadPoolExecutor(2) as executor:
+            running = executor.submit(self.upload, 'one')
+            self.assertTrue(self.uploads_started.acquire(timeout=10))
+            queued = executor.submit(self.upload, 'two')
+            self.wait_for(lambda: admission_controller.stats()['/api/upload']['queued'] == 1)
+
+            # Running and queue both full, so the next upload is turned away...
+            shed = self.upload('three')
+            self.assertEqual(shed.status_code, 503)
+            self.assertEqual(shed.headers['Retry-After'], '1')
+            # ...while other endpoints carry on as normal
+            access = self.request('get', f'/access?asset_id={self.asset.id}')
+            self.assertEqual(access.status_code, 200)
+            metrics = self.request('get', '/metrics').content.decode().splitlines()
+
+            self.release_uploads.set()
+            self.assertEqual(running.result().status_code, 200)
+            self.assertEqual(queued.result().status_code, 200)
+
+        for expected in (
+            'cloud_asset_admission_max_concurrent{endpoint="/api/upload"} 1',
+            'cloud_asset_admission_active{endpoint="/api/upload"} 1',
+            'cloud_asset_admission_queued{endpoint="/api/upload"} 1',
+            'cloud_asset_admission_rejected_total{endpoint="/api/upload"} 1',
+            'cloud_asset_admission_max_concurrent{endpoint="/api/access"} 4',
+        ):
+            self.assertIn(expected, metrics)
+        self.assertEqual(admission_controller.stats()['/api/upload']['active'], 0)
+
+    @patch.object(admission_controller, 'limits', {'/api/upload': (1, 1)})
+    @patch.object(admission_controller, 'max_wait', 10)
+    @patch.object(admission_controller, 'enabled', True)
+    def test_extra_path_segments_share_endpoint_bulkhead(self):
+        """
+        Given:
+            Uploads fill /api/upload's limit and queue
+        Then:
+            A request to /api/upload with extra path segments is shed along with them, and requests
+            that don't route to an endpoint share one bulkhead
+        """
+        with run_server(), ThreadPoolExecutor(2) as executor:
+            running = executor.submit(self.upload, 'one')
+            self.assertTrue(self.uploads_started.acquire(timeout=10))
+            queued = executor.submit(self.upload, 'two')
+            self.wait_for(lambda: admission_controller.stats()['/api/upload']['queued'] == 1)
+
+            suffixed = self.request('post', '/upload/extra/segments', data=json.dumps({'object_key': 'three'}))
+            self.assertEqual(suffixed.status_code, 503)
+            self.assertEqual(self.request('delete', '/upload').status_code, 405)
+            self.assertEqual(self.request('delete', '/access').status_code, 405)
+
+            self.release_uploads.set()
+            self.assertEqual(running.result().status_code, 200)
+            self.assertEqual(queued.result().status_code, 200)
+
+        stats = admission_controller.stats()
+        self.assertEqual(set(stats), {'/api/upload', 'unmatched'})
+        self.assertEqual(stats['/api/upload']['rejected'], 1)
+        self.assertEqual(stats['unmatched']['admitted'], 2)
+
+    def test_disabled(self):
+        with run_server(), ThreadPoolExecutor(8) as executor:
+            uploads = [executor.submit(self.upload, f'key{index}') for index in range(8)]
+            for _ in uploads:
+                self.assertTrue(self.uploads_started.acquire(timeout=10))
+            self.release_uploads.set()
+
+            self.assertEqual([upload.result().status_code for upload in uploads], [200] * 8)
+        self.assertEqual(admission_controller.stats(), {})
+
+    def wait_for(self, condition):
+        for _ in range(1000):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        self.fail('Timed out waiting')
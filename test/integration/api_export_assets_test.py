@@ -0,0 +1,55 @@
+import io
+import json
+from datetime import datetime
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from external_services.s3_service import DEFAULT_BUCKET
+from commands.export_assets import export
+from .base_integration_test import BaseIntegrationTest
+from .test_utils import run_server
+
+class ApiExportAssetsIntegrationTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        with self.connection.cursor() as cur:
+            self.expected = [
+                {
+                    'asset_id': asset.id,
+                    'uploaded_status': asset.uploaded_status,
+                    'bucket': asset.bucket,
+                    'object_key': asset.object_key,
+                    'create_date': asset.create_date.isoformat(),
+                }
+                for asset in AssetDao.insert_many([
+                    AssetRow(
+                        id=None,
+                        uploaded_status=UploadedStatus.PENDING.value,
+                        bucket=DEFAULT_BUCKET,
+                        object_key=f'key{index}',
+                        create_date=datetime(2020, 1, 1, 0, 0, index),
+                    )
+                    for index in range(25)
+                ], cur)
+            ]
+
+    def test_streams_every_asset(self):
+        with run_server():
+            response = self.request('get', '/assets/export')
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+            # Streamed, so there's no Content-Length to buffer the body for
+            self.assertNotIn('Content-Length', response.headers)
+            exported = [json.loads(line) for line in response.content.decode().splitlines()]
+
+            # The connection went back to the pool once the body was sent
+            self.assertEqual(self.request('get', '/assets?limit=1').status_code, 200)
+
+        self.assertCountEqual(exported, self.expected)
+
+    def test_command(self):
+        output = io.StringIO()
+
+        count = export(output, itersize=4)
+
+        self.assertEqual(count, 25)
+        self.assertCountEqual([json.loads(line) for line in output.getvalue().splitlines()], self.expected)
@@ -0,0 +1,95 @@
+import json
+from datetime import datetime, timedelta
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus, LIST_PAGE
+from external_services.s3_service import DEFAULT_BUCKET
+from .base_integration_test import BaseIntegrationTest
+from .test_utils import run_server
+
+class ApiListAssetsIntegrationTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        start = datetime(2020, 1, 1)
+        with self.connection.cursor() as cur:
+            # Pairs of assets share a create_date, so paging has to break ties on id
+            self.assets = [
+                AssetDao.insert_one(AssetRow(
+                    id=None,
+                    uploaded_status=UploadedStatus.COMPLETE.value if index % 3 else UploadedStatus.PENDING.value,
+                    bucket=DEFAULT_BUCKET,
+                    object_key=f'key{index}',
+                    create_date=start + timedelta(days=index // 2),
+                ), cur)
+                for index in range(9)
+            ]
+
+    def list_all(self, query):
+        asset_ids = []
+        page_count = 0
+        cursor = None
+        while True:
+            page_query = f'{query}&cursor={cursor}' if cursor else query
+            response = self.request('get', f'/assets?{page_query}')
+            self.assertEqual(response.status_code, 200)
+            response_body = json.loads(response.content)
+            asset_ids += [asset['asset_id'] for asset in response_body['assets']]
+            page_count += 1
+            cursor = response_body['next_cursor']
+            if cursor is None:
+                return asset_ids, page_count
+
+    def test_pages_through_every_asset(self):
+        with run_server():
+            asset_ids, page_count = self.list_all('limit=2')
+
+        self.assertEqual(asset_ids, [asset.id for asset in self.assets])
+        self.assertEqual(page_count, 5)
+
+    def test_filters(self):
+        with run_server():
+            asset_ids, _ = self.list_all(
+                'limit=2&uploaded_status=complete'
+                f'&bucket={DEFAULT_BUCKET}&created_after=2020-01-02&created_before=2020-01-04'
+            )
+            response = self.request('get', '/assets?bucket=some-other-bucket')
+
+        self.assertEqual(asset_ids, [
+            asset.id for asset in self.assets
+            if asset.uploaded_status == UploadedStatus.COMPLETE.value
+            and datetime(2020, 1, 2) <= asset.create_date < datetime(2020, 1, 4)
+        ])
+        self.assertEqual(json.loads(response.content), {'assets': [], 'next_cursor': None})
+
+    def test_invalid_cursor(self):
+        with run_server():
+            response = self.request('get', '/assets?cursor=abc')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue('Invalid key: cursor' in response.content.decode())
+
+    def test_repeated_parameter(self):
+        with run_server():
+            responses = [
+                self.request('get', f'/assets?{query}')
+                for query in ('limit=1&limit=2', 'created_after=2020-01-01&created_after=2020-01-02')
+            ]
+
+        for response in responses:
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue('is not a string' in response.content.decode())
+
+    def test_pages_are_index_range_scans(self):
+        # The table is tiny, so make the planner show what it would do with a big one
+        with self.connection.cursor() as cur:
+            cur.execute('set enable_seqscan = off')
+            cur.execute('set enable_bitmapscan = off')
+            for present in ((False,) * 5, (False, False, False, False, True), (True, False, False, False, True)):
+                statement = LIST_PAGE[present]
+                params = [UploadedStatus.COMPLETE.value] if present[0] else []
+                if present[-1]:
+                    params += [datetime(2020, 1, 3), 5]
+                cur.execute('explain ' + statement.sql, (*params, 100))
+                plan = '\n'.join(row[0] for row in cur.fetchall())
+
+                self.assertTrue('Index Scan using asset_' in plan and 'create_date_id_idx' in plan, plan)
+                # Each month's partition is read in index order and merged, never sorted
+                self.assertNotRegex(plan, r'(^|->  )Sort ', plan)
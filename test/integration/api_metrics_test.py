@@ -0,0 +1,108 @@
+import json
+from datetime import datetime
+from unittest.mock import patch
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from external_services.s3_service import DEFAULT_BUCKET
+from database.query_tracer import query_tracer
+from metrics.request_metrics import request_metrics
+from .base_integration_test import BaseIntegrationTest
+from .test_utils import run_server
+
+class ApiMetricsIntegrationTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        self.s3_client_mock.generate_presigned_url.return_value = 'yay://a.url.com'
+        with self.connection.cursor() as cur:
+            self.asset = AssetDao.insert_one(AssetRow(
+                id=None,
+                uploaded_status=UploadedStatus.COMPLETE.value,
+                bucket=DEFAULT_BUCKET,
+                object_key='abc',
+                create_date=datetime.now(),
+            ), cur)
+        request_metrics.reset()
+
+    def tearDown(self):
+        request_metrics.reset()
+        super().tearDown()
+
+    def get_metrics(self):
+        response = self.request('get', '/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+        return response.content.decode().splitlines()
+
+    @patch.object(request_metrics, 'enabled', True)
+    def test_access_breakdown(self):
+        with run_server():
+            response = self.request('get', f'/access?asset_id={self.asset.id}')
+            self.assertEqual(json.loads(response.content), {'url': 'yay://a.url.com', 'asset_id': self.asset.id})
+            self.assertEqual(self.request('get', '/access?asset_id=a').status_code, 400)
+            self.assertEqual(self.request('delete', '/access').status_code, 405)
+
+            lines = self.get_metrics()
+
+        for expected in (
+            'cloud_asset_requests_total{endpoint="/api/access",method="GET",code="200"} 1',
+            'cloud_asset_requests_total{endpoint="/api/access",method="GET",code="400"} 1',
+            'cloud_asset_requests_total{endpoint="unmatched",method="DELETE",code="405"} 1',
+            'cloud_asset_request_duration_seconds_count{endpoint="/api/access",method="GET"} 2',
+            'cloud_asset_phase_duration_seconds_count{endpoint="/api/access",phase="checkout"} 2',
+            'cloud_asset_phase_duration_seconds_count{endpoint="/api/access",phase="sign"} 1',
+            'cloud_asset_phase_duration_seconds_count{endpoint="/api/access",phase="serialize"} 1',
+            'cloud_asset_query_duration_seconds_count{endpoint="/api/access",statement="asset_get_by_id"} 1',
+            'cloud_asset_pool_checkouts_total 2',
+        ):
+            self.assertIn(expected, lines)
+        self.assertTrue(any(line.startswith('cloud_asset_signed_url_cache_misses_total ') for line in lines))
+        # Scraping isn't itself timed
+        self.assertFalse(any('endpoint="/api/metrics"' in line for line in lines))
+
+    @patch.object(request_metrics, 'enabled', True)
+    def test_extra_path_segments_share_endpoint_label(self):
+        """
+        Given:
+            Requests with extra path segments after an endpoint
+        Then:
+            They're labelled with the endpoint they routed to rather than their own paths
+        """
+        with run_server():
+            # The extra segments are passed to the handler as arguments, which it rejects
+            self.assertEqual(self.request('get', '/access/junk').status_code, 400)
+            self.assertEqual(self.request('get', '/access//more/junk/').status_code, 400)
+
+            lines = self.get_metrics()
+
+        self.assertIn('cloud_asset_requests_total{endpoint="/api/access",method="GET",code="400"} 2', lines)
+        self.assertFalse(any('junk' in line for line in lines))
+
+    def test_disabled(self):
+        with run_server():
+            self.assertEqual(self.request('get', f'/access?asset_id={self.asset.id}').status_code, 200)
+
+            lines = self.get_metrics()
+
+        self.assertFalse(any(line.startswith('cloud_asset_request') for line in lines))
+        self.assertIn('cloud_asset_pool_checkouts_total 1', lines)
+        self.assertIn('cloud_asset_status_write_coalescer_enabled 0', lines)
+
+    @patch.object(query_tracer, 'threshold', 1e-9)
+    def test_slow_query_log(self):
+        self.s3_client_mock.generate_presigned_post.return_value = {'url': 'yay://a.url.com', 'fields': {}}
+
+        with run_server(), self.assertLogs('slow_query', 'WARNING') as logs:
+            response = self.request('post', '/upload', data=json.dumps({'object_key': 'def'}))
+            self.assertEqual(response.status_code, 200)
+
+            lines = self.get_metrics()
+
+        upload_log = next(line for line in logs.output if 'asset_insert_or_get' in line)
+        self.assertIn('from /api/upload', upload_log)
+        self.assertIn('actual time=', upload_log)
+        self.assertTrue(any(
+            line.startswith('cloud_asset_statement_calls_total{statement="asset_insert_or_get"} ') for line in lines
+        ))
+        # Explaining ran the insert again, but rolled it back
+        with self.connection.cursor() as cur:
+            cur.execute('select object_key from asset order by id')
+            self.assertEqual(cur.fetchall(), [('abc',), ('def',)])
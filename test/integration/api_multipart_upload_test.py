@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import boto3
+import requests
+try:
+    from moto import mock_aws
+except ImportError: # moto < 5
+    from moto import mock_s3 as mock_aws
+from database.asset_dao import AssetDao, UploadedStatus
+from external_services.s3_service import S3Service, DEFAULT_BUCKET
+from methods.multipart_upload_methods import MIN_PART_SIZE
+from .base_integration_test import BaseIntegrationTest
+from .test_utils import run_server
+
+class ApiMultipartUploadIntegrationTest(BaseIntegrationTest):
+    """
+    Runs against moto's in-process stand-in for S3, which also answers the
+    PUTs made to the signed part URLs.
+    """
+    def setUp(self):
+        super().setUp()
+        self.s3_mock = mock_aws()
+        self.s3_mock.start()
+        self.s3_client = boto3.client('s3', region_name='us-east-1')
+        self.s3_client.create_bucket(Bucket=DEFAULT_BUCKET)
+        self.s3_client_patcher = patch.object(S3Service, 's3_client', self.s3_client)
+        self.s3_client_patcher.start()
+
+    def tearDown(self):
+        self.s3_client_patcher.stop()
+        self.s3_mock.stop()
+        super().tearDown()
+
+    def _initiate(self, object_key, size):
+        response = self.request(
+            'post',
+            '/upload/multipart',
+            data=json.dumps({'object_key': object_key, 'size': size, 'part_size': MIN_PART_SIZE}),
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_parallel_part_upload(self):
+        body = bytes(range(256)) * (MIN_PART_SIZE * 2 // 256) + b'the last part'
+
+        with run_server():
+            upload = self._initiate('big.bin', len(body))
+            self.assertEqual(len(upload['parts']), 3)
+
+            def put_part(part):
+                start = (part['part_number'] - 1) * upload['part_size']
+                response = requests.put(part['url'], data=body[start:start + upload['part_size']])
+                self.assertEqual(response.status_code, 200)
+                return {'part_number': part['part_number'], 'etag': response.headers['ETag']}
+
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                parts = list(executor.map(put_part, upload['parts']))
+
+            response = self.request(
+                'post',
+                '/upload/multipart/complete',
+                data=json.dumps({'asset_id': upload['asset_id'], 'parts': parts}),
+            )
+            self.assertEqual(response.status_code, 200)
+
+        stored = self.s3_client.get_object(Bucket=DEFAULT_BUCKET, Key='big.bin')['Body'].read()
+        self.assertEqual(stored, body)
+        with self.connection.cursor() as cur:
+            asset = AssetDao.get_by_id(upload['asset_id'], cur)
+        self.assertEqual(asset.uploaded_status, UploadedStatus.COMPLETE.value)
+        self.assertIsNone(asset.upload_id)
+
+    def test_complete_without_listing_parts(self):
+        with run_server():
+            upload = self._initiate('small.bin', 10)
+            requests.put(upload['parts'][0]['url'], data=b'0123456789')
+
+            response = self.request(
+                'post',
+                '/upload/multipart/complete',
+                data=json.dumps({'asset_id': upload['asset_id']}),
+            )
+            self.assertEqual(response.status_code, 200)
+
+        stored = self.s3_client.get_object(Bucket=DEFAULT_BUCKET, Key='small.bin')['Body'].read()
+        self.assertEqual(stored, b'0123456789')
+
+    def test_abort(self):
+        with run_server():
+            upload = self._initiate('aborted.bin', 10)
+
+            response = self.request(
+                'post',
+                '/upload/multipart/abort',
+                data=json.dumps({'asset_id': upload['asset_id']}),
+            )
+            self.assertEqual(response.status_code, 200)
+
+            response = self.request(
+                'post',
+                '/upload/multipart/complete',
+                data=json.dumps({'asset_id': upload['asset_id']}),
+            )
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(
+            self.s3_client.list_multipart_uploads(Bucket=DEFAULT_BUCKET).get('Uploads', []),
+            []
+        )
+        with self.connection.cursor() as cur:
+            asset = AssetDao.get_by_id(upload['asset_id'], cur)
+        self.assertEqual(asset.uploaded_status, UploadedStatus.PENDING.value)
+        self.assertIsNone(asset.upload_id)
+
+    def test_restarting_replaces_previous_upload(self):
+        with run_server():
+            first = self._initiate('restarted.bin', 10)
+            second = self._initiate('restarted.bin', 10)
+
+        self.assertEqual(first['asset_id'], second['asset_id'])
+        self.assertEqual(
+            [upload['UploadId'] for upload in self.s3_client.list_multipart_uploads(Bucket=DEFAULT_BUCKET)['Uploads']],
+            [second['upload_id']]
+        )
+
+    def test_concurrent_restarts_replace_previous_upload_once(self):
+        """
+        Given:
+            Two requests restart the multipart upload of the same key at once
+        Then:
+            The second waits for the first to commit, so it replaces the first's upload rather than leaking one
+        """
+        create_multipart_upload = S3Service.create_multipart_upload
+        lock = threading.Lock()
+        in_progress = []
+        overlapped = []
+
+        def slow_create_multipart_upload(*args, **kwargs):
+            with lock:
+                overlapped.extend(in_progress)
+                in_progress.append(True)
+            # Long enough for the other request to get as far as it can
+            time.sleep(0.5)
+            with lock:
+                in_progress.pop()
+            return create_multipart_upload(*args, **kwargs)
+
+        with run_server():
+            self._initiate('restarted.bin', 10)
+            with patch.object(S3Service, 'create_multipart_upload', side_effect=slow_create_multipart_upload), \
+                    ThreadPoolExecutor(max_workers=2) as executor:
+                uploads = list(executor.map(lambda _: self._initiate('restarted.bin', 10), range(2)))
+
+        self.assertEqual(overlapped, [])
+        self.assertEqual(uploads[0]['asset_id'], uploads[1]['asset_id'])
+        remaining = self.s3_client.list_multipart_uploads(Bucket=DEFAULT_BUCKET)['Uploads']
+        self.assertEqual(len(remaining), 1)
+        with self.connection.cursor() as cur:
+            asset = AssetDao.get_by_id(uploads[0]['asset_id'], cur)
+        self.assertEqual(asset.upload_id, remaining[0]['UploadId'])
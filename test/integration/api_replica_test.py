@@ -0,0 +1,107 @@
+import json
+from datetime import datetime
+import psycopg2
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.database_accessor import DatabaseAccessor
+from external_services.s3_service import DEFAULT_BUCKET
+from .base_integration_test import BaseIntegrationTest
+from .test_utils import run_server
+
+# A copy of the test database stands in for a replica, one that's behind when its rows differ
+REPLICA_DB_CONN_ARGS = 'host=localhost port=5432 dbname=test_db_replica'
+
+class ApiReplicaIntegrationTest(BaseIntegrationTest):
+    def _set_up_database_schema(self):
+        super()._set_up_database_schema()
+        conn = psycopg2.connect('host=localhost port=5432')
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute('drop database if exists test_db_replica')
+            cur.execute('create database test_db_replica template test_db')
+        conn.close()
+
+    def setUp(self):
+        super().setUp()
+        self.connect(REPLICA_DB_CONN_ARGS)
+        self.replica_connection = psycopg2.connect(REPLICA_DB_CONN_ARGS)
+        self.replica_connection.autocommit = True
+        self.s3_client_mock.generate_presigned_url.return_value = 'yay://a.url.com'
+        self.s3_client_mock.generate_presigned_post.return_value = {'url': 'yay://a.url.com', 'fields': {}}
+
+    def tearDown(self):
+        self.replica_connection.close()
+        super().tearDown()
+
+    def connect(self, replica_connection_string):
+        DatabaseAccessor.disconnect()
+        DatabaseAccessor.connect(testing=True, replica_connection_strings=[replica_connection_string])
+
+    def insert(self, connection, uploaded_status=UploadedStatus.COMPLETE.value, object_key='abc'):
+        with connection.cursor() as cur:
+            return AssetDao.insert_one(AssetRow(
+                id=None,
+                uploaded_status=uploaded_status,
+                bucket=DEFAULT_BUCKET,
+                object_key=object_key,
+                create_date=datetime.now(),
+            ), cur)
+
+    def test_access_reads_from_replica(self):
+        asset = self.insert(self.connection)
+        self.insert(self.replica_connection)
+        checkouts = DatabaseAccessor.pool.stats()['checkouts']
+
+        with run_server():
+            response = self.request('get', f'/access?asset_id={asset.id}')
+            metrics = self.request('get', '/metrics').content.decode().splitlines()
+
+        self.assertEqual(json.loads(response.content), {'url': 'yay://a.url.com', 'asset_id': asset.id})
+        self.assertEqual(DatabaseAccessor.pool.stats()['checkouts'], checkouts)
+        for expected in (
+            'cloud_asset_replicas_primary_fallbacks_total 0',
+            'cloud_asset_replica_reads_total{replica="localhost:5432"} 1',
+            'cloud_asset_replica_lag_seconds{replica="localhost:5432"} 0.0',
+        ):
+            self.assertIn(expected, metrics)
+
+    def test_access_replica_behind(self):
+        """
+        The replica only has the asset as pending, or not at all, so it's read from the primary
+        """
+        pending = self.insert(self.connection)
+        self.insert(self.replica_connection, uploaded_status=UploadedStatus.PENDING.value)
+        missing = self.insert(self.connection, object_key='def')
+
+        with run_server():
+            response = self.request('get', f'/access?asset_id={pending.id}')
+            batch_response = self.request('post', '/access/batch', data=json.dumps({
+                'asset_ids': [pending.id, missing.id],
+            }))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(batch_response.content), {
+            'urls': {str(pending.id): 'yay://a.url.com', str(missing.id): 'yay://a.url.com'},
+            'errors': {},
+        })
+
+    def test_upload_writes_to_primary(self):
+        with run_server():
+            response = self.request('post', '/upload', data=json.dumps({'object_key': 'abc'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(DatabaseAccessor.replicas.replica_stats()['localhost:5432']['reads'], 0)
+        with self.replica_connection.cursor() as cur:
+            self.assertIsNone(AssetDao.get_by_bucket_and_key(DEFAULT_BUCKET, 'abc', cur))
+        with self.connection.cursor() as cur:
+            self.assertIsNotNone(AssetDao.get_by_bucket_and_key(DEFAULT_BUCKET, 'abc', cur))
+
+    def test_replica_down(self):
+        self.connect('host=localhost port=1 dbname=test_db_replica connect_timeout=1')
+        asset = self.insert(self.connection)
+
+        with run_server():
+            response = self.request('get', f'/access?asset_id={asset.id}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(DatabaseAccessor.replicas.replica_stats()['localhost:1']['failures'], 1)
+        self.assertEqual(DatabaseAccessor.replicas.stats()['primary_fallbacks'], 1)
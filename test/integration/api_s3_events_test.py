@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from external_services.s3_service import DEFAULT_BUCKET
+from .base_integration_test import BaseIntegrationTest
+from .test_utils import run_server
+
+class ApiS3EventsIntegrationTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        with self.connection.cursor() as cur:
+            self.assets = AssetDao.insert_many([
+                AssetRow(
+                    id=None,
+                    uploaded_status=UploadedStatus.PENDING.value,
+                    bucket=DEFAULT_BUCKET,
+                    object_key=object_key,
+                    create_date=datetime.utcnow(),
+                )
+                for object_key in ('my file.jpg', 'not uploaded.jpg')
+            ], cur)
+
+    def test_sns_notification_redelivered(self):
+        notification = json.dumps({
+            'Type': 'Notification',
+            'MessageId': 'abc',
+            'Message': json.dumps({
+                'Records': [
+                    {
+                        'eventSource': 'aws:s3',
+                        'eventName': 'ObjectCreated:Put',
+                        's3': {'bucket': {'name': DEFAULT_BUCKET}, 'object': {'key': object_key}},
+                    }
+                    for object_key in ('my+file.jpg', 'no+asset.jpg')
+                ],
+            }),
+        })
+
+        with run_server():
+            responses = [
+                self.request('post', '/events/s3', data=notification, headers={'content-type': 'text/plain'})
+                for _ in range(2)
+            ]
+
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual(json.loads(responses[0].content), {
+            'success': True,
+            'records': 2,
+            'completed': [self.assets[0].id],
+        })
+        # Delivering the same notification again changes nothing
+        self.assertEqual(json.loads(responses[1].content)['completed'], [])
+        with self.connection.cursor() as cur:
+            self.assertEqual(AssetDao.get_by_id(self.assets[0].id, cur).uploaded_status, UploadedStatus.COMPLETE.value)
+            self.assertEqual(AssetDao.get_by_id(self.assets[1].id, cur).uploaded_status, UploadedStatus.PENDING.value)
+
+    def test_invalid_event(self):
+        with run_server():
+            response = self.request('post', '/events/s3', data=json.dumps({'Records': 'abc'}))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue('Invalid key: Records' in response.content.decode())
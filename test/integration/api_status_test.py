@@ -1,7 +1,10 @@
 import unittest
 import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 from datetime import datetime
 from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.status_write_coalescer import status_write_coalescer
 from external_services.s3_service import DEFAULT_BUCKET
 from .base_integration_test import BaseIntegrationTest
 from .test_utils import run_server
@@ -91,4 +94,96 @@ class ApiUploadIntegrationTest(BaseIntegrationTest):
             self.assertEqual(response_body, {
                 'success': True,
                 'uploaded_status': UploadedStatus.PENDING.value,
-            })
\ No newline at end of file
+            })
+
+    def test_batch_updates_status(self):
+        with self.connection.cursor() as cur:
+            asset_ids = [
+                AssetDao.insert_one(AssetRow(
+                    id=None,
+                    uploaded_status=UploadedStatus.PENDING.value,
+                    bucket=DEFAULT_BUCKET,
+                    object_key=object_key,
+                    create_date=datetime.now()
+                ), cur).id
+                for object_key in ['abc', 'def']
+            ]
+
+        with run_server():
+            response = self.request(
+                'put',
+                '/status/batch',
+                data=json.dumps({
+                    'updates': [
+                        {'asset_id': asset_ids[0], 'uploaded_status': UploadedStatus.COMPLETE.value},
+                        {'asset_id': 1337, 'uploaded_status': UploadedStatus.COMPLETE.value},
+                        {'asset_id': asset_ids[1], 'uploaded_status': UploadedStatus.COMPLETE.value},
+                    ]
+                })
+            )
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), {
+                'success': True,
+                'updated': asset_ids,
+                'not_found': [1337],
+            })
+
+            with self.connection.cursor() as cur:
+                for asset_id in asset_ids:
+                    updated_asset_row = AssetDao.get_by_id(asset_id, cur)
+                    self.assertEqual(updated_asset_row.uploaded_status, UploadedStatus.COMPLETE.value)
+
+    @patch.object(status_write_coalescer, 'enabled', True)
+    @patch.object(status_write_coalescer, 'flush_interval', 0.1)
+    def test_coalesced_updates(self):
+        with self.connection.cursor() as cur:
+            asset_ids = [
+                asset.id for asset in AssetDao.insert_many([
+                    AssetRow(
+                        id=None,
+                        uploaded_status=UploadedStatus.PENDING.value,
+                        bucket=DEFAULT_BUCKET,
+                        object_key=f'key{index}',
+                        create_date=datetime.now()
+                    )
+                    for index in range(8)
+                ], cur)
+            ]
+        flushes = status_write_coalescer.stats()['flushes']
+
+        def update(asset_id):
+            return self.request(
+                'put',
+                '/status',
+                data=json.dumps({'asset_id': asset_id, 'uploaded_status': UploadedStatus.COMPLETE.value})
+            )
+
+        with run_server():
+            with ThreadPoolExecutor(max_workers=9) as executor:
+                responses = list(executor.map(update, asset_ids + [1337]))
+            status_write_coalescer.close()
+
+        self.assertEqual([response.status_code for response in responses], [200] * 8 + [404])
+        # Every update had committed by the time its response came back
+        with self.connection.cursor() as cur:
+            self.assertEqual(
+                {asset.uploaded_status for asset in AssetDao.get_by_ids(asset_ids, cur)},
+                {UploadedStatus.COMPLETE.value}
+            )
+        self.assertLess(status_write_coalescer.stats()['flushes'] - flushes, 9)
+
+    def test_batch_update_status_invalid_update(self):
+        with run_server():
+            response = self.request(
+                'put',
+                '/status/batch',
+                data=json.dumps({
+                    'updates': [
+                        {'asset_id': 1, 'uploaded_status': 'hello'},
+                    ]
+                })
+            )
+
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue('Invalid update at index 0' in response.content.decode())
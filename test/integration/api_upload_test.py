@@ -1,5 +1,6 @@
 import unittest
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from database.asset_dao import AssetDao, AssetRow, UploadedStatus
 from external_services.s3_service import DEFAULT_BUCKET
@@ -87,3 +88,87 @@ class ApiUploadIntegrationTest(BaseIntegrationTest):
 
             self.assertEqual(response.status_code, 400)
             self.assertTrue('Upload already complete, try another object_key.' in response.content.decode())
+
+    def test_concurrent_uploads_of_same_key(self):
+        def upload(_):
+            return self.request(
+                'post',
+                '/upload',
+                data=json.dumps({ 'object_key': 'contended' }),
+            )
+
+        with run_server():
+            with ThreadPoolExecutor(max_workers=20) as executor:
+                responses = list(executor.map(upload, range(100)))
+
+            with self.connection.cursor() as cur:
+                asset_row = AssetDao.get_by_bucket_and_key(DEFAULT_BUCKET, 'contended', cur)
+
+            self.assertEqual([response.status_code for response in responses], [200] * 100)
+            self.assertEqual(
+                {json.loads(response.content)['asset_id'] for response in responses},
+                {asset_row.id}
+            )
+
+    def test_batch_upload(self):
+        completed_asset_row = AssetRow(
+            id=None,
+            uploaded_status=UploadedStatus.COMPLETE.value,
+            bucket=DEFAULT_BUCKET,
+            object_key='done',
+            create_date=datetime.now(),
+        )
+        pending_asset_row = AssetRow(
+            id=None,
+            uploaded_status=UploadedStatus.PENDING.value,
+            bucket=DEFAULT_BUCKET,
+            object_key='pending',
+            create_date=datetime.now(),
+        )
+        with self.connection.cursor() as cur:
+            AssetDao.insert_one(completed_asset_row, cur)
+            pending_asset_row = AssetDao.insert_one(pending_asset_row, cur)
+
+        with run_server():
+            response = self.request(
+                'post',
+                '/upload/batch',
+                data=json.dumps({
+                    'uploads': [
+                        { 'object_key': 'new' },
+                        { 'object_key': 'pending', 'expires_in': 50 },
+                        { 'object_key': 'done' },
+                        { 'expires_in': 50 },
+                    ]
+                }),
+            )
+
+            self.assertEqual(response.status_code, 200)
+            dict_data = json.loads(response.content)
+
+            with self.connection.cursor() as cur:
+                new_asset_row = AssetDao.get_by_bucket_and_key(DEFAULT_BUCKET, 'new', cur)
+
+            self.assertEqual(new_asset_row.uploaded_status, UploadedStatus.PENDING.value)
+            self.assertEqual(dict_data, {
+                'results': [
+                    {
+                        'object_key': 'new',
+                        'signed_info': self.post_object_url_response,
+                        'asset_id': new_asset_row.id,
+                    },
+                    {
+                        'object_key': 'pending',
+                        'signed_info': self.post_object_url_response,
+                        'asset_id': pending_asset_row.id,
+                    },
+                    {
+                        'object_key': 'done',
+                        'error': 'Upload already complete, try another object_key.',
+                    },
+                    {
+                        'object_key': None,
+                        'error': 'Missing key: object_key',
+                    },
+                ]
+            })
@@ -0,0 +1,166 @@
+import re
+from datetime import datetime, timedelta
+from commands.maintain_asset_partitions import maintain, _add_months
+from database.asset_dao import (
+    AssetDao, AssetRow, UploadedStatus, GET_BY_ID, GET_BY_IDS, GET_BY_BUCKET_AND_KEY, GET_BY_BUCKET_AND_KEY_FOR_UPDATE,
+    GET_BY_BUCKET_AND_KEYS,
+    UPDATE_UPLOADED_STATUS, UPDATE_UPLOADED_STATUS_BY_BUCKET_AND_KEYS, UPDATE_UPLOADED_STATUS_BY_BUCKET_KEY_PAIRS,
+    SET_UPLOAD_ID, FINISH_UPLOAD, LIST_PAGE,
+)
+from external_services.s3_service import DEFAULT_BUCKET
+from .base_integration_test import BaseIntegrationTest
+
+THIS_MONTH = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+NEXT_MONTH = _add_months(THIS_MONTH, 1)
+
+class AssetPartitionsIntegrationTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        # The migration creates partitions for this month and the three after it
+        self.assets = {
+            name: self.insert(name, create_date)
+            for name, create_date in (
+                ('this', THIS_MONTH + timedelta(days=1)),
+                ('next', NEXT_MONTH + timedelta(days=1)),
+                ('future', _add_months(THIS_MONTH, 12) + timedelta(days=1)),
+            )
+        }
+        # Enough other pending assets that finding them by status is no shortcut, as in a big table
+        with self.connection.cursor() as cur:
+            for month in (THIS_MONTH, NEXT_MONTH, _add_months(THIS_MONTH, 12)):
+                AssetDao.insert_many([
+                    AssetRow(
+                        id=None,
+                        uploaded_status=UploadedStatus.PENDING.value,
+                        bucket=DEFAULT_BUCKET,
+                        object_key=f'{month:%Y-%m}/{index}',
+                        create_date=month + timedelta(hours=index),
+                    )
+                    for index in range(500)
+                ], cur)
+            cur.execute('analyze asset, asset_key')
+
+    def insert(self, object_key, create_date):
+        with self.connection.cursor() as cur:
+            return AssetDao.insert_one(AssetRow(
+                id=None,
+                uploaded_status=UploadedStatus.PENDING.value,
+                bucket=DEFAULT_BUCKET,
+                object_key=object_key,
+                create_date=create_date,
+            ), cur)
+
+    def partition_of(self, asset_id):
+        with self.connection.cursor() as cur:
+            cur.execute('select tableoid::regclass::text from asset where id = %s', (asset_id,))
+            return cur.fetchone()[0]
+
+    def scanned_partitions(self, statement, params):
+        """
+        :return: the partitions `statement` actually read from when run with `params`.
+        """
+        with self.connection.cursor() as cur:
+            # The table is still small, so make the planner show what it would do with a big one
+            cur.execute('set enable_seqscan = off')
+            cur.execute('explain (analyze, costs off, timing off, summary off) ' + statement.sql, params)
+            plan = '\n'.join(row[0] for row in cur.fetchall())
+        return {
+            match.group(1)
+            for line in plan.splitlines() if 'never executed' not in line
+            for match in [re.search(r' on (asset_(?:\d{4}_\d{2}|default)) .*\(actual', line)] if match
+        }
+
+    def test_lookups_prune_partitions(self):
+        """
+        Given:
+            Assets in this month's, next month's and the default partition
+        Then:
+            Looking any of them up, or updating it, only reads the partition it's in
+        """
+        for name, asset in self.assets.items():
+            partition = self.partition_of(asset.id)
+            for statement, params in (
+                (GET_BY_ID, (asset.id,)),
+                (GET_BY_IDS, ([asset.id],)),
+                (GET_BY_BUCKET_AND_KEY, (DEFAULT_BUCKET, asset.object_key)),
+                (GET_BY_BUCKET_AND_KEY_FOR_UPDATE, (DEFAULT_BUCKET, asset.object_key)),
+                (GET_BY_BUCKET_AND_KEYS, (DEFAULT_BUCKET, [asset.object_key])),
+                (SET_UPLOAD_ID, ('upload', asset.id)),
+                (FINISH_UPLOAD, (UploadedStatus.PENDING.value, asset.id, 'upload')),
+                (UPDATE_UPLOADED_STATUS, (UploadedStatus.PENDING.value, asset.id)),
+                (UPDATE_UPLOADED_STATUS_BY_BUCKET_AND_KEYS, (
+                    UploadedStatus.PENDING.value, DEFAULT_BUCKET, [asset.object_key], UploadedStatus.PENDING.value
+                )),
+                (UPDATE_UPLOADED_STATUS_BY_BUCKET_KEY_PAIRS, (
+                    UploadedStatus.PENDING.value, [DEFAULT_BUCKET], [asset.object_key], UploadedStatus.PENDING.value
+                )),
+            ):
+                with self.subTest(asset=name, statement=statement.name):
+                    self.assertEqual(self.scanned_partitions(statement, params), {partition})
+
+    def test_listing_by_date_prunes_partitions(self):
+        """
+        Given:
+            A listing filtered to next month
+        Then:
+            Only next month's partition is read
+        """
+        statement = LIST_PAGE[(False, False, True, True, False)]
+
+        scanned = self.scanned_partitions(statement, (NEXT_MONTH, _add_months(NEXT_MONTH, 1), 100))
+
+        self.assertEqual(scanned, {f'asset_{NEXT_MONTH:%Y_%m}'})
+
+    def test_creates_partitions_ahead(self):
+        """
+        Given:
+            An asset in the default partition, in a month that's now wanted
+        Then:
+            Its partition is created, the asset is moved into it, and running it again does nothing
+        """
+        future = self.assets['future']
+        self.assertEqual(self.partition_of(future.id), 'asset_default')
+
+        stats = maintain(months_ahead=12, now=THIS_MONTH)
+
+        self.assertEqual(stats['created'], [f'asset_{_add_months(THIS_MONTH, months):%Y_%m}' for months in range(4, 13)])
+        self.assertEqual(self.partition_of(future.id), f'asset_{_add_months(THIS_MONTH, 12):%Y_%m}')
+        with self.connection.cursor() as cur:
+            self.assertEqual(AssetDao.get_by_id(future.id, cur), future)
+        self.assertEqual(maintain(months_ahead=12, now=THIS_MONTH), {'created': [], 'archived': [], 'assets_removed': 0})
+
+    def test_archives_old_partitions(self):
+        """
+        Given:
+            Two months later, only one whole month before it is retained
+        Then:
+            This month's partition is archived, and its assets' keys can be used again
+        """
+        stats = maintain(retain_months=1, now=_add_months(THIS_MONTH, 2))
+
+        this_partition = f'asset_{THIS_MONTH:%Y_%m}'
+        self.assertEqual(stats['archived'], [this_partition])
+        self.assertEqual(stats['assets_removed'], 501)
+        with self.connection.cursor() as cur:
+            self.assertIsNone(AssetDao.get_by_id(self.assets['this'].id, cur))
+            self.assertIsNotNone(AssetDao.get_by_id(self.assets['next'].id, cur))
+            cur.execute(f'select count(*) from asset_archive.{this_partition} where id = %s', (self.assets['this'].id,))
+            self.assertEqual(cur.fetchone()[0], 1)
+        self.assertIsNotNone(self.insert('this', datetime.now()))
+
+    def test_drops_old_partitions(self):
+        """
+        Given:
+            Old partitions are to be dropped rather than archived
+        Then:
+            They're gone
+        """
+        stats = maintain(retain_months=0, drop=True, now=_add_months(THIS_MONTH, 2))
+
+        self.assertEqual(stats['dropped'], [f'asset_{THIS_MONTH:%Y_%m}', f'asset_{NEXT_MONTH:%Y_%m}'])
+        self.assertEqual(stats['assets_removed'], 1002)
+        with self.connection.cursor() as cur:
+            cur.execute('select to_regclass(%s)', (f'asset_{THIS_MONTH:%Y_%m}',))
+            self.assertIsNone(cur.fetchone()[0])
+            cur.execute('select count(*) from asset_key')
+            self.assertEqual(cur.fetchone()[0], 501)
@@ -5,7 +5,8 @@ import cherrypy
 import psycopg2
 from yoyo import read_migrations
 from yoyo import get_backend
-from database.database_accessor import DatabaseAccessor
+from database.database_accessor import DatabaseAccessor, TEST_DB_CONN_ARGS
+from database.asset_row_cache import asset_row_cache
 from cloud_asset_server import setup_cherry_tree, CHERRY_TREE_CONFIG
 from external_services.s3_service import S3Service
 
@@ -30,10 +31,15 @@ class BaseIntegrationTest(unittest.TestCase):
         with backend.lock():
             # Apply migrations
             backend.apply_migrations(backend.to_apply(migrations))
+        # Otherwise it lingers until garbage collected, and the next test can't drop the database
+        backend.connection.close()
 
     def setUp(self):
         self._set_up_database_schema()
         DatabaseAccessor.connect(testing=True)
+        # Asset ids start over with every fresh database, so nothing cached can carry over
+        asset_row_cache.clear()
+        S3Service.signed_url_cache.clear()
 
         self.api_url = 'http://localhost:10000/api'
         self.headers = {
@@ -41,7 +47,10 @@ class BaseIntegrationTest(unittest.TestCase):
         }
         self.patcher = patch.object(S3Service, 's3_client')
         self.s3_client_mock = self.patcher.start()
-        self.connection = DatabaseAccessor.get_connection()
+        # The server checks out its own pooled connections, so fixtures are
+        # written on a separate autocommitting connection to be visible to it
+        self.connection = psycopg2.connect(TEST_DB_CONN_ARGS)
+        self.connection.autocommit = True
 
     def request(self, method, uri, data=None, headers={}):
         return getattr(requests, method)(
@@ -52,6 +61,6 @@ class BaseIntegrationTest(unittest.TestCase):
 
     def tearDown(self):
         # drop and recreate the database to get a clean state
-        DatabaseAccessor.get_connection().close()
-        DatabaseAccessor.connection = None
+        self.connection.close()
+        DatabaseAccessor.disconnect()
         self.patcher.stop()
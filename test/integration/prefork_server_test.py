@@ -0,0 +1,63 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+from datetime import datetime
+import requests
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.database_accessor import CONNECTION_ARGS, TEST_DB_CONN_ARGS
+from external_services.s3_service import DEFAULT_BUCKET
+from .base_integration_test import BaseIntegrationTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PORT = 10001
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'Workers are forked')
+class PreforkServerIntegrationTest(BaseIntegrationTest):
+    def setUp(self):
+        super().setUp()
+        with self.connection.cursor() as cur:
+            self.asset = AssetDao.insert_one(AssetRow(
+                id=None,
+                uploaded_status=UploadedStatus.COMPLETE.value,
+                bucket=DEFAULT_BUCKET,
+                object_key='abc',
+                create_date=datetime.now(),
+            ), cur)
+        self.server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'cloud_asset_server.py'), '--port', str(PORT), '--workers', '2'],
+            env={
+                **os.environ,
+                'PYTHONPATH': ROOT,
+                CONNECTION_ARGS: TEST_DB_CONN_ARGS,
+                # Signed without ever calling S3
+                'AWS_ACCESS_KEY_ID': 'AKIDEXAMPLE',
+                'AWS_SECRET_ACCESS_KEY': 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+            },
+            stdout=subprocess.DEVNULL,
+        )
+
+    def tearDown(self):
+        # Before the database is dropped from under it
+        self.server.kill()
+        self.server.wait()
+        super().tearDown()
+
+    def access(self):
+        for _ in range(300):
+            try:
+                return requests.get(f'http://localhost:{PORT}/api/access?asset_id={self.asset.id}', timeout=10)
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        self.fail('Server did not start')
+
+    def test_workers(self):
+        responses = [self.access() for _ in range(10)]
+
+        self.assertEqual([response.status_code for response in responses], [200] * 10)
+        self.assertEqual(json.loads(responses[0].content)['asset_id'], self.asset.id)
+        self.server.send_signal(signal.SIGTERM)
+        self.assertEqual(self.server.wait(30), 0)
@@ -0,0 +1,91 @@
+from datetime import datetime
+from unittest.mock import patch
+import boto3
+try:
+    from moto import mock_aws
+except ImportError: # moto < 5
+    from moto import mock_s3 as mock_aws
+from commands.reconcile_bucket import reconcile
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.reconcile_checkpoint_dao import ReconcileCheckpointDao
+from external_services.s3_service import S3Service, DEFAULT_BUCKET
+from .base_integration_test import BaseIntegrationTest
+
+class ReconcileBucketIntegrationTest(BaseIntegrationTest):
+    """
+    Runs against moto's in-process stand-in for S3.
+    """
+    def setUp(self):
+        super().setUp()
+        self.s3_mock = mock_aws()
+        self.s3_mock.start()
+        self.s3_client = boto3.client('s3', region_name='us-east-1')
+        self.s3_client.create_bucket(Bucket=DEFAULT_BUCKET)
+        self.s3_client_patcher = patch.object(S3Service, 's3_client', self.s3_client)
+        self.s3_client_patcher.start()
+
+        for index in range(0, 30, 2):
+            self.s3_client.put_object(Bucket=DEFAULT_BUCKET, Key=f'key{index:02}', Body=b'')
+        # Every key in S3 has a pending asset, as does every key in between that was never uploaded
+        with self.connection.cursor() as cur:
+            self.assets = {
+                asset.object_key: asset
+                for asset in AssetDao.insert_many([
+                    AssetRow(
+                        id=None,
+                        uploaded_status=UploadedStatus.PENDING.value,
+                        bucket=DEFAULT_BUCKET,
+                        object_key=f'key{index:02}',
+                        create_date=datetime.utcnow(),
+                    )
+                    for index in range(30)
+                ], cur)
+            }
+            AssetDao.set_upload_id(self.assets['key10'].id, 'upload in progress', cur)
+
+    def tearDown(self):
+        self.s3_client_patcher.stop()
+        self.s3_mock.stop()
+        super().tearDown()
+
+    def completed_keys(self):
+        with self.connection.cursor() as cur:
+            return sorted(
+                asset.object_key
+                for asset in AssetDao.get_by_ids([asset.id for asset in self.assets.values()], cur)
+                if asset.uploaded_status == UploadedStatus.COMPLETE.value
+            )
+
+    def test_marks_uploaded_assets_complete(self):
+        stats = reconcile(DEFAULT_BUCKET, chunk_size=4, page_size=3)
+
+        expected = [f'key{index:02}' for index in range(0, 30, 2) if index != 10]
+        self.assertEqual(self.completed_keys(), expected)
+        self.assertEqual(stats, {'started_after': None, 'listed': 15, 'completed': len(expected)})
+        with self.connection.cursor() as cur:
+            self.assertIsNone(ReconcileCheckpointDao.get_start_after(DEFAULT_BUCKET, cur))
+
+        # A second pass finds nothing left to do
+        self.assertEqual(reconcile(DEFAULT_BUCKET, chunk_size=4, page_size=3)['completed'], 0)
+
+    def test_resumes_from_checkpoint(self):
+        update = AssetDao.update_uploaded_status_by_bucket_and_keys
+        calls = []
+        def fail_on_third_chunk(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError('interrupted')
+            return update(*args)
+
+        with patch.object(AssetDao, 'update_uploaded_status_by_bucket_and_keys', side_effect=fail_on_third_chunk):
+            with self.assertRaises(RuntimeError):
+                reconcile(DEFAULT_BUCKET, chunk_size=4, page_size=2)
+
+        # The first two chunks (key00 to key14) were committed, the third rolled back
+        self.assertEqual(self.completed_keys(), ['key00', 'key02', 'key04', 'key06', 'key08', 'key12', 'key14'])
+
+        stats = reconcile(DEFAULT_BUCKET, chunk_size=4, page_size=2)
+
+        self.assertEqual(stats['started_after'], 'key14')
+        self.assertEqual(stats['listed'], 7)
+        self.assertEqual(self.completed_keys(), [f'key{index:02}' for index in range(0, 30, 2) if index != 10])
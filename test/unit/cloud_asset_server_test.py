@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class ServerImportUnitTest(unittest.TestCase):
+    def test_import_is_lazy(self):
+        """
+        Given:
+            cloud_asset_server is imported in a fresh interpreter
+        Then:
+            Neither boto3 (which S3Service loads on first use) nor anything test-only is imported
+        """
+        result = subprocess.run(
+            [
+                sys.executable, '-c',
+                'import sys, cloud_asset_server; '
+                'print(",".join(m for m in ("boto3", "unittest", "freezegun") if m in sys.modules))'
+            ],
+            env={**os.environ, 'PYTHONPATH': ROOT},
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        self.assertEqual(result.stdout.strip(), '')
@@ -28,8 +28,8 @@ class GetByIdUnitTest(unittest.TestCase):
         result = AssetDao.get_by_id(1, self.mock_cursor)
 
         self.mock_cursor.execute.assert_called_once_with(
-            'select id,uploaded_status,bucket,object_key,create_date '
-            'from asset where id = %s',
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id '
+            'from asset where (id, create_date) = (select id, create_date from asset_key where id = %s)',
             (1,)
         )
 
@@ -46,13 +46,42 @@ class GetByIdUnitTest(unittest.TestCase):
         result = AssetDao.get_by_id(1, self.mock_cursor)
 
         self.mock_cursor.execute.assert_called_once_with(
-            'select id,uploaded_status,bucket,object_key,create_date '
-            'from asset where id = %s',
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id '
+            'from asset where (id, create_date) = (select id, create_date from asset_key where id = %s)',
             (1,)
         )
 
         self.assertIsNone(result)
 
+class GetByIdsUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_happy_path(self):
+        """
+        Given:
+            Some of the requested asset ids exist in the database
+        Then:
+            A single query is made, and a dataclass is returned for each row found
+        """
+        self.mock_cursor.fetchall.return_value = [
+            (1, 'a', 'b', 'c', datetime.min),
+            (3, 'a', 'b', 'd', datetime.min),
+        ]
+        result = AssetDao.get_by_ids([1, 2, 3], self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'select asset.id,asset.uploaded_status,asset.bucket,asset.object_key,asset.create_date,asset.upload_id '
+            'from asset_key join asset on asset.id = asset_key.id and asset.create_date = asset_key.create_date '
+            'where asset_key.id = any(%s)',
+            ([1, 2, 3],)
+        )
+
+        self.assertEqual(result, [
+            AssetRow(id=1, uploaded_status='a', bucket='b', object_key='c', create_date=datetime.min),
+            AssetRow(id=3, uploaded_status='a', bucket='b', object_key='d', create_date=datetime.min),
+        ])
+
 class GetByBucketAndKeyUnitTest(unittest.TestCase):
     def setUp(self):
         self.mock_cursor = MagicMock()
@@ -78,8 +107,9 @@ class GetByBucketAndKeyUnitTest(unittest.TestCase):
         result = AssetDao.get_by_bucket_and_key('my_bucket', 'my_object_key', self.mock_cursor)
 
         self.mock_cursor.execute.assert_called_once_with(
-            'select id,uploaded_status,bucket,object_key,create_date '
-            'from asset where bucket = %s and object_key = %s',
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id '
+            'from asset where (id, create_date) = '
+            '(select id, create_date from asset_key where bucket = %s and object_key = %s)',
             ('my_bucket', 'my_object_key')
         )
 
@@ -97,12 +127,42 @@ class GetByBucketAndKeyUnitTest(unittest.TestCase):
         result = AssetDao.get_by_bucket_and_key('my_bucket', 'my_object_key', self.mock_cursor)
 
         self.mock_cursor.execute.assert_called_once_with(
-            'select id,uploaded_status,bucket,object_key,create_date '
-            'from asset where bucket = %s and object_key = %s',
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id '
+            'from asset where (id, create_date) = '
+            '(select id, create_date from asset_key where bucket = %s and object_key = %s)',
             ('my_bucket', 'my_object_key')
         )
 
         self.assertEqual(result, None)
+
+class GetByBucketAndKeysUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_happy_path(self):
+        """
+        Given:
+            Some of the requested object keys exist in the bucket
+        Then:
+            A single query is made, and a dataclass is returned for each row found
+        """
+        self.mock_cursor.fetchall.return_value = [
+            (1, 'a', 'my_bucket', 'key_1', datetime.min),
+            (2, 'a', 'my_bucket', 'key_2', datetime.min),
+        ]
+        result = AssetDao.get_by_bucket_and_keys('my_bucket', ['key_1', 'key_2', 'key_3'], self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'select asset.id,asset.uploaded_status,asset.bucket,asset.object_key,asset.create_date,asset.upload_id '
+            'from asset_key join asset on asset.id = asset_key.id and asset.create_date = asset_key.create_date '
+            'where asset_key.bucket = %s and asset_key.object_key = any(%s)',
+            ('my_bucket', ['key_1', 'key_2', 'key_3'])
+        )
+
+        self.assertEqual(result, [
+            AssetRow(id=1, uploaded_status='a', bucket='my_bucket', object_key='key_1', create_date=datetime.min),
+            AssetRow(id=2, uploaded_status='a', bucket='my_bucket', object_key='key_2', create_date=datetime.min),
+        ])
     
 class InsertOneUnitTest(unittest.TestCase):
     def setUp(self):
@@ -136,18 +196,157 @@ class InsertOneUnitTest(unittest.TestCase):
         result = AssetDao.insert_one(self.pre_insert_dataclass, self.mock_cursor)
 
         self.mock_cursor.execute.assert_called_once_with(
-            'insert into asset(uploaded_status,bucket,object_key,create_date) values('
-            '%s,%s,%s,%s) returning id,uploaded_status,bucket,object_key,create_date',
+            "with v(id,uploaded_status,bucket,object_key,create_date,upload_id) as "
+            "(values (nextval('asset_id_seq'),%s,%s,%s,%s,%s)), "
+            'k as (insert into asset_key(bucket,object_key,id,create_date) '
+            'select bucket,object_key,id,create_date from v returning id) '
+            'insert into asset(id,uploaded_status,bucket,object_key,create_date,upload_id) '
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id from v join k using (id) '
+            'returning id,uploaded_status,bucket,object_key,create_date,upload_id',
             (
                 self.pre_insert_dataclass.uploaded_status,
                 self.pre_insert_dataclass.bucket,
                 self.pre_insert_dataclass.object_key,
                 self.pre_insert_dataclass.create_date,
+                None,
             )
         )
 
         self.assertEqual(result, self.sample_asset_row_dataclass)
 
+class InsertOrGetUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.pre_insert_dataclass = AssetRow(
+            id=None,
+            uploaded_status='a',
+            bucket='b',
+            object_key='c',
+            create_date=datetime.min
+        )
+
+    def test_happy_path(self):
+        """
+        Given:
+            An asset_row whose bucket and object_key aren't taken
+        Then:
+            A single insert skipping taken keys is performed, and a dataclass
+            with the created row's data is returned
+        """
+        self.mock_cursor.fetchone.return_value = (1, 'a', 'b', 'c', datetime.min)
+        result = AssetDao.insert_or_get(self.pre_insert_dataclass, self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_once_with(
+            "with v(id,uploaded_status,bucket,object_key,create_date,upload_id) as "
+            "(values (nextval('asset_id_seq'),%s,%s,%s,%s,%s)), "
+            'k as (insert into asset_key(bucket,object_key,id,create_date) '
+            'select bucket,object_key,id,create_date from v on conflict (bucket, object_key) do nothing returning id) '
+            'insert into asset(id,uploaded_status,bucket,object_key,create_date,upload_id) '
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id from v join k using (id) '
+            'returning id,uploaded_status,bucket,object_key,create_date,upload_id',
+            ('a', 'b', 'c', datetime.min, None)
+        )
+
+        self.assertEqual(result, AssetRow(
+            id=1,
+            uploaded_status='a',
+            bucket='b',
+            object_key='c',
+            create_date=datetime.min
+        ))
+
+    def test_existing_asset(self):
+        """
+        Given:
+            An asset with the same bucket and object_key already exists
+        Then:
+            Nothing is inserted, and the existing asset is fetched, locked, and returned
+        """
+        self.mock_cursor.fetchone.side_effect = [None, (1, 'complete', 'b', 'c', datetime.min)]
+        result = AssetDao.insert_or_get(self.pre_insert_dataclass, self.mock_cursor)
+
+        self.assertEqual(self.mock_cursor.execute.call_count, 2)
+        self.assertTrue(self.mock_cursor.execute.call_args.args[0].endswith('for update'))
+        self.assertEqual(self.mock_cursor.execute.call_args.args[1], ('b', 'c'))
+        self.assertEqual(result, AssetRow(
+            id=1,
+            uploaded_status='complete',
+            bucket='b',
+            object_key='c',
+            create_date=datetime.min
+        ))
+
+    def test_existing_asset_deleted(self):
+        """
+        Given:
+            An asset with the same bucket and object_key exists, but is deleted before it can be fetched
+        Then:
+            The insert is tried again, and the asset it creates is returned
+        """
+        self.mock_cursor.fetchone.side_effect = [None, None, (1, 'a', 'b', 'c', datetime.min)]
+        result = AssetDao.insert_or_get(self.pre_insert_dataclass, self.mock_cursor)
+
+        self.assertEqual(self.mock_cursor.execute.call_count, 3)
+        self.assertEqual(
+            self.mock_cursor.execute.call_args_list[0].args[0],
+            self.mock_cursor.execute.call_args_list[2].args[0],
+        )
+        self.assertEqual(result, AssetRow(
+            id=1,
+            uploaded_status='a',
+            bucket='b',
+            object_key='c',
+            create_date=datetime.min
+        ))
+
+class InsertManyUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.pre_insert_dataclasses = [
+            AssetRow(id=None, uploaded_status='a', bucket='b', object_key='c', create_date=datetime.min),
+            AssetRow(id=None, uploaded_status='a', bucket='b', object_key='d', create_date=datetime.min),
+        ]
+
+    def test_happy_path(self):
+        """
+        Given:
+            Several AssetRow dataclasses are supplied to insert
+        Then:
+            They are inserted with a single multi-row insert, and a dataclass is
+            returned for each row created
+        """
+        self.mock_cursor.fetchall.return_value = [
+            (1, 'a', 'b', 'c', datetime.min),
+            (2, 'a', 'b', 'd', datetime.min),
+        ]
+        result = AssetDao.insert_many(self.pre_insert_dataclasses, self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_once_with(
+            "with v(id,uploaded_status,bucket,object_key,create_date,upload_id) as "
+            "(values (nextval('asset_id_seq'),%s,%s,%s,%s,%s),(nextval('asset_id_seq'),%s,%s,%s,%s,%s)), "
+            'k as (insert into asset_key(bucket,object_key,id,create_date) '
+            'select bucket,object_key,id,create_date from v on conflict (bucket, object_key) do nothing returning id) '
+            'insert into asset(id,uploaded_status,bucket,object_key,create_date,upload_id) '
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id from v join k using (id) '
+            'returning id,uploaded_status,bucket,object_key,create_date,upload_id',
+            ('a', 'b', 'c', datetime.min, None, 'a', 'b', 'd', datetime.min, None)
+        )
+
+        self.assertEqual(result, [
+            AssetRow(id=1, uploaded_status='a', bucket='b', object_key='c', create_date=datetime.min),
+            AssetRow(id=2, uploaded_status='a', bucket='b', object_key='d', create_date=datetime.min),
+        ])
+
+    def test_nothing_to_insert(self):
+        """
+        Given:
+            No rows are supplied
+        Then:
+            No query is made
+        """
+        self.assertEqual(AssetDao.insert_many([], self.mock_cursor), [])
+        self.mock_cursor.execute.assert_not_called()
+
 class UpdateUploadedStatusUnitTest(unittest.TestCase):
     def setUp(self):
         self.mock_cursor = MagicMock()
@@ -155,13 +354,283 @@ class UpdateUploadedStatusUnitTest(unittest.TestCase):
     def test_happy_path(self):
         """
         Given:
-            An asset_id and uploaded_status are supplied
+            An asset_id and uploaded_status are supplied, and the asset exists
         Then:
-            A SQL update is performed
+            A single SQL update is performed, and a dataclass with the updated row's data is returned
         """
-        AssetDao.update_uploaded_status(1, UploadedStatus.COMPLETE.value, self.mock_cursor)
+        self.mock_cursor.fetchone.return_value = (1, UploadedStatus.COMPLETE.value, 'b', 'c', datetime.min)
+        result = AssetDao.update_uploaded_status(1, UploadedStatus.COMPLETE.value, self.mock_cursor)
 
         self.mock_cursor.execute.assert_called_once_with(
-            'update asset set uploaded_status = %s where id = %s',
+            'update asset set uploaded_status = %s '
+            'where (id, create_date) = (select id, create_date from asset_key where id = %s) '
+            'returning id,uploaded_status,bucket,object_key,create_date,upload_id',
             (UploadedStatus.COMPLETE.value, 1)
-        )
\ No newline at end of file
+        )
+
+        self.assertEqual(result, AssetRow(
+            id=1,
+            uploaded_status=UploadedStatus.COMPLETE.value,
+            bucket='b',
+            object_key='c',
+            create_date=datetime.min
+        ))
+
+    def test_not_found(self):
+        """
+        Given:
+            The asset_id does not exist in the database
+        Then:
+            `None` is returned
+        """
+        self.mock_cursor.fetchone.return_value = None
+        result = AssetDao.update_uploaded_status(1, UploadedStatus.COMPLETE.value, self.mock_cursor)
+
+        self.assertIsNone(result)
+class UpdateUploadedStatusesUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_happy_path(self):
+        """
+        Given:
+            Several (asset_id, uploaded_status) pairs are supplied
+        Then:
+            A single set-based SQL update is performed, and the ids it updated are returned
+        """
+        self.mock_cursor.fetchall.return_value = [(1,), (3,)]
+        result = AssetDao.update_uploaded_statuses([
+            (1, UploadedStatus.COMPLETE.value),
+            (2, UploadedStatus.COMPLETE.value),
+            (3, UploadedStatus.PENDING.value),
+        ], self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'update asset set uploaded_status = v.uploaded_status from (values '
+            '(%s,%s),(%s,%s),(%s,%s)'
+            ') as v(id, uploaded_status) join asset_key on asset_key.id = v.id '
+            'where asset.id = asset_key.id and asset.create_date = asset_key.create_date returning asset.id',
+            (
+                1, UploadedStatus.COMPLETE.value,
+                2, UploadedStatus.COMPLETE.value,
+                3, UploadedStatus.PENDING.value,
+            )
+        )
+
+        self.assertEqual(result, [1, 3])
+
+    def test_nothing_to_update(self):
+        """
+        Given:
+            No updates are supplied
+        Then:
+            No query is made
+        """
+        self.assertEqual(AssetDao.update_uploaded_statuses([], self.mock_cursor), [])
+        self.mock_cursor.execute.assert_not_called()
+
+class SetUploadIdUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_happy_path(self):
+        """
+        Given:
+            An asset_id and upload_id are supplied, and the asset exists
+        Then:
+            A single SQL update is performed, and a dataclass with the updated row's data is returned
+        """
+        self.mock_cursor.fetchone.return_value = (1, 'pending', 'b', 'c', datetime.min, 'upload')
+        result = AssetDao.set_upload_id(1, 'upload', self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'update asset set upload_id = %s '
+            'where (id, create_date) = (select id, create_date from asset_key where id = %s) '
+            'returning id,uploaded_status,bucket,object_key,create_date,upload_id',
+            ('upload', 1)
+        )
+        self.assertEqual(result, AssetRow(
+            id=1,
+            uploaded_status='pending',
+            bucket='b',
+            object_key='c',
+            create_date=datetime.min,
+            upload_id='upload',
+        ))
+
+class FinishUploadUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_happy_path(self):
+        """
+        Given:
+            The asset exists and upload_id is its upload
+        Then:
+            A single SQL update clears the upload and sets the status, and a dataclass with the
+            updated row's data is returned
+        """
+        self.mock_cursor.fetchone.return_value = (1, UploadedStatus.COMPLETE.value, 'b', 'c', datetime.min, None)
+        result = AssetDao.finish_upload(1, 'upload', UploadedStatus.COMPLETE.value, self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'update asset set uploaded_status = %s, upload_id = null '
+            'where (id, create_date) = (select id, create_date from asset_key where id = %s) and upload_id = %s '
+            'returning id,uploaded_status,bucket,object_key,create_date,upload_id',
+            (UploadedStatus.COMPLETE.value, 1, 'upload')
+        )
+        self.assertEqual(result, AssetRow(
+            id=1,
+            uploaded_status=UploadedStatus.COMPLETE.value,
+            bucket='b',
+            object_key='c',
+            create_date=datetime.min,
+        ))
+
+    def test_upload_replaced(self):
+        """
+        Given:
+            upload_id is no longer the asset's upload
+        Then:
+            Nothing is updated, and None is returned
+        """
+        self.mock_cursor.fetchone.return_value = None
+
+        self.assertIsNone(AssetDao.finish_upload(1, 'upload', UploadedStatus.COMPLETE.value, self.mock_cursor))
+
+class ListPageUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_first_page(self):
+        """
+        Given:
+            No filters or keyset are supplied
+        Then:
+            The oldest assets are fetched, ordered by (create_date, id)
+        """
+        self.mock_cursor.fetchall.return_value = [(1, 'a', 'b', 'c', datetime.min, None)]
+        result = AssetDao.list_page(10, self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id '
+            'from asset order by create_date, id limit %s',
+            (10,)
+        )
+        self.assertEqual(result, [AssetRow(1, 'a', 'b', 'c', datetime.min)])
+
+    def test_filters_and_keyset(self):
+        """
+        Given:
+            Some filters, and the keyset of the previous page's last asset, are supplied
+        Then:
+            Only the supplied filters are in the where clause, with the keyset last
+        """
+        self.mock_cursor.fetchall.return_value = []
+        AssetDao.list_page(
+            10,
+            self.mock_cursor,
+            uploaded_status=UploadedStatus.COMPLETE.value,
+            created_before=datetime.max,
+            after=(datetime.min, 7),
+        )
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id '
+            'from asset where uploaded_status = %s and create_date < %s and (create_date, id) > (%s, %s) '
+            'order by create_date, id limit %s',
+            (UploadedStatus.COMPLETE.value, datetime.max, datetime.min, 7, 10)
+        )
+
+class IterAllUnitTest(unittest.TestCase):
+    def test_happy_path(self):
+        """
+        Given:
+            The cursor returns rows as it is iterated
+        Then:
+            A single unprepared select is made, and a dataclass is yielded for each row
+        """
+        mock_cursor = MagicMock()
+        mock_cursor.__iter__.return_value = iter([
+            (1, 'a', 'b', 'c', datetime.min, None),
+            (2, 'd', 'e', 'f', datetime.min, None),
+        ])
+        result = AssetDao.iter_all(mock_cursor)
+
+        mock_cursor.execute.assert_not_called()
+        self.assertEqual(list(result), [
+            AssetRow(1, 'a', 'b', 'c', datetime.min),
+            AssetRow(2, 'd', 'e', 'f', datetime.min),
+        ])
+        mock_cursor.execute.assert_called_once_with(
+            'select id,uploaded_status,bucket,object_key,create_date,upload_id from asset',
+            ()
+        )
+
+class UpdateUploadedStatusByBucketAndKeysUnitTest(unittest.TestCase):
+    def test_happy_path(self):
+        """
+        Given:
+            Some object keys in a bucket
+        Then:
+            A single SQL update moves only their assets in the old status, and the updated ids are returned
+        """
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [(1,), (3,)]
+
+        result = AssetDao.update_uploaded_status_by_bucket_and_keys(
+            'b', ('c', 'd', 'e'), UploadedStatus.PENDING.value, UploadedStatus.COMPLETE.value, mock_cursor
+        )
+
+        mock_cursor.execute.assert_called_once_with(
+            'update asset set uploaded_status = %s from asset_key '
+            'where asset_key.bucket = %s and asset_key.object_key = any(%s) '
+            'and asset.id = asset_key.id and asset.create_date = asset_key.create_date '
+            'and asset.uploaded_status = %s and asset.upload_id is null '
+            'returning asset.id',
+            (UploadedStatus.COMPLETE.value, 'b', ['c', 'd', 'e'], UploadedStatus.PENDING.value)
+        )
+        self.assertEqual(result, [1, 3])
+
+class UpdateUploadedStatusByBucketKeyPairsUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_happy_path(self):
+        """
+        Given:
+            Objects in more than one bucket
+        Then:
+            A single SQL update joins them against the assets, and the updated ids are returned
+        """
+        self.mock_cursor.fetchall.return_value = [(2,)]
+
+        result = AssetDao.update_uploaded_status_by_bucket_key_pairs(
+            [('a', 'c'), ('b', 'c')], UploadedStatus.PENDING.value, UploadedStatus.COMPLETE.value, self.mock_cursor
+        )
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'update asset set uploaded_status = %s '
+            'from unnest(%s, %s) as v(bucket, object_key) '
+            'join asset_key on asset_key.bucket = v.bucket and asset_key.object_key = v.object_key '
+            'where asset.id = asset_key.id and asset.create_date = asset_key.create_date '
+            'and asset.uploaded_status = %s and asset.upload_id is null '
+            'returning asset.id',
+            (UploadedStatus.COMPLETE.value, ['a', 'b'], ['c', 'c'], UploadedStatus.PENDING.value)
+        )
+        self.assertEqual(result, [2])
+
+    def test_nothing_to_update(self):
+        """
+        Given:
+            No objects
+        Then:
+            No query is made
+        """
+        self.assertEqual(
+            AssetDao.update_uploaded_status_by_bucket_key_pairs(
+                [], UploadedStatus.PENDING.value, UploadedStatus.COMPLETE.value, self.mock_cursor
+            ),
+            []
+        )
+        self.mock_cursor.execute.assert_not_called()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import MagicMock
+from datetime import datetime
+from database.asset_partition_dao import AssetPartitionDao, AssetPartition
+
+class ListPartitionsUnitTest(unittest.TestCase):
+    def test_happy_path(self):
+        """
+        Given:
+            Monthly partitions, out of order, and a default partition
+        Then:
+            Each one's range is parsed from its bound, and they're ordered by start with the default last
+        """
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [
+            ('asset_default', 'DEFAULT'),
+            ('asset_2026_11', "FOR VALUES FROM ('2026-11-01 00:00:00') TO ('2026-12-01 00:00:00')"),
+            ('asset_2026_10', "FOR VALUES FROM ('2026-10-01 00:00:00') TO ('2026-11-01 00:00:00')"),
+        ]
+
+        self.assertEqual(AssetPartitionDao.list_partitions(mock_cursor), [
+            AssetPartition('asset_2026_10', datetime(2026, 10, 1), datetime(2026, 11, 1)),
+            AssetPartition('asset_2026_11', datetime(2026, 11, 1), datetime(2026, 12, 1)),
+            AssetPartition('asset_default'),
+        ])
+
+class CreatePartitionUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_no_default(self):
+        """
+        Given:
+            There's no default partition
+        Then:
+            The partition is created in a single statement, named after its month
+        """
+        partition = AssetPartitionDao.create_partition(datetime(2026, 10, 1), datetime(2026, 11, 1), self.mock_cursor)
+
+        self.assertEqual(partition, AssetPartition('asset_2026_10', datetime(2026, 10, 1), datetime(2026, 11, 1)))
+        self.mock_cursor.execute.assert_called_once_with(
+            'create table "asset_2026_10" partition of asset for values from (%s) to (%s)',
+            (datetime(2026, 10, 1), datetime(2026, 11, 1))
+        )
+
+    def test_default(self):
+        """
+        Given:
+            There's a default partition
+        Then:
+            Its assets in range are moved into the new partition before it's attached
+        """
+        AssetPartitionDao.create_partition(
+            datetime(2026, 10, 1), datetime(2026, 11, 1), self.mock_cursor, default=AssetPartition('asset_default')
+        )
+
+        self.assertEqual([call.args[0] for call in self.mock_cursor.execute.call_args_list], [
+            'lock table "asset_default" in exclusive mode',
+            'create table "asset_2026_10" (like asset including defaults including constraints)',
+            'with moved as (delete from "asset_default" where create_date >= %s and create_date < %s returning *) '
+            'insert into "asset_2026_10" select * from moved',
+            'alter table asset attach partition "asset_2026_10" for values from (%s) to (%s)',
+        ])
+
+class DetachPartitionUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.mock_cursor.rowcount = 3
+        self.partition = AssetPartition('asset_2026_10', datetime(2026, 10, 1), datetime(2026, 11, 1))
+
+    def test_archive(self):
+        """
+        Given:
+            An archive schema
+        Then:
+            The partition is detached, its keys deleted, and it's moved into the schema
+        """
+        detached = AssetPartitionDao.detach_partition(self.partition, self.mock_cursor, archive_schema='archive')
+
+        self.assertEqual(detached, 3)
+        self.assertEqual([call.args[0] for call in self.mock_cursor.execute.call_args_list], [
+            'alter table asset detach partition "asset_2026_10"',
+            'delete from asset_key using "asset_2026_10" where asset_key.id = "asset_2026_10".id',
+            'create schema if not exists "archive"',
+            'alter table "asset_2026_10" set schema "archive"',
+        ])
+
+    def test_drop(self):
+        """
+        Given:
+            No archive schema
+        Then:
+            The partition is dropped once detached
+        """
+        AssetPartitionDao.detach_partition(self.partition, self.mock_cursor)
+
+        self.mock_cursor.execute.assert_called_with('drop table "asset_2026_10"', ())
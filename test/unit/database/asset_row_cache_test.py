@@ -0,0 +1,212 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from datetime import datetime
+from freezegun import freeze_time
+from database.asset_dao import AssetDao, AssetRow, UploadedStatus
+from database.asset_row_cache import AssetRowCache
+
+def make_asset_row(asset_id, uploaded_status=UploadedStatus.COMPLETE.value):
+    return AssetRow(
+        id=asset_id,
+        uploaded_status=uploaded_status,
+        bucket='b',
+        object_key=f'key_{asset_id}',
+        create_date=datetime.min
+    )
+
+class AssetRowCacheUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.cache = AssetRowCache(max_size=2, ttl=60)
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_caches_complete_rows(self, get_by_id_mock):
+        """
+        Given:
+            A complete asset is requested twice
+        Then:
+            The database is only queried the first time
+        """
+        get_by_id_mock.return_value = make_asset_row(1)
+
+        first = self.cache.get_by_id(1, self.mock_cursor)
+        second = self.cache.get_by_id(1, self.mock_cursor)
+
+        get_by_id_mock.assert_called_once_with(1, self.mock_cursor)
+        self.assertEqual(first, make_asset_row(1))
+        self.assertEqual(second, make_asset_row(1))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_does_not_cache_pending_or_missing_rows(self, get_by_id_mock):
+        """
+        Given:
+            A pending asset or a missing asset is requested twice
+        Then:
+            The database is queried every time
+        """
+        get_by_id_mock.return_value = make_asset_row(1, UploadedStatus.PENDING.value)
+        self.cache.get_by_id(1, self.mock_cursor)
+        self.cache.get_by_id(1, self.mock_cursor)
+
+        get_by_id_mock.return_value = None
+        self.assertIsNone(self.cache.get_by_id(2, self.mock_cursor))
+        self.assertIsNone(self.cache.get_by_id(2, self.mock_cursor))
+
+        self.assertEqual(get_by_id_mock.call_count, 4)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_entries_expire(self, get_by_id_mock):
+        """
+        Given:
+            A cached asset is requested after its ttl has passed
+        Then:
+            The database is queried again
+        """
+        get_by_id_mock.return_value = make_asset_row(1)
+
+        with freeze_time('2020-01-01 00:00:00') as frozen_time:
+            self.cache.get_by_id(1, self.mock_cursor)
+            frozen_time.tick(61)
+            self.cache.get_by_id(1, self.mock_cursor)
+
+        self.assertEqual(get_by_id_mock.call_count, 2)
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_evicts_least_recently_used(self, get_by_id_mock):
+        """
+        Given:
+            More assets are cached than max_size allows
+        Then:
+            The least recently used asset is evicted
+        """
+        get_by_id_mock.side_effect = lambda asset_id, cursor: make_asset_row(asset_id)
+
+        self.cache.get_by_id(1, self.mock_cursor)
+        self.cache.get_by_id(2, self.mock_cursor)
+        self.cache.get_by_id(1, self.mock_cursor) # 1 is now the most recently used
+        self.cache.get_by_id(3, self.mock_cursor) # evicts 2
+
+        get_by_id_mock.reset_mock()
+        self.cache.get_by_id(1, self.mock_cursor)
+        self.cache.get_by_id(3, self.mock_cursor)
+        get_by_id_mock.assert_not_called()
+
+        self.cache.get_by_id(2, self.mock_cursor)
+        get_by_id_mock.assert_called_once_with(2, self.mock_cursor)
+        self.assertEqual(self.cache.stats()['evictions'], 2)
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_invalidate(self, get_by_id_mock):
+        """
+        Given:
+            A cached asset is invalidated
+        Then:
+            The next request for it goes to the database
+        """
+        get_by_id_mock.return_value = make_asset_row(1)
+
+        self.cache.get_by_id(1, self.mock_cursor)
+        self.cache.invalidate(1)
+        self.cache.get_by_id(1, self.mock_cursor)
+
+        self.assertEqual(get_by_id_mock.call_count, 2)
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_invalidate_after_commit(self, get_by_id_mock):
+        """
+        Given:
+            A cached asset is invalidated from within a transaction
+        Then:
+            It stays cached until the transaction commits
+        """
+        get_by_id_mock.return_value = make_asset_row(1)
+        self.mock_cursor.connection.after_commit = []
+
+        self.cache.get_by_id(1, self.mock_cursor)
+        self.cache.invalidate_after_commit([1], self.mock_cursor)
+        self.assertEqual(self.cache.stats()['size'], 1)
+
+        for callback in self.mock_cursor.connection.after_commit:
+            callback()
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_read_racing_invalidation_not_cached(self, get_by_id_mock):
+        """
+        Given:
+            An asset is invalidated while it's being read from the database
+        Then:
+            The row that was read isn't cached, as it may be from before the update
+        """
+        def get_by_id(asset_id, cursor):
+            self.cache.invalidate(asset_id)
+            return make_asset_row(asset_id)
+        get_by_id_mock.side_effect = get_by_id
+
+        self.cache.get_by_id(1, self.mock_cursor)
+        self.cache.get_by_id(1, self.mock_cursor)
+
+        self.assertEqual(get_by_id_mock.call_count, 2)
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_replica_reads_not_cached(self, get_by_id_mock):
+        """
+        Given:
+            A complete asset is set back to pending, and a replica that hasn't replayed that yet is read
+        Then:
+            The replica's stale complete row is returned but not cached, so the next read sees pending
+        """
+        replica_cursor = MagicMock()
+        get_by_id_mock.return_value = make_asset_row(1)
+        self.cache.get_by_id(1, self.mock_cursor)
+        self.cache.invalidate_many([1])
+
+        stale = self.cache.get_by_id(1, replica_cursor, populate=False)
+        get_by_id_mock.return_value = make_asset_row(1, UploadedStatus.PENDING.value)
+        current = self.cache.get_by_id(1, self.mock_cursor)
+
+        self.assertEqual(stale.uploaded_status, UploadedStatus.COMPLETE.value)
+        self.assertEqual(current.uploaded_status, UploadedStatus.PENDING.value)
+        self.assertEqual(get_by_id_mock.call_count, 3)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    @patch.object(AssetDao, 'get_by_ids')
+    def test_get_by_ids_only_fetches_misses(self, get_by_ids_mock):
+        """
+        Given:
+            Some of the requested assets are cached
+        Then:
+            Only the others are fetched, with a single query
+        """
+        get_by_ids_mock.return_value = [make_asset_row(1)]
+        self.cache.get_by_ids({1}, self.mock_cursor)
+
+        get_by_ids_mock.return_value = [make_asset_row(2)]
+        result = self.cache.get_by_ids({1, 2, 3}, self.mock_cursor)
+
+        get_by_ids_mock.assert_called_with({2, 3}, self.mock_cursor)
+        self.assertEqual(
+            sorted(result, key=lambda asset: asset.id),
+            [make_asset_row(1), make_asset_row(2)]
+        )
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_disabled(self, get_by_id_mock):
+        """
+        Given:
+            The cache has a max_size of 0
+        Then:
+            Every request goes to the database
+        """
+        cache = AssetRowCache(max_size=0)
+        get_by_id_mock.return_value = make_asset_row(1)
+
+        cache.get_by_id(1, self.mock_cursor)
+        cache.get_by_id(1, self.mock_cursor)
+
+        self.assertEqual(get_by_id_mock.call_count, 2)
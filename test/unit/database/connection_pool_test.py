@@ -0,0 +1,214 @@
+import unittest
+import threading
+from unittest.mock import MagicMock
+import psycopg2
+from psycopg2 import extensions
+from database.connection_pool import (
+    ConnectionPool, PoolTimeoutException, PoolClosedException
+)
+
+def make_connection():
+    connection = MagicMock()
+    connection.closed = 0
+    connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    return connection
+
+class ConnectionPoolUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.connect_mock = MagicMock(side_effect=make_connection)
+
+    def test_opens_min_size_up_front(self):
+        """
+        Given:
+            A pool is created with a min_size
+        Then:
+            That many connections are opened immediately and sit idle
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=3, max_size=5)
+
+        self.assertEqual(self.connect_mock.call_count, 3)
+        stats = pool.stats()
+        self.assertEqual(stats['size'], 3)
+        self.assertEqual(stats['idle'], 3)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_reuses_returned_connection(self):
+        """
+        Given:
+            A connection is checked out and returned
+        Then:
+            The next checkout hands back the same connection without opening a new one
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=1, max_size=2)
+
+        with pool.connection() as first:
+            self.assertEqual(pool.stats()['in_use'], 1)
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(self.connect_mock.call_count, 1)
+        self.assertEqual(pool.stats()['checkouts'], 2)
+
+    def test_concurrent_checkouts_get_distinct_connections(self):
+        """
+        Given:
+            Several callers hold a connection at the same time
+        Then:
+            Each gets its own connection, up to max_size
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=0, max_size=3)
+
+        with pool.connection() as a, pool.connection() as b, pool.connection() as c:
+            self.assertEqual(len({id(a), id(b), id(c)}), 3)
+            self.assertEqual(pool.stats()['in_use'], 3)
+
+        self.assertEqual(pool.stats()['idle'], 3)
+
+    def test_checkout_times_out_when_exhausted(self):
+        """
+        Given:
+            Every connection is checked out
+        Then:
+            Another checkout waits for checkout_timeout and raises a PoolTimeoutException
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=0, max_size=1, checkout_timeout=0.05)
+
+        with pool.connection():
+            with self.assertRaises(PoolTimeoutException):
+                with pool.connection():
+                    pass
+
+        self.assertEqual(pool.stats()['checkout_timeouts'], 1)
+
+    def test_waiter_is_handed_released_connection(self):
+        """
+        Given:
+            A caller is waiting on an exhausted pool
+        Then:
+            It receives the connection as soon as the holder returns it
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=1, max_size=1, checkout_timeout=5)
+        waiting = threading.Event()
+        received = []
+
+        def waiter():
+            waiting.set()
+            with pool.connection() as connection:
+                received.append(connection)
+
+        with pool.connection() as held:
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            waiting.wait()
+            while pool.stats()['waiters'] == 0:
+                pass
+        thread.join()
+
+        self.assertEqual(received, [held])
+        self.assertEqual(self.connect_mock.call_count, 1)
+
+    def test_rolls_back_open_transaction_on_return(self):
+        """
+        Given:
+            A connection is returned with a transaction still open
+        Then:
+            The transaction is rolled back before the connection is reused
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=1, max_size=1)
+
+        with pool.connection() as connection:
+            connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INTRANS
+
+        connection.rollback.assert_called_once_with()
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_discards_connection_after_operational_error(self):
+        """
+        Given:
+            The caller hits an OperationalError (e.g. the server went away)
+        Then:
+            The connection is closed rather than returned to the pool
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=1, max_size=1)
+
+        with self.assertRaises(psycopg2.OperationalError):
+            with pool.connection() as connection:
+                raise psycopg2.OperationalError('server closed the connection unexpectedly')
+
+        connection.close.assert_called_once_with()
+        self.assertEqual(pool.stats()['size'], 0)
+
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, connection)
+
+    def test_recycles_after_max_uses(self):
+        """
+        Given:
+            A connection has been checked out max_uses times
+        Then:
+            It is closed and the next checkout opens a fresh connection
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=0, max_size=1, max_uses=2)
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        with pool.connection() as third:
+            pass
+
+        self.assertIs(first, second)
+        self.assertIsNot(second, third)
+        second.close.assert_called_once_with()
+        self.assertEqual(pool.stats()['connections_recycled'], 1)
+
+    def test_recycles_after_max_age(self):
+        """
+        Given:
+            An idle connection is older than max_age
+        Then:
+            It is replaced on checkout
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=1, max_size=1, max_age=0)
+
+        with pool.connection() as connection:
+            pass
+
+        self.assertEqual(self.connect_mock.call_count, 2)
+        self.assertEqual(pool.stats()['connections_recycled'], 2)
+
+    def test_health_check_replaces_dead_connection(self):
+        """
+        Given:
+            An idle connection fails its health check
+        Then:
+            A new connection is opened and handed out instead
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=1, max_size=1, health_check_after=0)
+        stale = pool._idle[0].connection
+        stale.cursor.return_value.__enter__.return_value.execute.side_effect = \
+            psycopg2.OperationalError('terminating connection')
+
+        with pool.connection() as connection:
+            self.assertIsNot(connection, stale)
+
+        stale.close.assert_called_once_with()
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+
+    def test_closed_pool_refuses_checkout(self):
+        """
+        Given:
+            The pool has been closed
+        Then:
+            Idle connections are closed, and further checkouts raise a PoolClosedException
+        """
+        pool = ConnectionPool(self.connect_mock, min_size=1, max_size=1)
+        idle = pool._idle[0].connection
+
+        pool.close()
+
+        idle.close.assert_called_once_with()
+        with self.assertRaises(PoolClosedException):
+            with pool.connection():
+                pass
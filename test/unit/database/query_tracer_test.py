@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import MagicMock, call
+from database.query_tracer import QueryTracer
+from database.statement import Statement
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class QueryTracerUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.statement = Statement('thing_get', 'select id from thing where id = %s', ('bigint',))
+        self.mock_cursor = MagicMock()
+        self.mock_cursor.rowcount = 1
+        self.mock_cursor.connection.autocommit = False
+        self.explain_cursor = self.mock_cursor.connection.cursor.return_value
+        self.explain_cursor.fetchall.return_value = [('Index Scan on thing',), ('Buffers: shared hit=3',)]
+        self.clock = FakeClock()
+        self.tracer = QueryTracer(threshold=0.1, max_logs_per_minute=2, clock=self.clock)
+
+    def record(self, seconds):
+        self.tracer.record(self.statement, self.mock_cursor, 'execute thing_get(%s)', (1,), seconds)
+
+    def test_aggregates(self):
+        """
+        Given:
+            A statement runs a few times, failing once
+        Then:
+            Its calls, failures, rows and time are totalled
+        """
+        self.record(0.01)
+        self.mock_cursor.rowcount = -1
+        self.record(0.03)
+        self.tracer.record_failure(self.statement)
+
+        self.assertEqual(self.tracer.stats(), {
+            'thing_get': {
+                'calls': 3,
+                'errors': 1,
+                'rows': 1,
+                'seconds_total': 0.04,
+                'seconds_max': 0.03,
+                'slow': 0,
+            },
+        })
+        self.mock_cursor.connection.cursor.assert_not_called()
+
+    def test_slow_query_is_explained(self):
+        """
+        Given:
+            A statement takes longer than the threshold
+        Then:
+            It is logged with its plan, explained on a separate cursor in a savepoint that is rolled back
+        """
+        with self.assertLogs('slow_query', 'WARNING') as logs:
+            self.record(0.25)
+
+        self.assertEqual(self.explain_cursor.execute.call_args_list, [
+            call('savepoint slow_query_explain'),
+            call('explain (analyze, buffers) execute thing_get(%s)', (1,)),
+            call('rollback to savepoint slow_query_explain'),
+            call('release savepoint slow_query_explain'),
+        ])
+        self.mock_cursor.execute.assert_not_called()
+        self.explain_cursor.close.assert_called_once()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('thing_get took 250.0ms, 1 rows, from outside a request', logs.output[0])
+        self.assertIn('Index Scan on thing\nBuffers: shared hit=3', logs.output[0])
+        self.assertEqual(self.tracer.stats()['thing_get']['slow'], 1)
+
+    def test_autocommit_connection(self):
+        """
+        Given:
+            A slow statement ran on an autocommit connection
+        Then:
+            It is explained in a transaction of its own that is rolled back
+        """
+        self.mock_cursor.connection.autocommit = True
+
+        with self.assertLogs('slow_query', 'WARNING'):
+            self.record(0.25)
+
+        self.assertEqual(self.explain_cursor.execute.call_args_list, [
+            call('begin'),
+            call('explain (analyze, buffers) execute thing_get(%s)', (1,)),
+            call('rollback'),
+        ])
+
+    def test_explain_failure(self):
+        """
+        Given:
+            Explaining a slow statement fails
+        Then:
+            The savepoint is still rolled back, and the query is logged without a plan
+        """
+        self.explain_cursor.execute.side_effect = [None, Exception('nope'), None, None]
+
+        with self.assertLogs('slow_query', 'WARNING') as logs:
+            self.record(0.25)
+
+        self.assertEqual(self.explain_cursor.execute.call_args_list[-2:], [
+            call('rollback to savepoint slow_query_explain'),
+            call('release savepoint slow_query_explain'),
+        ])
+        self.assertIn('Could not explain slow query', logs.output[0])
+        self.assertTrue(logs.output[1].endswith('from outside a request'))
+
+    def test_log_is_rate_limited(self):
+        """
+        Given:
+            More slow queries than can be logged in a minute
+        Then:
+            The rest are counted, and the count is reported by the first one logged the next minute
+        """
+        with self.assertLogs('slow_query', 'WARNING') as logs:
+            for _ in range(5):
+                self.record(0.25)
+            self.clock.now += 60
+            self.record(0.25)
+
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn('(3 more slow queries not logged)', logs.output[2])
+        self.assertEqual(self.explain_cursor.fetchall.call_count, 3)
+        self.assertEqual(self.tracer.stats()['thing_get']['slow'], 6)
+
+    def test_threshold_of_zero(self):
+        """
+        Given:
+            The threshold is 0
+        Then:
+            Nothing is logged, however slow
+        """
+        self.tracer.threshold = 0
+
+        self.record(10)
+
+        self.assertEqual(self.tracer.stats()['thing_get']['slow'], 0)
+        self.mock_cursor.connection.cursor.assert_not_called()
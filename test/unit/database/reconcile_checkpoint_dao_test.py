@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import MagicMock
+from database.reconcile_checkpoint_dao import ReconcileCheckpointDao
+
+class GetStartAfterUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_happy_path(self):
+        """
+        Given:
+            The bucket has a checkpoint
+        Then:
+            Its last reconciled key is returned
+        """
+        self.mock_cursor.fetchone.return_value = ('some/key',)
+
+        self.assertEqual(ReconcileCheckpointDao.get_start_after('b', self.mock_cursor), 'some/key')
+        self.mock_cursor.execute.assert_called_once_with(
+            'select start_after from reconcile_checkpoint where bucket = %s',
+            ('b',)
+        )
+
+    def test_not_found(self):
+        """
+        Given:
+            The bucket has no checkpoint
+        Then:
+            `None` is returned
+        """
+        self.mock_cursor.fetchone.return_value = None
+
+        self.assertIsNone(ReconcileCheckpointDao.get_start_after('b', self.mock_cursor))
+
+class SaveUnitTest(unittest.TestCase):
+    def test_happy_path(self):
+        """
+        Given:
+            A bucket and the last key reconciled in it
+        Then:
+            The checkpoint is inserted, or overwritten if the bucket already has one
+        """
+        mock_cursor = MagicMock()
+
+        ReconcileCheckpointDao.save('b', 'some/key', mock_cursor)
+
+        mock_cursor.execute.assert_called_once_with(
+            'insert into reconcile_checkpoint(bucket, start_after, update_date) values(%s, %s, now()) '
+            'on conflict (bucket) do update set start_after = excluded.start_after, update_date = excluded.update_date',
+            ('b', 'some/key')
+        )
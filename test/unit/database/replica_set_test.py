@@ -0,0 +1,164 @@
+import unittest
+from unittest.mock import MagicMock
+import psycopg2
+from psycopg2 import extensions
+from database.connection_pool import ConnectionPool
+from database.replica_set import ReplicaSet, replica_name
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeReplica:
+    """
+    Opens mock connections that report `lag` when asked, or fail to connect while `down`.
+    """
+    def __init__(self, name, lag=0.0):
+        self.name = name
+        self.lag = lag
+        self.down = False
+        self.lag_checks = 0
+
+    def connect(self):
+        if self.down:
+            raise psycopg2.OperationalError('could not connect to server')
+        connection = MagicMock()
+        connection.closed = 0
+        connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+        connection.name = self.name
+
+        def fetchone():
+            self.lag_checks += 1
+            return (self.lag,)
+        connection.cursor.return_value.__enter__.return_value.fetchone.side_effect = fetchone
+        return connection
+
+class ReplicaSetUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.replicas = [FakeReplica('a'), FakeReplica('b')]
+        self.replica_set = ReplicaSet(
+            {replica.name: ConnectionPool(replica.connect, min_size=0) for replica in self.replicas},
+            max_lag=5,
+            lag_check_interval=1,
+            retry_after=10,
+            clock=self.clock,
+        )
+
+    def read(self):
+        with self.replica_set.connection() as connection:
+            return connection.name if connection is not None else None
+
+    def test_reads_in_turn(self):
+        """
+        Given:
+            Two replicas within the max lag
+        Then:
+            Reads take turns between them, and each one's lag is only checked once per interval
+        """
+        self.assertEqual([self.read() for _ in range(4)], ['a', 'b', 'a', 'b'])
+        self.assertEqual([replica.lag_checks for replica in self.replicas], [1, 1])
+
+        self.clock.now += 1
+        self.read()
+
+        self.assertEqual([replica.lag_checks for replica in self.replicas], [2, 1])
+        self.assertEqual(self.replica_set.replica_stats()['a'], {
+            'available': True,
+            'lag_seconds': 0.0,
+            'reads': 3,
+            'lag_checks': 2,
+            'failures': 0,
+        })
+
+    def test_lagging_replica(self):
+        """
+        Given:
+            One replica falls too far behind, then catches up
+        Then:
+            It's skipped once its lag has been checked, and used again once a later check finds it caught up
+        """
+        self.read()
+        self.read()
+        self.replicas[0].lag = 6.5
+        self.clock.now += 1
+
+        self.assertEqual([self.read() for _ in range(3)], ['b', 'b', 'b'])
+        self.assertEqual(self.replica_set.replica_stats()['a']['lag_seconds'], 6.5)
+
+        self.replicas[0].lag = 0.5
+        self.clock.now += 1
+
+        self.assertEqual([self.read() for _ in range(2)], ['b', 'a'])
+
+    def test_unknown_lag(self):
+        """
+        Given:
+            A replica hasn't replayed anything, so its lag is unknown
+        Then:
+            It isn't used
+        """
+        self.replicas[0].lag = None
+
+        self.assertEqual([self.read() for _ in range(2)], ['b', 'b'])
+
+    def test_falls_back_to_primary(self):
+        """
+        Given:
+            Every replica is too far behind
+        Then:
+            No replica connection is handed out, and the fallback is counted
+        """
+        for replica in self.replicas:
+            replica.lag = 60
+
+        self.assertIsNone(self.read())
+        self.assertEqual(self.replica_set.stats(), {'replicas': 2, 'available': 2, 'primary_fallbacks': 1})
+
+    def test_unavailable_replica(self):
+        """
+        Given:
+            A replica can't be connected to
+        Then:
+            Reads go elsewhere, and it's only tried again after retry_after
+        """
+        self.replicas[0].down = True
+
+        self.assertEqual([self.read() for _ in range(3)], ['b', 'b', 'b'])
+        self.assertEqual(self.replica_set.replica_stats()['a']['failures'], 1)
+        self.assertEqual(self.replica_set.stats()['available'], 1)
+
+        self.replicas[0].down = False
+        self.clock.now += 10
+
+        self.assertEqual([self.read() for _ in range(2)], ['b', 'a'])
+        self.assertEqual(self.replica_set.stats()['available'], 2)
+
+    def test_marks_connections(self):
+        """
+        Given:
+            A replica set connected from connection strings
+        Then:
+            Its connections are marked as being to a replica, and its pools start empty
+        """
+        connect = MagicMock()
+        replica_set = ReplicaSet.connect(['host=replica1 port=5433 dbname=db'], connect, {'min_size': 2})
+
+        connect.assert_not_called()
+        with replica_set.replicas[0].pool.connection() as connection:
+            self.assertEqual(connection.replica, 'replica1:5433')
+        connect.assert_called_once_with('host=replica1 port=5433 dbname=db')
+
+    def test_replica_name(self):
+        """
+        Given:
+            Connection strings as keywords, as a URI, and malformed
+        Then:
+            Replicas are named by host:port, falling back to their position
+        """
+        self.assertEqual(replica_name('host=replica1 dbname=db', 0), 'replica1:5432')
+        self.assertEqual(replica_name('postgresql://replica2:5433/db', 1), 'replica2:5433')
+        self.assertEqual(replica_name('not a connection string', 2), '2')
@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch, MagicMock, call
+from database.statement import Statement
+
+class StatementUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.mock_cursor.connection.prepared_statements = set()
+        self.statement = Statement(
+            'thing_get',
+            'select id from thing where id = %s and name = %s',
+            ('bigint', 'varchar'),
+        )
+
+    def test_builds_prepared_sql(self):
+        """
+        Given:
+            A statement with param_types
+        Then:
+            Its PREPARE and EXECUTE forms are built up front, with numbered placeholders
+        """
+        self.assertEqual(
+            self.statement.prepare_sql,
+            'prepare thing_get(bigint,varchar) as select id from thing where id = $1 and name = $2'
+        )
+        self.assertEqual(self.statement.execute_sql, 'execute thing_get(%s,%s)')
+
+    def test_mismatched_param_types(self):
+        """
+        Given:
+            A statement whose param_types don't match its placeholders
+        Then:
+            An applicable error is raised
+        """
+        with self.assertRaises(ValueError):
+            Statement('thing_get', 'select id from thing where id = %s', ('bigint', 'bigint'))
+
+    def test_prepares_once_per_connection(self):
+        """
+        Given:
+            A statement is executed twice on the same connection
+        Then:
+            It is PREPAREd the first time only, and EXECUTEd both times
+        """
+        self.statement.execute(self.mock_cursor, (1, 'a'))
+        self.statement.execute(self.mock_cursor, (2, 'b'))
+
+        self.assertEqual(self.mock_cursor.execute.call_args_list, [
+            call(self.statement.prepare_sql),
+            call('execute thing_get(%s,%s)', (1, 'a')),
+            call('execute thing_get(%s,%s)', (2, 'b')),
+        ])
+        self.assertEqual(self.mock_cursor.connection.prepared_statements, {'thing_get'})
+
+    def test_prepares_again_on_new_connection(self):
+        """
+        Given:
+            A statement was prepared on one connection
+        Then:
+            It is prepared again the first time it runs on another connection
+        """
+        self.statement.execute(self.mock_cursor, (1, 'a'))
+
+        other_cursor = MagicMock()
+        other_cursor.connection.prepared_statements = set()
+        self.statement.execute(other_cursor, (1, 'a'))
+
+        other_cursor.execute.assert_any_call(self.statement.prepare_sql)
+
+    @patch.object(Statement, 'use_prepared_statements', False)
+    def test_switched_off(self):
+        """
+        Given:
+            Prepared statements are switched off
+        Then:
+            The plain SQL is executed
+        """
+        self.statement.execute(self.mock_cursor, (1, 'a'))
+
+        self.mock_cursor.execute.assert_called_once_with(
+            'select id from thing where id = %s and name = %s', (1, 'a')
+        )
+
+    def test_unprepared_statement(self):
+        """
+        Given:
+            A statement without param_types, or a connection that doesn't track
+            prepared statements
+        Then:
+            The plain SQL is executed
+        """
+        Statement('thing_get_many', 'select id from thing').execute(self.mock_cursor, ())
+        self.mock_cursor.execute.assert_called_once_with('select id from thing', ())
+
+        plain_cursor = MagicMock()
+        self.statement.execute(plain_cursor, (1, 'a'))
+        plain_cursor.execute.assert_called_once_with(
+            'select id from thing where id = %s and name = %s', (1, 'a')
+        )
@@ -0,0 +1,176 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from database.status_write_coalescer import StatusWriteCoalescer, StatusWriteQueueFullException
+
+class RecordingApply:
+    """
+    Stands in for the database: records every batch, and reports every asset
+    id below 100 as existing.
+    """
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, updates):
+        self.release.wait()
+        self.batches.append(updates)
+        return [asset_id for asset_id, _ in updates if asset_id < 100]
+
+class StatusWriteCoalescerUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.apply = RecordingApply()
+
+    def make_coalescer(self, **options):
+        coalescer = StatusWriteCoalescer(apply=self.apply, enabled=True, **options)
+        self.addCleanup(coalescer.close)
+        return coalescer
+
+    def wait_for_queue_depth(self, coalescer, depth):
+        while coalescer.stats()['queue_depth'] < depth and not self.apply.batches:
+            time.sleep(0.01)
+
+    def test_concurrent_updates_share_a_commit(self):
+        """
+        Given:
+            Many updates are submitted at once
+        Then:
+            They are applied in a single batch, and each caller learns whether its asset exists
+        """
+        coalescer = self.make_coalescer(flush_interval=0.2)
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(lambda asset_id: coalescer.submit(asset_id, 'complete'), range(90, 110)))
+
+        self.assertEqual(results, [asset_id < 100 for asset_id in range(90, 110)])
+        self.assertEqual(len(self.apply.batches), 1)
+        self.assertEqual(self.apply.batches[0], [(asset_id, 'complete') for asset_id in range(90, 110)])
+        stats = coalescer.stats()
+        self.assertEqual((stats['flushes'], stats['flushed_updates'], stats['largest_batch']), (1, 20, 20))
+        self.assertGreater(stats['wait_seconds_max'], 0)
+
+    def test_max_batch_size(self):
+        """
+        Given:
+            More updates are waiting than fit in one batch
+        Then:
+            A full batch is flushed without waiting out the flush interval, and the rest go in later batches
+        """
+        coalescer = self.make_coalescer(flush_interval=60, max_batch_size=5)
+        self.apply.release.clear()
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(coalescer.submit, asset_id, 'complete') for asset_id in range(10)]
+            # The first batch goes out as soon as it fills, and holds up the rest until it commits
+            self.wait_for_queue_depth(coalescer, 5)
+            self.apply.release.set()
+            [future.result(timeout=5) for future in futures]
+
+        self.assertEqual([len(batch) for batch in self.apply.batches], [5, 5])
+
+    def test_last_update_wins(self):
+        """
+        Given:
+            The same asset is updated more than once in a batch
+        Then:
+            It is only updated once, to the status submitted last
+        """
+        coalescer = self.make_coalescer(flush_interval=60, max_batch_size=3)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            for queued, status in enumerate(('pending', 'complete', 'pending'), start=1):
+                executor.submit(coalescer.submit, 1, status)
+                # Submit one at a time, so they're queued in order
+                self.wait_for_queue_depth(coalescer, queued)
+
+        self.assertEqual(self.apply.batches, [[(1, 'pending')]])
+
+    def test_failed_flush(self):
+        """
+        Given:
+            Applying a batch fails
+        Then:
+            Every caller in the batch gets the error
+        """
+        def failing_apply(updates):
+            raise RuntimeError('the database went away')
+        coalescer = StatusWriteCoalescer(apply=failing_apply, flush_interval=0.05)
+        self.addCleanup(coalescer.close)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(coalescer.submit, asset_id, 'complete') for asset_id in range(3)]
+            for future in futures:
+                with self.assertRaises(RuntimeError):
+                    future.result(timeout=5)
+
+        self.assertEqual(coalescer.stats()['failed_flushes'], 1)
+
+    def test_failed_update_in_batch(self):
+        """
+        Given:
+            One update in a batch makes the batch fail
+        Then:
+            The rest of the batch is applied one update at a time, and only the bad update's caller gets the error
+        """
+        def poisoned_apply(updates):
+            if any(asset_id == 2 ** 63 for asset_id, _ in updates):
+                raise OverflowError('bigint out of range')
+            return self.apply(updates)
+        coalescer = StatusWriteCoalescer(apply=poisoned_apply, flush_interval=0.2)
+        self.addCleanup(coalescer.close)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = {
+                asset_id: executor.submit(coalescer.submit, asset_id, 'complete')
+                for asset_id in (1, 2, 2 ** 63, 200)
+            }
+            with self.assertRaises(OverflowError):
+                futures[2 ** 63].result(timeout=5)
+            self.assertEqual({asset_id: futures[asset_id].result(timeout=5) for asset_id in (1, 2, 200)}, {
+                1: True,
+                2: True,
+                200: False,
+            })
+
+        self.assertEqual(self.apply.batches, [[(1, 'complete')], [(2, 'complete')], [(200, 'complete')]])
+        stats = coalescer.stats()
+        self.assertEqual((stats['failed_flushes'], stats['flushed_updates']), (1, 3))
+
+    def test_queue_full(self):
+        """
+        Given:
+            As many updates are waiting as the queue can hold
+        Then:
+            Further updates are refused straight away
+        """
+        coalescer = self.make_coalescer(flush_interval=60, max_batch_size=10, max_queue_depth=2)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for asset_id in range(2):
+                executor.submit(coalescer.submit, asset_id, 'complete')
+            self.wait_for_queue_depth(coalescer, 2)
+
+            with self.assertRaises(StatusWriteQueueFullException):
+                coalescer.submit(3, 'complete')
+            # Let the waiting updates through
+            coalescer.close()
+
+        self.assertEqual(coalescer.stats()['rejected_updates'], 1)
+
+    def test_close_flushes_queue(self):
+        """
+        Given:
+            Updates are waiting when the coalescer is closed
+        Then:
+            They are flushed straight away, and the coalescer starts again on the next update
+        """
+        coalescer = self.make_coalescer(flush_interval=60)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(coalescer.submit, 1, 'complete')
+            self.wait_for_queue_depth(coalescer, 1)
+            coalescer.close()
+            self.assertTrue(future.result(timeout=5))
+
+        coalescer.flush_interval = 0
+        self.assertTrue(coalescer.submit(2, 'complete'))
+        self.assertEqual(self.apply.batches, [[(1, 'complete')], [(2, 'complete')]])
@@ -0,0 +1,107 @@
+import threading
+import unittest
+from endpoints.admission import AdmissionController, AdmissionRejectedException, Bulkhead, parse_limits
+
+class BulkheadUnitTest(unittest.TestCase):
+    def test_sheds_once_queue_is_full(self):
+        """
+        Given:
+            As many requests are in progress as allowed, with no room to queue
+        Then:
+            The next one is rejected straight away, until one finishes
+        """
+        bulkhead = Bulkhead(max_concurrent=2, max_queue=0, max_wait=10)
+        bulkhead.acquire()
+        bulkhead.acquire()
+
+        with self.assertRaises(AdmissionRejectedException):
+            bulkhead.acquire()
+        bulkhead.release()
+        bulkhead.acquire()
+
+        self.assertEqual(bulkhead.stats(), {
+            'max_concurrent': 2,
+            'max_queue': 0,
+            'active': 2,
+            'queued': 0,
+            'admitted': 3,
+            'rejected': 1,
+            'timed_out': 0,
+        })
+
+    def test_queued_request_is_admitted_on_release(self):
+        """
+        Given:
+            A request is queued behind one in progress
+        Then:
+            It is let in once that one finishes
+        """
+        bulkhead = Bulkhead(max_concurrent=1, max_queue=1, max_wait=10)
+        bulkhead.acquire()
+        admitted = threading.Event()
+
+        def queued():
+            bulkhead.acquire()
+            admitted.set()
+        thread = threading.Thread(target=queued)
+        thread.start()
+        while bulkhead.stats()['queued'] == 0:
+            threading.Event().wait(0.001)
+        self.assertFalse(admitted.is_set())
+
+        bulkhead.release()
+        thread.join(10)
+
+        self.assertTrue(admitted.is_set())
+        self.assertEqual(bulkhead.stats()['active'], 1)
+
+    def test_queued_request_times_out(self):
+        """
+        Given:
+            A request is queued and nothing finishes within max_wait
+        Then:
+            It is rejected, and leaves the queue
+        """
+        bulkhead = Bulkhead(max_concurrent=1, max_queue=1, max_wait=0.01)
+        bulkhead.acquire()
+
+        with self.assertRaises(AdmissionRejectedException):
+            bulkhead.acquire()
+
+        stats = bulkhead.stats()
+        self.assertEqual((stats['queued'], stats['timed_out']), (0, 1))
+
+class AdmissionControllerUnitTest(unittest.TestCase):
+    def test_limits(self):
+        """
+        Given:
+            Limits for one endpoint
+        Then:
+            That endpoint gets them, and every other endpoint gets the defaults
+        """
+        controller = AdmissionController(max_concurrent=4, max_queue=2, limits=parse_limits(
+            ' /api/upload/=1:0, /api/access=8:4'
+        ))
+
+        self.assertEqual(controller.limits, {'/api/upload': (1, 0), '/api/access': (8, 4)})
+        self.assertIs(controller.bulkhead('/api/upload'), controller.bulkhead('/api/upload'))
+        self.assertEqual(
+            (controller.bulkhead('/api/upload').max_concurrent, controller.bulkhead('/api/upload').max_queue), (1, 0)
+        )
+        self.assertEqual(
+            (controller.bulkhead('/api/status').max_concurrent, controller.bulkhead('/api/status').max_queue), (4, 2)
+        )
+
+    def test_invalid_limits(self):
+        """
+        Given:
+            Limits that aren't shaped properly
+        Then:
+            An applicable error is raised
+        """
+        with self.assertRaises(ValueError) as ctx:
+            parse_limits('/api/upload=1')
+        self.assertEqual(
+            str(ctx.exception),
+            "Invalid ADMISSION_LIMITS entry '/api/upload=1', expected <endpoint>=<max concurrent>:<max queue>"
+        )
@@ -1,13 +1,16 @@
 import unittest
 from unittest.mock import patch
 from botocore.exceptions import ClientError
+from freezegun import freeze_time
 from external_services.s3_service import (
-    S3Service, S3ClientMethod, DEFAULT_BUCKET, DEFAULT_EXPIRATION,
+    S3Service, S3ClientMethod, DEFAULT_BUCKET, DEFAULT_EXPIRATION, MAX_PART_COUNT,
     S3ServiceInvalidArgsException, S3ServiceException
 )
+from external_services.signed_url_cache import SignedUrlCache
 
 class CreateSignedUrlUnitTest(unittest.TestCase):
     def setUp(self):
+        S3Service.signed_url_cache.clear()
         self.get_object_url_response = 'yay://a.url.com'
         self.post_object_url_response = {
             'url': 'yay://a.url.com', 
@@ -148,6 +151,65 @@ class CreateSignedUrlUnitTest(unittest.TestCase):
             ExpiresIn=1800,
         )
 
+    @patch.object(S3Service, 's3_client')
+    def test_get_object_url_is_reused_only_if_it_lasts_long_enough(self, mock_client):
+        """
+        Given:
+            The default signed URL cache, and a get_object URL requested again
+        Then:
+            The first URL is only returned for a request it still lasts the whole expiry of
+        """
+        mock_client.generate_presigned_url.side_effect = ['yay://first.url.com', 'yay://second.url.com']
+
+        with freeze_time('2020-01-01 00:00:00') as frozen_time:
+            first = S3Service.create_signed_url(S3ClientMethod.GET_OBJECT, 'some_key', expiration=1800)
+            frozen_time.tick(1)
+            shorter = S3Service.create_signed_url(S3ClientMethod.GET_OBJECT, 'some_key', expiration=900)
+            same = S3Service.create_signed_url(S3ClientMethod.GET_OBJECT, 'some_key', expiration=1800)
+
+        self.assertEqual(first, 'yay://first.url.com')
+        self.assertEqual(shorter, 'yay://first.url.com')
+        self.assertEqual(same, 'yay://second.url.com')
+
+    @patch.object(S3Service, 'signed_url_cache', SignedUrlCache(min_remaining_fraction=0.5))
+    @patch.object(S3Service, 's3_client')
+    def test_get_object_url_is_reused(self, mock_client):
+        """
+        Given:
+            The cache allows URLs with half their lifetime left, and the same get_object URL
+            is requested again while the first one is still valid for long enough
+        Then:
+            The first URL is returned without signing another, until too little of it is left
+        """
+        mock_client.generate_presigned_url.side_effect = ['yay://first.url.com', 'yay://second.url.com']
+
+        with freeze_time('2020-01-01 00:00:00') as frozen_time:
+            first = S3Service.create_signed_url(S3ClientMethod.GET_OBJECT, 'some_key')
+            frozen_time.tick(DEFAULT_EXPIRATION / 2)
+            second = S3Service.create_signed_url(S3ClientMethod.GET_OBJECT, 'some_key')
+            frozen_time.tick(1)
+            third = S3Service.create_signed_url(S3ClientMethod.GET_OBJECT, 'some_key')
+
+        self.assertEqual(first, 'yay://first.url.com')
+        self.assertEqual(second, 'yay://first.url.com')
+        self.assertEqual(third, 'yay://second.url.com')
+        self.assertEqual(mock_client.generate_presigned_url.call_count, 2)
+
+    @patch.object(S3Service, 's3_client')
+    def test_post_object_is_never_reused(self, mock_client):
+        """
+        Given:
+            The same post_object request is made twice
+        Then:
+            A new upload policy is signed each time
+        """
+        mock_client.generate_presigned_post.return_value = self.post_object_url_response
+
+        S3Service.create_signed_url(S3ClientMethod.POST_OBJECT, 'some_key')
+        S3Service.create_signed_url(S3ClientMethod.POST_OBJECT, 'some_key')
+
+        self.assertEqual(mock_client.generate_presigned_post.call_count, 2)
+
     def test_invalid_parameters(self):
         """
         Given:
@@ -215,6 +277,145 @@ class CreateSignedUrlUnitTest(unittest.TestCase):
         )
 
 
+class GetClientUnitTest(unittest.TestCase):
+    @patch.object(S3Service, 's3_client', None)
+    def test_client_is_built_once(self):
+        """
+        Given:
+            No S3 client has been built yet
+        Then:
+            get_client builds one on first use, and returns the same one from then on
+        """
+        client = S3Service.get_client()
 
-    
+        self.assertIsNotNone(client)
+        self.assertIs(S3Service.get_client(), client)
+
+class MultipartUploadUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch.object(S3Service, 's3_client')
+        self.mock_client = self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
 
+    def test_create_signed_part_urls(self):
+        """
+        Given:
+            A valid request for part URLs
+        Then:
+            A URL is signed for every part, in order
+        """
+        self.mock_client.generate_presigned_url.side_effect = (
+            lambda method, Params, ExpiresIn: f'yay://{Params["PartNumber"]}'
+        )
+
+        signed_urls = S3Service.create_signed_part_urls('some_key', 'upload', 3)
+
+        self.assertEqual(signed_urls, ['yay://1', 'yay://2', 'yay://3'])
+        self.mock_client.generate_presigned_url.assert_any_call(
+            'upload_part',
+            Params={
+                'Bucket': DEFAULT_BUCKET,
+                'Key': 'some_key',
+                'UploadId': 'upload',
+                'PartNumber': 3,
+            },
+            ExpiresIn=DEFAULT_EXPIRATION,
+        )
+
+    def test_create_signed_part_urls_invalid_parameters(self):
+        """
+        Given:
+            Too many parts, or too long an expiration, are requested
+        Then:
+            An applicable error is raised
+        """
+        with self.assertRaises(S3ServiceInvalidArgsException):
+            S3Service.create_signed_part_urls('some_key', 'upload', MAX_PART_COUNT + 1)
+        with self.assertRaises(S3ServiceInvalidArgsException):
+            S3Service.create_signed_part_urls('some_key', 'upload', 1, expiration=999999999999)
+
+    def test_complete_with_listed_parts(self):
+        """
+        Given:
+            No parts are supplied to complete_multipart_upload
+        Then:
+            The parts S3 has received are listed and used, in order
+        """
+        self.mock_client.get_paginator.return_value.paginate.return_value = [
+            {'Parts': [{'PartNumber': 2, 'ETag': '"b"'}]},
+            {'Parts': [{'PartNumber': 1, 'ETag': '"a"'}]},
+        ]
+
+        S3Service.complete_multipart_upload('some_key', 'upload')
+
+        self.mock_client.complete_multipart_upload.assert_called_once_with(
+            Bucket=DEFAULT_BUCKET,
+            Key='some_key',
+            UploadId='upload',
+            MultipartUpload={'Parts': [{'PartNumber': 1, 'ETag': '"a"'}, {'PartNumber': 2, 'ETag': '"b"'}]},
+        )
+
+    def test_complete_client_errors(self):
+        """
+        Given:
+            S3 rejects completing the upload because of the request, or fails
+        Then:
+            An S3ServiceInvalidArgsException or S3ServiceException is raised, respectively
+        """
+        self.mock_client.complete_multipart_upload.side_effect = ClientError(
+            {'Error': {'Code': 'InvalidPart', 'Message': 'One or more of the specified parts could not be found.'}},
+            'CompleteMultipartUpload'
+        )
+        with self.assertRaises(S3ServiceInvalidArgsException) as ctx:
+            S3Service.complete_multipart_upload('some_key', 'upload', parts=[(1, '"a"')])
+        self.assertEqual(
+            str(ctx.exception),
+            'Failed to complete multipart upload: One or more of the specified parts could not be found.'
+        )
+
+        self.mock_client.complete_multipart_upload.side_effect = ClientError(
+            {'Error': {'Code': 'InternalError', 'Message': 'Oops'}},
+            'CompleteMultipartUpload'
+        )
+        with self.assertRaises(S3ServiceException):
+            S3Service.complete_multipart_upload('some_key', 'upload', parts=[(1, '"a"')])
+
+    def test_abort_missing_upload(self):
+        """
+        Given:
+            The upload being aborted no longer exists
+        Then:
+            No error is raised
+        """
+        self.mock_client.abort_multipart_upload.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchUpload', 'Message': 'The specified upload does not exist.'}},
+            'AbortMultipartUpload'
+        )
+
+        S3Service.abort_multipart_upload('some_key', 'upload')
+
+class ListObjectKeysUnitTest(unittest.TestCase):
+    @patch.object(S3Service, 's3_client')
+    def test_happy_path(self, mock_client):
+        """
+        Given:
+            A listing to resume after a key
+        Then:
+            The listing starts after it, and each page's keys are yielded in turn
+        """
+        paginate = mock_client.get_paginator.return_value.paginate
+        paginate.return_value = [
+            {'Contents': [{'Key': 'b'}, {'Key': 'c'}]},
+            {'Contents': [{'Key': 'd'}]},
+            {},
+        ]
+
+        pages = list(S3Service.list_object_keys('some-bucket', start_after='a', page_size=2))
+
+        mock_client.get_paginator.assert_called_once_with('list_objects_v2')
+        paginate.assert_called_once_with(
+            Bucket='some-bucket', StartAfter='a', PaginationConfig={'PageSize': 2}
+        )
+        self.assertEqual(pages, [['b', 'c'], ['d'], []])
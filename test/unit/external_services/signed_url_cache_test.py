@@ -0,0 +1,61 @@
+import unittest
+from freezegun import freeze_time
+from external_services.signed_url_cache import SignedUrlCache
+
+class SignedUrlCacheUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = SignedUrlCache(max_size=2, min_remaining_fraction=0.5)
+        self.key = ('bucket', 'some_key', 'get_object')
+
+    def test_reuses_url_with_enough_time_left(self):
+        """
+        Given:
+            A URL was cached and at least the configured fraction of the requested lifetime is left
+        Then:
+            The cached URL is returned, and once too little is left, it is not
+        """
+        with freeze_time('2020-01-01 00:00:00') as frozen_time:
+            self.cache.put(self.key, 'yay://a.url.com', 60, frozen_time().timestamp())
+
+            frozen_time.tick(30)
+            self.assertEqual(self.cache.get(self.key, 60), 'yay://a.url.com')
+            # A request for a longer URL needs more time left
+            self.assertIsNone(self.cache.get(self.key, 120))
+
+            frozen_time.tick(1)
+            self.assertIsNone(self.cache.get(self.key, 60))
+
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_evicts_least_recently_used(self):
+        """
+        Given:
+            More URLs are cached than max_size allows
+        Then:
+            The least recently used URL is evicted
+        """
+        with freeze_time('2020-01-01 00:00:00') as frozen_time:
+            now = frozen_time().timestamp()
+            self.cache.put(('b', 'one', 'get_object'), 'yay://one', 60, now)
+            self.cache.put(('b', 'two', 'get_object'), 'yay://two', 60, now)
+            self.cache.get(('b', 'one', 'get_object'), 60) # one is now the most recently used
+            self.cache.put(('b', 'three', 'get_object'), 'yay://three', 60, now)
+
+            self.assertEqual(self.cache.get(('b', 'one', 'get_object'), 60), 'yay://one')
+            self.assertEqual(self.cache.get(('b', 'three', 'get_object'), 60), 'yay://three')
+            self.assertIsNone(self.cache.get(('b', 'two', 'get_object'), 60))
+
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_disabled(self):
+        """
+        Given:
+            The cache has a max_size of 0
+        Then:
+            Nothing is ever returned from it
+        """
+        cache = SignedUrlCache(max_size=0)
+        with freeze_time('2020-01-01 00:00:00') as frozen_time:
+            cache.put(self.key, 'yay://a.url.com', 60, frozen_time().timestamp())
+            self.assertIsNone(cache.get(self.key, 60))
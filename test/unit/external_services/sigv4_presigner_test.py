@@ -0,0 +1,212 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from botocore.config import Config
+from freezegun import freeze_time
+from external_services.s3_service import S3Service, S3ClientMethod
+from external_services.sigv4_presigner import SigV4Presigner
+
+OBJECT_KEYS = [
+    'ABCDE.txt',
+    'a folder/with spaces+plus~tilde.jpg',
+    "we!rd'(*)&=?#%;chars.txt",
+    '//double/../slashes/./',
+    'ünïcödé/日本語.png',
+]
+
+def make_client(region_name='eu-west-2', session_token=None, **config):
+    return boto3.client(
+        's3',
+        region_name=region_name,
+        aws_access_key_id='AKIDEXAMPLE',
+        aws_secret_access_key='wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+        aws_session_token=session_token,
+        config=Config(**config) if config else None,
+    )
+
+class SigV4PresignerConformanceTest(unittest.TestCase):
+    def assert_matches_botocore(self, client, bucket):
+        presigner = SigV4Presigner(client)
+        with freeze_time('2020-02-29 23:59:30'):
+            for object_key in OBJECT_KEYS:
+                for expires_in in (1, 60, 1800):
+                    self.assertIsNotNone(presigner.generate_presigned_url(bucket, object_key, expires_in))
+                    self.assertEqual(
+                        presigner.generate_presigned_url(bucket, object_key, expires_in),
+                        client.generate_presigned_url(
+                            'get_object',
+                            Params={'Bucket': bucket, 'Key': object_key},
+                            ExpiresIn=expires_in
+                        )
+                    )
+                    self.assertEqual(
+                        presigner.generate_presigned_post(bucket, object_key, expires_in),
+                        client.generate_presigned_post(
+                            bucket,
+                            object_key,
+                            Fields={},
+                            Conditions=[],
+                            ExpiresIn=expires_in
+                        )
+                    )
+
+    def test_part_urls(self):
+        """
+        Given:
+            URLs for the parts of a multipart upload are requested
+        Then:
+            They are identical to botocore's, with and without a session token
+        """
+        for client in (make_client(), make_client(session_token='FQoG/ZXIvYXdzE+/token==')):
+            presigner = SigV4Presigner(client)
+            with freeze_time('2020-02-29 23:59:30'):
+                for object_key in OBJECT_KEYS:
+                    expected = [
+                        client.generate_presigned_url(
+                            'upload_part',
+                            Params={
+                                'Bucket': 'my-bucket',
+                                'Key': object_key,
+                                'UploadId': 'VXBsb2FkIElE+/=~.-_',
+                                'PartNumber': part_number,
+                            },
+                            ExpiresIn=600
+                        )
+                        for part_number in (1, 2, 10000)
+                    ]
+                    self.assertEqual(
+                        presigner.generate_presigned_part_urls(
+                            'my-bucket', object_key, 'VXBsb2FkIElE+/=~.-_', (1, 2, 10000), 600
+                        ),
+                        expected
+                    )
+
+    def test_regional_client(self):
+        """
+        Given:
+            A client in a region that only supports SigV4
+        Then:
+            The presigner's URLs and POST policies are identical to botocore's
+        """
+        self.assert_matches_botocore(make_client(), 'my-bucket')
+
+    def test_session_token(self):
+        """
+        Given:
+            Temporary credentials, with a session token
+        Then:
+            The presigner's URLs and POST policies are identical to botocore's
+        """
+        self.assert_matches_botocore(make_client(session_token='FQoG/ZXIvYXdzE+/token=='), 'my-bucket')
+
+    def test_path_style_addressing(self):
+        """
+        Given:
+            A bucket that can't be addressed as a subdomain, and a client configured for path-style addressing
+        Then:
+            The presigner's URLs and POST policies are identical to botocore's
+        """
+        self.assert_matches_botocore(make_client(), 'my.dotted.bucket')
+        self.assert_matches_botocore(
+            make_client('us-west-2', signature_version='s3v4', s3={'addressing_style': 'path'}),
+            'my-bucket'
+        )
+
+    def test_sigv4_forced_in_us_east_1(self):
+        """
+        Given:
+            A us-east-1 client configured to sign with SigV4
+        Then:
+            The presigner's URLs and POST policies are identical to botocore's
+        """
+        self.assert_matches_botocore(make_client('us-east-1', signature_version='s3v4'), 'my-bucket')
+
+    def test_falls_back_for_sigv2(self):
+        """
+        Given:
+            A us-east-1 client left to botocore's default of presigning with SigV2
+        Then:
+            The presigner declines to sign anything
+        """
+        presigner = SigV4Presigner(make_client('us-east-1'))
+
+        self.assertIsNone(presigner.generate_presigned_url('my-bucket', 'ABCDE.txt', 60))
+        self.assertIsNone(presigner.generate_presigned_post('my-bucket', 'ABCDE.txt', 60))
+
+    def test_falls_back_for_filename_placeholder(self):
+        """
+        Given:
+            A POST for a key ending in ${filename}, which botocore turns into a starts-with condition
+        Then:
+            The presigner declines to sign it
+        """
+        presigner = SigV4Presigner(make_client())
+
+        self.assertIsNone(presigner.generate_presigned_post('my-bucket', 'uploads/${filename}', 60))
+
+    def test_only_probes_each_bucket_once(self):
+        """
+        Given:
+            Many URLs are signed for the same bucket
+        Then:
+            botocore is only asked to sign the first probe for it
+        """
+        client = make_client()
+        presigner = SigV4Presigner(client)
+
+        with patch.object(client, 'generate_presigned_url', wraps=client.generate_presigned_url) as wrapped:
+            for object_key in OBJECT_KEYS:
+                presigner.generate_presigned_url('my-bucket', object_key, 60)
+
+        self.assertEqual(wrapped.call_count, 1)
+
+    def test_signing_key_is_derived_once_per_day(self):
+        """
+        Given:
+            URLs are signed on the same day and then on the next day
+        Then:
+            A signing key is derived once for each day
+        """
+        presigner = SigV4Presigner(make_client())
+
+        with freeze_time('2020-02-29 12:00:00') as frozen_time:
+            presigner.generate_presigned_url('my-bucket', 'ABCDE.txt', 60)
+            presigner.generate_presigned_url('my-bucket', 'FGHIJ.txt', 60)
+            self.assertEqual(len(presigner._signing_keys), 1)
+
+            frozen_time.tick(60 * 60 * 24)
+            presigner.generate_presigned_url('my-bucket', 'ABCDE.txt', 60)
+            self.assertEqual(len(presigner._signing_keys), 2)
+
+class S3ServiceNativePresignerTest(unittest.TestCase):
+    def setUp(self):
+        S3Service.signed_url_cache.clear()
+
+    @patch.object(S3Service, 'use_native_presigner', True)
+    def test_create_signed_url(self):
+        """
+        Given:
+            The native presigner is switched on
+        Then:
+            create_signed_url returns what the client itself would have
+        """
+        client = make_client()
+        with patch.object(S3Service, 's3_client', client), freeze_time('2020-02-29 12:00:00'):
+            self.assertEqual(
+                S3Service.create_signed_url(S3ClientMethod.GET_OBJECT, 'ABCDE.txt', bucket_name='my-bucket'),
+                client.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': 'my-bucket', 'Key': 'ABCDE.txt'},
+                    ExpiresIn=60
+                )
+            )
+            self.assertEqual(
+                S3Service.create_signed_url(S3ClientMethod.POST_OBJECT, 'ABCDE.txt', bucket_name='my-bucket'),
+                client.generate_presigned_post(
+                    'my-bucket',
+                    'ABCDE.txt',
+                    Fields={},
+                    Conditions=[],
+                    ExpiresIn=60
+                )
+            )
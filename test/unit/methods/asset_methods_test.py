@@ -2,40 +2,50 @@ import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 from methods.asset_methods import (
-    change_asset_upload_status, ChangeUploadStatusInvalidArgsException, AssetNotFoundException
+    change_asset_upload_status,
+    change_asset_upload_statuses,
+    ChangeUploadStatusInvalidArgsException,
+    AssetNotFoundException,
+    MAX_BATCH_STATUS_UPDATE_SIZE,
+    list_assets,
+    ListAssetsInvalidArgsException,
+    DEFAULT_LIST_PAGE_SIZE,
+    MAX_LIST_PAGE_SIZE,
+    export_assets,
+    change_asset_upload_status_coalesced,
 )
 from database.asset_dao import AssetDao, UploadedStatus, AssetRow
+from database.asset_row_cache import asset_row_cache
+from database.status_write_coalescer import status_write_coalescer
 
 class ChangeAssetUploadStatusUnitTest(unittest.TestCase):
     def setUp(self):
         self.mock_cursor = MagicMock()
 
-    @patch.object(AssetDao, 'update_uploaded_status')
     @patch.object(AssetDao, 'get_by_id')
-    def test_happy_path(self, get_by_id_mock, update_uploaded_status_mock):
+    @patch.object(AssetDao, 'update_uploaded_status')
+    def test_happy_path(self, update_uploaded_status_mock, get_by_id_mock):
         """
         Given:
             The requested asset exists in the database
         Then:
-            The asset's uploaded_status is successfully updated
+            The asset's uploaded_status is successfully updated, with no separate lookup
         """
         data = {
             'asset_id': 1,
             'uploaded_status': UploadedStatus.COMPLETE.value
         }
 
-        get_by_id_mock.return_value = AssetRow(
+        update_uploaded_status_mock.return_value = AssetRow(
             id=1,
-            uploaded_status=UploadedStatus.PENDING.value,
+            uploaded_status=UploadedStatus.COMPLETE.value,
             bucket='',
             object_key='',
             create_date=datetime.utcnow()
         )
 
         result = change_asset_upload_status(data, self.mock_cursor)
-        get_by_id_mock.assert_called_once_with(
-            1, self.mock_cursor
-        )
+        get_by_id_mock.assert_not_called()
         update_uploaded_status_mock.assert_called_once_with(
             1, UploadedStatus.COMPLETE.value, self.mock_cursor
         )
@@ -80,6 +90,18 @@ class ChangeAssetUploadStatusUnitTest(unittest.TestCase):
             'Invalid key: asset_id, Value: some string? is not an int'
         )
 
+        data = {
+            'asset_id': 2 ** 63,
+            'uploaded_status': UploadedStatus.COMPLETE.value,
+        }
+
+        with self.assertRaises(ChangeUploadStatusInvalidArgsException) as ctx:
+            change_asset_upload_status(data, self.mock_cursor)
+        self.assertEqual(
+            str(ctx.exception),
+            f'Invalid key: asset_id, Value: {2 ** 63} is out of range'
+        )
+
         data = {
             'asset_id': 1,
             'uploaded_status': 'hello',
@@ -92,15 +114,39 @@ class ChangeAssetUploadStatusUnitTest(unittest.TestCase):
             "Invalid key: uploaded_status, Value: hello is not one of ['pending', 'complete']"
         )
     
-    @patch.object(AssetDao, 'get_by_id')
-    def test_invalid_asset_id(self, get_by_id_mock):
+    @patch.object(asset_row_cache, 'invalidate_after_commit')
+    @patch.object(AssetDao, 'update_uploaded_status')
+    def test_invalidates_cached_asset(self, update_uploaded_status_mock, invalidate_mock):
+        """
+        Given:
+            The requested asset exists in the database
+        Then:
+            Any cached copy of the asset is invalidated once the update commits
+        """
+        update_uploaded_status_mock.return_value = AssetRow(
+            id=1,
+            uploaded_status=UploadedStatus.PENDING.value,
+            bucket='',
+            object_key='',
+            create_date=datetime.utcnow()
+        )
+
+        change_asset_upload_status({
+            'asset_id': 1,
+            'uploaded_status': UploadedStatus.PENDING.value
+        }, self.mock_cursor)
+
+        invalidate_mock.assert_called_once_with([1], self.mock_cursor)
+
+    @patch.object(AssetDao, 'update_uploaded_status')
+    def test_invalid_asset_id(self, update_uploaded_status_mock):
         """
         Given:
             The requested asset does not exist in the database
         Then:
             An applicable error is thrown
         """
-        get_by_id_mock.return_value = None
+        update_uploaded_status_mock.return_value = None
 
         data = {
             'asset_id': 1,
@@ -110,3 +156,280 @@ class ChangeAssetUploadStatusUnitTest(unittest.TestCase):
         with self.assertRaises(AssetNotFoundException) as ctx:
             change_asset_upload_status(data, self.mock_cursor)
         self.assertEqual(str(ctx.exception), 'Asset with id 1 not found')
+
+class ChangeAssetUploadStatusesUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    @patch.object(AssetDao, 'update_uploaded_statuses')
+    def test_happy_path(self, update_uploaded_statuses_mock):
+        """
+        Given:
+            Some of the requested assets exist in the database
+        Then:
+            All updates are applied with one call, and the response says which
+            assets were updated and which were not found
+        """
+        update_uploaded_statuses_mock.return_value = [3, 1]
+
+        result = change_asset_upload_statuses({
+            'updates': [
+                {'asset_id': 3, 'uploaded_status': UploadedStatus.COMPLETE.value},
+                {'asset_id': 2, 'uploaded_status': UploadedStatus.COMPLETE.value},
+                {'asset_id': 1, 'uploaded_status': UploadedStatus.COMPLETE.value},
+            ]
+        }, self.mock_cursor)
+
+        update_uploaded_statuses_mock.assert_called_once_with([
+            (1, UploadedStatus.COMPLETE.value),
+            (2, UploadedStatus.COMPLETE.value),
+            (3, UploadedStatus.COMPLETE.value),
+        ], self.mock_cursor)
+
+        self.assertEqual(result, {
+            'success': True,
+            'updated': [3, 1],
+            'not_found': [2],
+        })
+
+    @patch.object(asset_row_cache, 'invalidate_after_commit')
+    @patch.object(AssetDao, 'update_uploaded_statuses')
+    def test_invalidates_cached_assets(self, update_uploaded_statuses_mock, invalidate_many_mock):
+        """
+        Given:
+            Some of the requested assets exist in the database
+        Then:
+            Any cached copies of the updated assets are invalidated once the update commits
+        """
+        update_uploaded_statuses_mock.return_value = [1]
+
+        change_asset_upload_statuses({
+            'updates': [
+                {'asset_id': 1, 'uploaded_status': UploadedStatus.PENDING.value},
+                {'asset_id': 2, 'uploaded_status': UploadedStatus.PENDING.value},
+            ]
+        }, self.mock_cursor)
+
+        invalidate_many_mock.assert_called_once_with({1}, self.mock_cursor)
+
+    @patch.object(AssetDao, 'update_uploaded_statuses')
+    def test_repeated_asset_id_last_update_wins(self, update_uploaded_statuses_mock):
+        """
+        Given:
+            The same asset_id is updated more than once in the batch
+        Then:
+            Only its last update is applied
+        """
+        update_uploaded_statuses_mock.return_value = [1]
+
+        result = change_asset_upload_statuses({
+            'updates': [
+                {'asset_id': 1, 'uploaded_status': UploadedStatus.COMPLETE.value},
+                {'asset_id': 1, 'uploaded_status': UploadedStatus.PENDING.value},
+            ]
+        }, self.mock_cursor)
+
+        update_uploaded_statuses_mock.assert_called_once_with([
+            (1, UploadedStatus.PENDING.value),
+        ], self.mock_cursor)
+        self.assertEqual(result, {
+            'success': True,
+            'updated': [1],
+            'not_found': [],
+        })
+
+    @patch.object(AssetDao, 'update_uploaded_statuses')
+    def test_invalid_request(self, update_uploaded_statuses_mock):
+        """
+        Given:
+            The request is missing `updates`, it is malformed, or any one update is invalid
+        Then:
+            An applicable error is thrown and nothing is updated
+        """
+        with self.assertRaises(ChangeUploadStatusInvalidArgsException) as ctx:
+            change_asset_upload_statuses({}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Missing key: updates')
+
+        with self.assertRaises(ChangeUploadStatusInvalidArgsException) as ctx:
+            change_asset_upload_statuses({'updates': 1}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Invalid key: updates, Value: 1 is not a list')
+
+        with self.assertRaises(ChangeUploadStatusInvalidArgsException) as ctx:
+            change_asset_upload_statuses({
+                'updates': [{'asset_id': 1, 'uploaded_status': 'complete'}] * (MAX_BATCH_STATUS_UPDATE_SIZE + 1)
+            }, self.mock_cursor)
+        self.assertEqual(
+            str(ctx.exception),
+            f'Invalid key: updates, at most {MAX_BATCH_STATUS_UPDATE_SIZE} updates can be made at once'
+        )
+
+        with self.assertRaises(ChangeUploadStatusInvalidArgsException) as ctx:
+            change_asset_upload_statuses({
+                'updates': [
+                    {'asset_id': 1, 'uploaded_status': 'complete'},
+                    {'asset_id': 2, 'uploaded_status': 'hello'},
+                ]
+            }, self.mock_cursor)
+        self.assertEqual(
+            str(ctx.exception),
+            "Invalid update at index 1: Invalid key: uploaded_status, Value: hello is not one of ['pending', 'complete']"
+        )
+
+        with self.assertRaises(ChangeUploadStatusInvalidArgsException) as ctx:
+            change_asset_upload_statuses({'updates': ['abc']}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Invalid update at index 0: abc is not an object')
+
+        update_uploaded_statuses_mock.assert_not_called()
+
+class ListAssetsUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.assets = [
+            AssetRow(id=asset_id, uploaded_status='complete', bucket='b', object_key=f'key{asset_id}',
+                     create_date=datetime(2020, 1, asset_id, 12, 30, 0, 500))
+            for asset_id in range(1, 4)
+        ]
+
+    @patch.object(AssetDao, 'list_page')
+    def test_pages_through_assets(self, list_page_mock):
+        """
+        Given:
+            There are more assets than fit on a page
+        Then:
+            A cursor to the next page is returned, which picks up after the last asset of the page
+        """
+        list_page_mock.return_value = self.assets
+        result = list_assets({'limit': '2', 'uploaded_status': 'complete'}, self.mock_cursor)
+
+        list_page_mock.assert_called_once_with(
+            3,
+            self.mock_cursor,
+            uploaded_status='complete',
+            bucket=None,
+            created_after=None,
+            created_before=None,
+            after=None,
+        )
+        self.assertEqual([asset['asset_id'] for asset in result['assets']], [1, 2])
+        self.assertEqual(result['assets'][0], {
+            'asset_id': 1,
+            'uploaded_status': 'complete',
+            'bucket': 'b',
+            'object_key': 'key1',
+            'create_date': '2020-01-01T12:30:00.000500',
+        })
+
+        list_page_mock.reset_mock()
+        list_page_mock.return_value = self.assets[2:]
+        result = list_assets({'limit': '2', 'cursor': result['next_cursor']}, self.mock_cursor)
+
+        self.assertEqual(list_page_mock.call_args[1]['after'], (self.assets[1].create_date, 2))
+        self.assertEqual([asset['asset_id'] for asset in result['assets']], [3])
+        self.assertIsNone(result['next_cursor'])
+
+    @patch.object(AssetDao, 'list_page')
+    def test_date_range(self, list_page_mock):
+        """
+        Given:
+            A creation date range is supplied, in UTC and in another time zone
+        Then:
+            Both ends are passed on as UTC timestamps
+        """
+        list_page_mock.return_value = []
+        list_assets({
+            'created_after': '2020-01-01T00:00:00Z',
+            'created_before': '2020-01-02T02:00:00+02:00',
+        }, self.mock_cursor)
+
+        self.assertEqual(list_page_mock.call_args[1]['created_after'], datetime(2020, 1, 1))
+        self.assertEqual(list_page_mock.call_args[1]['created_before'], datetime(2020, 1, 2))
+        self.assertEqual(list_page_mock.call_args[0][0], DEFAULT_LIST_PAGE_SIZE + 1)
+
+    @patch.object(AssetDao, 'list_page')
+    def test_invalid_request(self, list_page_mock):
+        """
+        Given:
+            Parameters are provided that are not valid
+        Then:
+            An applicable error is raised
+        """
+        for request, message in (
+            ({'uploaded_status': 'abc'}, "Invalid key: uploaded_status, Value: abc is not one of ['pending', 'complete']"),
+            ({'limit': 'abc'}, 'Invalid key: limit, Value: abc is not an int'),
+            ({'limit': '0'}, f'Invalid key: limit, Value: 0 is not between 1 and {MAX_LIST_PAGE_SIZE}'),
+            ({'created_after': 'yesterday'}, 'Invalid key: created_after, Value: yesterday is not an ISO 8601 date'),
+            ({'cursor': 'abc'}, 'Invalid key: cursor, Value: abc is not a cursor from a previous page'),
+            ({'cursor': 'WzFd'}, 'Invalid key: cursor, Value: WzFd is not a cursor from a previous page'),
+            # Query parameters given more than once
+            ({'limit': ['1', '2']}, "Invalid key: limit, Value: ['1', '2'] is not a string"),
+            ({'created_after': ['2020-01-01', '2020-02-01']}, (
+                "Invalid key: created_after, Value: ['2020-01-01', '2020-02-01'] is not a string"
+            )),
+        ):
+            with self.assertRaises(ListAssetsInvalidArgsException) as ctx:
+                list_assets(request, self.mock_cursor)
+            self.assertEqual(str(ctx.exception), message)
+
+        list_page_mock.assert_not_called()
+
+class ExportAssetsUnitTest(unittest.TestCase):
+    @patch.object(AssetDao, 'iter_all')
+    def test_chunks_by_itersize(self, iter_all_mock):
+        """
+        Given:
+            The cursor's itersize doesn't divide the number of assets
+        Then:
+            One NDJSON line is written per asset, in chunks of at most itersize lines
+        """
+        mock_cursor = MagicMock()
+        mock_cursor.itersize = 2
+        iter_all_mock.return_value = iter([
+            AssetRow(id=asset_id, uploaded_status='complete', bucket='b', object_key=f'key\n{asset_id}',
+                     create_date=datetime(2020, 1, 1))
+            for asset_id in range(1, 4)
+        ])
+
+        chunks = list(export_assets(mock_cursor))
+
+        iter_all_mock.assert_called_once_with(mock_cursor)
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [2, 1])
+        self.assertEqual(
+            chunks[1],
+            '{"asset_id": 3, "uploaded_status": "complete", "bucket": "b", '
+            '"object_key": "key\\n3", "create_date": "2020-01-01T00:00:00"}\n'
+        )
+
+class ChangeAssetUploadStatusCoalescedUnitTest(unittest.TestCase):
+    @patch.object(asset_row_cache, 'invalidate')
+    @patch.object(status_write_coalescer, 'submit')
+    def test_happy_path(self, submit_mock, invalidate_mock):
+        """
+        Given:
+            A valid status update, for an asset that exists
+        Then:
+            The update goes through the coalescer, and the asset's cached row is invalidated once it commits
+        """
+        submit_mock.return_value = True
+
+        result = change_asset_upload_status_coalesced({'asset_id': 1, 'uploaded_status': 'complete'})
+
+        submit_mock.assert_called_once_with(1, 'complete')
+        invalidate_mock.assert_called_once_with(1)
+        self.assertEqual(result, {'success': True, 'uploaded_status': 'complete'})
+
+    @patch.object(status_write_coalescer, 'submit')
+    def test_invalid_asset_id(self, submit_mock):
+        """
+        Given:
+            The asset doesn't exist, or the update is invalid
+        Then:
+            An applicable error is raised
+        """
+        submit_mock.return_value = False
+        with self.assertRaises(AssetNotFoundException):
+            change_asset_upload_status_coalesced({'asset_id': 1, 'uploaded_status': 'complete'})
+
+        submit_mock.reset_mock()
+        with self.assertRaises(ChangeUploadStatusInvalidArgsException):
+            change_asset_upload_status_coalesced({'asset_id': 1, 'uploaded_status': 'abc'})
+        submit_mock.assert_not_called()
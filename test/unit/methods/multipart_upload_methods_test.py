@@ -0,0 +1,302 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from datetime import datetime
+from methods.multipart_upload_methods import (
+    initiate_multipart_upload,
+    complete_multipart_upload,
+    abort_multipart_upload,
+    MultipartUploadInvalidArgsException,
+    AssetNotFoundException,
+    DEFAULT_PART_SIZE,
+    MIN_PART_SIZE,
+    MIB,
+)
+from database.asset_dao import AssetDao, UploadedStatus, AssetRow
+from database.asset_row_cache import asset_row_cache
+from external_services.s3_service import (
+    S3Service, DEFAULT_BUCKET, MAX_PART_COUNT, S3ServiceException
+)
+
+def make_asset_row(uploaded_status=UploadedStatus.PENDING.value, upload_id=None):
+    return AssetRow(
+        id=1,
+        uploaded_status=uploaded_status,
+        bucket=DEFAULT_BUCKET,
+        object_key='big.bin',
+        create_date=datetime.min,
+        upload_id=upload_id,
+    )
+
+class InitiateMultipartUploadUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    @patch.object(AssetDao, 'set_upload_id')
+    @patch.object(S3Service, 'abort_multipart_upload')
+    @patch.object(S3Service, 'create_signed_part_urls')
+    @patch.object(S3Service, 'create_multipart_upload')
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_happy_path(
+        self,
+        insert_or_get_mock,
+        create_multipart_upload_mock,
+        create_signed_part_urls_mock,
+        abort_multipart_upload_mock,
+        set_upload_id_mock
+    ):
+        """
+        Given:
+            The object key doesn't correspond to an asset yet
+        Then:
+            A multipart upload is created and recorded on a new asset, and a URL
+            is signed for every part
+        """
+        insert_or_get_mock.return_value = make_asset_row()
+        create_multipart_upload_mock.return_value = 'upload'
+        create_signed_part_urls_mock.return_value = ['yay://1', 'yay://2', 'yay://3']
+
+        result = initiate_multipart_upload({
+            'object_key': 'big.bin',
+            'size': 2 * DEFAULT_PART_SIZE + 1,
+            'expires_in': 600,
+        }, self.mock_cursor)
+
+        create_multipart_upload_mock.assert_called_once_with('big.bin', bucket_name=DEFAULT_BUCKET)
+        create_signed_part_urls_mock.assert_called_once_with(
+            'big.bin', 'upload', 3, bucket_name=DEFAULT_BUCKET, expiration=600
+        )
+        set_upload_id_mock.assert_called_once_with(1, 'upload', self.mock_cursor)
+        abort_multipart_upload_mock.assert_not_called()
+        self.assertEqual(result, {
+            'asset_id': 1,
+            'upload_id': 'upload',
+            'part_size': DEFAULT_PART_SIZE,
+            'parts': [
+                {'part_number': 1, 'url': 'yay://1'},
+                {'part_number': 2, 'url': 'yay://2'},
+                {'part_number': 3, 'url': 'yay://3'},
+            ],
+        })
+
+    @patch.object(AssetDao, 'set_upload_id')
+    @patch.object(S3Service, 'abort_multipart_upload')
+    @patch.object(S3Service, 'create_signed_part_urls')
+    @patch.object(S3Service, 'create_multipart_upload')
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_replaces_upload_in_progress(
+        self,
+        insert_or_get_mock,
+        create_multipart_upload_mock,
+        create_signed_part_urls_mock,
+        abort_multipart_upload_mock,
+        set_upload_id_mock
+    ):
+        """
+        Given:
+            The asset already has a multipart upload in progress
+        Then:
+            The new upload is recorded and the old one is aborted
+        """
+        insert_or_get_mock.return_value = make_asset_row(upload_id='old upload')
+        create_multipart_upload_mock.return_value = 'upload'
+        create_signed_part_urls_mock.return_value = ['yay://1']
+
+        initiate_multipart_upload({
+            'object_key': 'big.bin',
+            'size': MIN_PART_SIZE,
+            'part_size': MIN_PART_SIZE,
+        }, self.mock_cursor)
+
+        set_upload_id_mock.assert_called_once_with(1, 'upload', self.mock_cursor)
+        abort_multipart_upload_mock.assert_called_once_with('big.bin', 'old upload', bucket_name=DEFAULT_BUCKET)
+
+    @patch.object(AssetDao, 'set_upload_id')
+    @patch.object(S3Service, 'abort_multipart_upload')
+    @patch.object(S3Service, 'create_signed_part_urls')
+    @patch.object(S3Service, 'create_multipart_upload')
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_part_size_grows_to_fit_part_limit(
+        self,
+        insert_or_get_mock,
+        create_multipart_upload_mock,
+        create_signed_part_urls_mock,
+        abort_multipart_upload_mock,
+        set_upload_id_mock
+    ):
+        """
+        Given:
+            No part_size is requested, and the default would need more parts than S3 allows
+        Then:
+            The smallest whole number of MiB that fits is used instead
+        """
+        insert_or_get_mock.return_value = make_asset_row()
+        create_multipart_upload_mock.return_value = 'upload'
+        create_signed_part_urls_mock.return_value = []
+        size = MAX_PART_COUNT * DEFAULT_PART_SIZE + 1
+
+        result = initiate_multipart_upload({'object_key': 'big.bin', 'size': size}, self.mock_cursor)
+
+        self.assertEqual(result['part_size'], DEFAULT_PART_SIZE + MIB)
+        self.assertLessEqual(create_signed_part_urls_mock.call_args[0][2], MAX_PART_COUNT)
+
+    @patch.object(AssetDao, 'set_upload_id')
+    @patch.object(S3Service, 'abort_multipart_upload')
+    @patch.object(S3Service, 'create_signed_part_urls')
+    @patch.object(S3Service, 'create_multipart_upload')
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_signing_failure_aborts_upload(
+        self,
+        insert_or_get_mock,
+        create_multipart_upload_mock,
+        create_signed_part_urls_mock,
+        abort_multipart_upload_mock,
+        set_upload_id_mock
+    ):
+        """
+        Given:
+            The part URLs can't be signed
+        Then:
+            The new multipart upload is aborted and nothing is recorded
+        """
+        insert_or_get_mock.return_value = make_asset_row()
+        create_multipart_upload_mock.return_value = 'upload'
+        create_signed_part_urls_mock.side_effect = S3ServiceException('nope')
+
+        with self.assertRaises(S3ServiceException):
+            initiate_multipart_upload({'object_key': 'big.bin', 'size': 1}, self.mock_cursor)
+
+        abort_multipart_upload_mock.assert_called_once_with('big.bin', 'upload', bucket_name=DEFAULT_BUCKET)
+        set_upload_id_mock.assert_not_called()
+
+    @patch.object(S3Service, 'create_multipart_upload')
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_existing_completed_asset(self, insert_or_get_mock, create_multipart_upload_mock):
+        """
+        Given:
+            The object key belongs to an asset that is already complete
+        Then:
+            An error is raised and no multipart upload is created
+        """
+        insert_or_get_mock.return_value = make_asset_row(uploaded_status=UploadedStatus.COMPLETE.value)
+
+        with self.assertRaises(MultipartUploadInvalidArgsException) as ctx:
+            initiate_multipart_upload({'object_key': 'big.bin', 'size': 1}, self.mock_cursor)
+
+        self.assertEqual(str(ctx.exception), 'Upload already complete, try another object_key.')
+        create_multipart_upload_mock.assert_not_called()
+
+    def test_invalid_parameters(self):
+        """
+        Given:
+            Parameters are provided that are not valid, or are missing when required
+        Then:
+            An applicable error is raised
+        """
+        for upload_request, message in (
+            ({'size': 1}, 'Missing key: object_key'),
+            ({'object_key': 'big.bin'}, 'Missing key: size'),
+            ({'object_key': 'big.bin', 'size': 0}, 'Invalid key: size, Value: 0 is not a positive int'),
+            (
+                {'object_key': 'big.bin', 'size': 1, 'part_size': 1},
+                f'Invalid key: part_size, Value: 1 is not between {MIN_PART_SIZE} and {5 * 1024 * MIB}'
+            ),
+            (
+                {'object_key': 'big.bin', 'size': MIN_PART_SIZE * MAX_PART_COUNT + 1, 'part_size': MIN_PART_SIZE},
+                f'Invalid key: part_size, Value: {MIN_PART_SIZE} would split the upload into more than '
+                f'{MAX_PART_COUNT} parts'
+            ),
+        ):
+            with self.assertRaises(MultipartUploadInvalidArgsException) as ctx:
+                initiate_multipart_upload(upload_request, self.mock_cursor)
+            self.assertEqual(str(ctx.exception), message)
+
+class CompleteMultipartUploadUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    @patch.object(asset_row_cache, 'invalidate_after_commit')
+    @patch.object(AssetDao, 'finish_upload')
+    @patch.object(S3Service, 'complete_multipart_upload')
+    @patch.object(AssetDao, 'get_by_id')
+    def test_happy_path(self, get_by_id_mock, complete_mock, finish_upload_mock, invalidate_mock):
+        """
+        Given:
+            The asset has a multipart upload in progress
+        Then:
+            The upload is completed in S3 with the given parts, and the asset is marked complete
+        """
+        get_by_id_mock.return_value = make_asset_row(upload_id='upload')
+        finish_upload_mock.return_value = make_asset_row(uploaded_status=UploadedStatus.COMPLETE.value)
+
+        result = complete_multipart_upload({
+            'asset_id': 1,
+            'parts': [{'part_number': 1, 'etag': '"abc"'}],
+        }, self.mock_cursor)
+
+        complete_mock.assert_called_once_with(
+            'big.bin', 'upload', parts=[(1, '"abc"')], bucket_name=DEFAULT_BUCKET
+        )
+        finish_upload_mock.assert_called_once_with(
+            1, 'upload', UploadedStatus.COMPLETE.value, self.mock_cursor
+        )
+        invalidate_mock.assert_called_once_with([1], self.mock_cursor)
+        self.assertEqual(result, {
+            'success': True,
+            'asset_id': 1,
+            'uploaded_status': UploadedStatus.COMPLETE.value,
+        })
+
+    @patch.object(AssetDao, 'get_by_id')
+    def test_no_upload_in_progress(self, get_by_id_mock):
+        """
+        Given:
+            The asset doesn't exist, or has no multipart upload in progress
+        Then:
+            An applicable error is raised
+        """
+        get_by_id_mock.return_value = None
+        with self.assertRaises(AssetNotFoundException):
+            complete_multipart_upload({'asset_id': 1}, self.mock_cursor)
+
+        get_by_id_mock.return_value = make_asset_row()
+        with self.assertRaises(MultipartUploadInvalidArgsException) as ctx:
+            complete_multipart_upload({'asset_id': 1}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Asset with id 1 has no multipart upload in progress.')
+
+    def test_invalid_parts(self):
+        """
+        Given:
+            The parts aren't shaped properly
+        Then:
+            An applicable error is raised
+        """
+        with self.assertRaises(MultipartUploadInvalidArgsException) as ctx:
+            complete_multipart_upload({'asset_id': 1, 'parts': [{'part_number': '1'}]}, self.mock_cursor)
+        self.assertEqual(
+            str(ctx.exception),
+            'Invalid part at index 0: expected an object with an int part_number and a string etag'
+        )
+
+class AbortMultipartUploadUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    @patch.object(AssetDao, 'finish_upload')
+    @patch.object(S3Service, 'abort_multipart_upload')
+    @patch.object(AssetDao, 'get_by_id')
+    def test_happy_path(self, get_by_id_mock, abort_mock, finish_upload_mock):
+        """
+        Given:
+            The asset has a multipart upload in progress
+        Then:
+            The upload is aborted in S3 and cleared from the asset, whose status is unchanged
+        """
+        get_by_id_mock.return_value = make_asset_row(upload_id='upload')
+
+        result = abort_multipart_upload({'asset_id': 1}, self.mock_cursor)
+
+        abort_mock.assert_called_once_with('big.bin', 'upload', bucket_name=DEFAULT_BUCKET)
+        finish_upload_mock.assert_called_once_with(
+            1, 'upload', UploadedStatus.PENDING.value, self.mock_cursor
+        )
+        self.assertEqual(result, {'success': True, 'asset_id': 1})
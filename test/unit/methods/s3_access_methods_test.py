@@ -2,10 +2,19 @@ import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 from freezegun import freeze_time
-from methods.s3_access_methods import initiate_upload, UploadInvalidArgsException
+from methods.s3_access_methods import (
+    initiate_upload,
+    initiate_batch_upload,
+    initiate_batch_access,
+    UploadInvalidArgsException,
+    AccessInvalidArgsException,
+    MAX_BATCH_UPLOAD_SIZE,
+    MAX_BATCH_ACCESS_SIZE,
+)
 from database.asset_dao import AssetDao, UploadedStatus, AssetRow
+from database.asset_row_cache import asset_row_cache
 from external_services.s3_service import (
-    S3Service, DEFAULT_BUCKET, DEFAULT_EXPIRATION, S3ClientMethod
+    S3Service, DEFAULT_BUCKET, DEFAULT_EXPIRATION, S3ClientMethod, S3ServiceInvalidArgsException
 )
 
 class InitiateUploadUnitTest(unittest.TestCase):
@@ -31,16 +40,14 @@ class InitiateUploadUnitTest(unittest.TestCase):
         )
 
     @patch.object(S3Service, 'create_signed_url')
-    @patch.object(AssetDao, 'insert_one')
-    @patch.object(AssetDao, 'get_by_bucket_and_key')
-    def test_happy_path(self, bucket_key_mock, insert_one_mock, create_signed_url_mock):
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_happy_path(self, insert_or_get_mock, create_signed_url_mock):
         """
         Given:
             The object key and bucket don't already correspond to a row in the database
         Then:
             A new Asset row is inserted and an S3 signed URL is generated
         """
-        bucket_key_mock.return_value = None
         create_signed_url_mock.return_value = self.sample_presigned_post
 
         upload_request = {
@@ -56,11 +63,11 @@ class InitiateUploadUnitTest(unittest.TestCase):
                 create_date=datetime.utcnow()
             )
 
-            insert_one_mock.return_value = self.asset_row_from_db
+            insert_or_get_mock.return_value = self.asset_row_from_db
 
             result = initiate_upload(upload_request, self.mock_cursor)
 
-        insert_one_mock.assert_called_once_with(
+        insert_or_get_mock.assert_called_once_with(
             row_to_be_inserted, self.mock_cursor
         )
         create_signed_url_mock.assert_called_once_with(
@@ -75,16 +82,17 @@ class InitiateUploadUnitTest(unittest.TestCase):
 
     @patch.object(S3Service, 'create_signed_url')
     @patch.object(AssetDao, 'insert_one')
-    @patch.object(AssetDao, 'get_by_bucket_and_key')   
-    def test_happy_path_existing_asset(self, bucket_key_mock, insert_one_mock, create_signed_url_mock):
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_happy_path_existing_asset(self, insert_or_get_mock, insert_one_mock, create_signed_url_mock):
         """
         Given:
             The object key and bucket already correspond to a row in the database that is
             in the `pending` state
         Then:
-            An S3 signed URL is generated, and no row is inserted
+            An S3 signed URL is generated for the existing asset, with a single
+            database call and no separate insert
         """
-        bucket_key_mock.return_value = self.asset_row_from_db
+        insert_or_get_mock.return_value = self.asset_row_from_db
         create_signed_url_mock.return_value = self.sample_presigned_post
 
         upload_request = {
@@ -93,6 +101,7 @@ class InitiateUploadUnitTest(unittest.TestCase):
 
         result = initiate_upload(upload_request, self.mock_cursor)
 
+        insert_or_get_mock.assert_called_once()
         insert_one_mock.assert_not_called()
         create_signed_url_mock.assert_called_once_with(
             S3ClientMethod.POST_OBJECT,
@@ -105,16 +114,15 @@ class InitiateUploadUnitTest(unittest.TestCase):
         })
     
     @patch.object(S3Service, 'create_signed_url')
-    @patch.object(AssetDao, 'insert_one')
-    @patch.object(AssetDao, 'get_by_bucket_and_key')
-    def test_happy_path_with_expiration(self, bucket_key_mock, insert_one_mock, create_signed_url_mock):
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_happy_path_with_expiration(self, insert_or_get_mock, create_signed_url_mock):
         """
         Given:
             A request is made with an expiry time
         Then:
             An S3 signed URL is generated with the expiry time
         """
-        bucket_key_mock.return_value = self.asset_row_from_db
+        insert_or_get_mock.return_value = self.asset_row_from_db
         create_signed_url_mock.return_value = self.sample_presigned_post
 
         upload_request = {
@@ -165,8 +173,8 @@ class InitiateUploadUnitTest(unittest.TestCase):
             initiate_upload(data, self.mock_cursor)
         self.assertEqual(str(ctx.exception), 'Invalid key: expires_in, Value: mamajama is not an int')
     
-    @patch.object(AssetDao, 'get_by_bucket_and_key')
-    def test_completed_asset_invalid(self, bucket_and_key_mock):
+    @patch.object(AssetDao, 'insert_or_get')
+    def test_completed_asset_invalid(self, insert_or_get_mock):
         """
         Given:
             The request uses a bucket and object_key for an asset that already exists
@@ -174,7 +182,7 @@ class InitiateUploadUnitTest(unittest.TestCase):
         Then:
             An applicable error is thrown
         """
-        bucket_and_key_mock.return_value = AssetRow(
+        insert_or_get_mock.return_value = AssetRow(
             id=1,
             uploaded_status=UploadedStatus.COMPLETE.value,
             bucket=DEFAULT_BUCKET,
@@ -190,8 +198,314 @@ class InitiateUploadUnitTest(unittest.TestCase):
             initiate_upload(data, self.mock_cursor)
         self.assertEqual(str(ctx.exception), 'Upload already complete, try another object_key.')
 
+class InitiateBatchUploadUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.sample_presigned_post = {
+            'url': 'some sick URL',
+            'fields': {
+                'key': 'ABCDE.txt',
+                'AWSAccessKeyId': 'BLAHBLAHBLAHBLAH',
+                'policy': 'HONESTY',
+                'signature': 'asdfghjkl'
+            }
+        }
 
+    def _asset_row(self, id, object_key, uploaded_status=UploadedStatus.PENDING.value):
+        return AssetRow(
+            id=id,
+            uploaded_status=uploaded_status,
+            bucket=DEFAULT_BUCKET,
+            object_key=object_key,
+            create_date=datetime.utcnow()
+        )
+
+    @patch.object(S3Service, 'create_signed_url')
+    @patch.object(AssetDao, 'insert_many')
+    @patch.object(AssetDao, 'get_by_bucket_and_keys')
+    def test_happy_path(self, bucket_keys_mock, insert_many_mock, create_signed_url_mock):
+        """
+        Given:
+            A batch mixing new object keys and an existing pending asset
+        Then:
+            Existing assets are looked up once, new assets are inserted once, and
+            every upload gets a signed URL and asset_id in request order
+        """
+        bucket_keys_mock.return_value = [self._asset_row(7, 'existing.txt')]
+        insert_many_mock.side_effect = lambda rows, cursor: [
+            self._asset_row(10 + i, row.object_key) for i, row in enumerate(rows)
+        ]
+        create_signed_url_mock.return_value = self.sample_presigned_post
 
+        with freeze_time(datetime.utcnow()):
+            result = initiate_batch_upload({
+                'uploads': [
+                    {'object_key': 'b.txt'},
+                    {'object_key': 'existing.txt', 'expires_in': 30},
+                    {'object_key': 'a.txt'},
+                ]
+            }, self.mock_cursor)
 
+            bucket_keys_mock.assert_called_once_with(
+                DEFAULT_BUCKET, {'a.txt', 'b.txt', 'existing.txt'}, self.mock_cursor
+            )
+            insert_many_mock.assert_called_once_with([
+                AssetRow(
+                    id=None,
+                    uploaded_status=UploadedStatus.PENDING.value,
+                    bucket=DEFAULT_BUCKET,
+                    object_key=object_key,
+                    create_date=datetime.utcnow()
+                )
+                for object_key in ['a.txt', 'b.txt']
+            ], self.mock_cursor)
 
-        
+        create_signed_url_mock.assert_any_call(
+            S3ClientMethod.POST_OBJECT,
+            'existing.txt',
+            expiration=30,
+        )
+        self.assertEqual(result, {
+            'results': [
+                {'object_key': 'b.txt', 'signed_info': self.sample_presigned_post, 'asset_id': 11},
+                {'object_key': 'existing.txt', 'signed_info': self.sample_presigned_post, 'asset_id': 7},
+                {'object_key': 'a.txt', 'signed_info': self.sample_presigned_post, 'asset_id': 10},
+            ]
+        })
+
+    @patch.object(S3Service, 'create_signed_url')
+    @patch.object(AssetDao, 'insert_many')
+    @patch.object(AssetDao, 'get_by_bucket_and_keys')
+    def test_per_item_errors(self, bucket_keys_mock, insert_many_mock, create_signed_url_mock):
+        """
+        Given:
+            A batch with an invalid entry, an already completed asset, and an entry
+            that fails to sign
+        Then:
+            Those entries get an error, no asset is written for them, and the rest
+            of the batch still succeeds
+        """
+        bucket_keys_mock.return_value = [
+            self._asset_row(7, 'done.txt', uploaded_status=UploadedStatus.COMPLETE.value)
+        ]
+        insert_many_mock.side_effect = lambda rows, cursor: [
+            self._asset_row(10 + i, row.object_key) for i, row in enumerate(rows)
+        ]
+
+        def sign(method, object_key, **kwargs):
+            if 'expiration' in kwargs:
+                raise S3ServiceInvalidArgsException('expiration time was too long')
+            return self.sample_presigned_post
+        create_signed_url_mock.side_effect = sign
+
+        result = initiate_batch_upload({
+            'uploads': [
+                {'object_key': 1},
+                'not_an_object',
+                {'object_key': 'done.txt'},
+                {'object_key': 'too_long.txt', 'expires_in': 999999},
+                {'object_key': 'fine.txt'},
+            ]
+        }, self.mock_cursor)
+
+        self.assertEqual([row.object_key for row in insert_many_mock.call_args[0][0]], ['fine.txt'])
+        self.assertEqual(result, {
+            'results': [
+                {'object_key': 1, 'error': 'Invalid key: object_key, Value: 1 is not a string'},
+                {'object_key': None, 'error': 'Invalid upload: not_an_object is not an object'},
+                {'object_key': 'done.txt', 'error': 'Upload already complete, try another object_key.'},
+                {'object_key': 'too_long.txt', 'error': 'expiration time was too long'},
+                {'object_key': 'fine.txt', 'signed_info': self.sample_presigned_post, 'asset_id': 10},
+            ]
+        })
+
+    @patch.object(S3Service, 'create_signed_url')
+    @patch.object(AssetDao, 'insert_many')
+    @patch.object(AssetDao, 'get_by_bucket_and_keys')
+    def test_concurrently_inserted_asset(self, bucket_keys_mock, insert_many_mock, create_signed_url_mock):
+        """
+        Given:
+            Another request inserts one of our new object keys between our lookup and our insert
+        Then:
+            The row it inserted is looked up and used, instead of failing the batch
+        """
+        bucket_keys_mock.side_effect = [[], [self._asset_row(3, 'raced.txt')]]
+        insert_many_mock.return_value = []
+        create_signed_url_mock.return_value = self.sample_presigned_post
+
+        result = initiate_batch_upload({
+            'uploads': [{'object_key': 'raced.txt'}]
+        }, self.mock_cursor)
+
+        bucket_keys_mock.assert_called_with(DEFAULT_BUCKET, {'raced.txt'}, self.mock_cursor)
+        self.assertEqual(result, {
+            'results': [
+                {'object_key': 'raced.txt', 'signed_info': self.sample_presigned_post, 'asset_id': 3},
+            ]
+        })
+
+    def test_invalid_request(self):
+        """
+        Given:
+            The request is missing `uploads`, it isn't a list, or it is too long
+        Then:
+            An applicable error is thrown
+        """
+        with self.assertRaises(UploadInvalidArgsException) as ctx:
+            initiate_batch_upload({}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Missing key: uploads')
+
+        with self.assertRaises(UploadInvalidArgsException) as ctx:
+            initiate_batch_upload({'uploads': 'abc'}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Invalid key: uploads, Value: abc is not a list')
+
+        with self.assertRaises(UploadInvalidArgsException) as ctx:
+            initiate_batch_upload({
+                'uploads': [{'object_key': 'a'}] * (MAX_BATCH_UPLOAD_SIZE + 1)
+            }, self.mock_cursor)
+        self.assertEqual(
+            str(ctx.exception),
+            f'Invalid key: uploads, at most {MAX_BATCH_UPLOAD_SIZE} uploads can be requested at once'
+        )
+
+class InitiateBatchAccessUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        asset_row_cache.clear()
+
+    def _asset_row(self, id, uploaded_status=UploadedStatus.COMPLETE.value):
+        return AssetRow(
+            id=id,
+            uploaded_status=uploaded_status,
+            bucket='my_bucket',
+            object_key=f'key_{id}',
+            create_date=datetime.utcnow()
+        )
+
+    @patch.object(S3Service, 'create_signed_url')
+    @patch.object(AssetDao, 'get_by_ids')
+    def test_happy_path(self, get_by_ids_mock, create_signed_url_mock):
+        """
+        Given:
+            A batch of completed assets and a shared expiry time
+        Then:
+            The assets are looked up with one query and each gets a signed URL
+        """
+        get_by_ids_mock.return_value = [self._asset_row(2), self._asset_row(1)]
+        create_signed_url_mock.side_effect = lambda method, object_key, **kwargs: f'yay://{object_key}'
+
+        result = initiate_batch_access({
+            'asset_ids': [1, 2],
+            'expires_in': 300,
+        }, self.mock_cursor)
+
+        get_by_ids_mock.assert_called_once_with({1, 2}, self.mock_cursor)
+        create_signed_url_mock.assert_any_call(
+            S3ClientMethod.GET_OBJECT,
+            'key_1',
+            bucket_name='my_bucket',
+            expiration=300,
+        )
+        self.assertEqual(result, {
+            'urls': {
+                '1': 'yay://key_1',
+                '2': 'yay://key_2',
+            },
+            'errors': {},
+        })
+
+    @patch.object(S3Service, 'create_signed_url')
+    @patch.object(AssetDao, 'get_by_ids')
+    def test_per_id_errors(self, get_by_ids_mock, create_signed_url_mock):
+        """
+        Given:
+            A batch with an invalid id, a missing asset and an incomplete asset
+        Then:
+            Those ids get an error, and the rest of the batch still gets signed URLs
+        """
+        get_by_ids_mock.return_value = [
+            self._asset_row(1),
+            self._asset_row(3, uploaded_status=UploadedStatus.PENDING.value),
+        ]
+        create_signed_url_mock.return_value = 'yay://a.url.com'
+
+        result = initiate_batch_access({
+            'asset_ids': [1, 2, 3, 'abc'],
+        }, self.mock_cursor)
+
+        get_by_ids_mock.assert_called_once_with({1, 2, 3}, self.mock_cursor)
+        create_signed_url_mock.assert_called_once_with(
+            S3ClientMethod.GET_OBJECT,
+            'key_1',
+            bucket_name='my_bucket',
+        )
+        self.assertEqual(result, {
+            'urls': {
+                '1': 'yay://a.url.com',
+            },
+            'errors': {
+                '2': 'Asset with id 2 not found',
+                '3': 'Asset upload is not yet completed.',
+                'abc': 'Invalid asset_id, Value: abc is not an int',
+            },
+        })
+
+    def test_invalid_request(self):
+        """
+        Given:
+            The request is missing `asset_ids`, it is malformed, or `expires_in` is not an int
+        Then:
+            An applicable error is thrown
+        """
+        with self.assertRaises(AccessInvalidArgsException) as ctx:
+            initiate_batch_access({}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Missing key: asset_ids')
+
+        with self.assertRaises(AccessInvalidArgsException) as ctx:
+            initiate_batch_access({'asset_ids': 1}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Invalid key: asset_ids, Value: 1 is not a list')
+
+        with self.assertRaises(AccessInvalidArgsException) as ctx:
+            initiate_batch_access({'asset_ids': [1] * (MAX_BATCH_ACCESS_SIZE + 1)}, self.mock_cursor)
+        self.assertEqual(
+            str(ctx.exception),
+            f'Invalid key: asset_ids, at most {MAX_BATCH_ACCESS_SIZE} assets can be accessed at once'
+        )
+
+        with self.assertRaises(AccessInvalidArgsException) as ctx:
+            initiate_batch_access({'asset_ids': [1], 'expires_in': 'soon'}, self.mock_cursor)
+        self.assertEqual(str(ctx.exception), 'Invalid key: expires_in, Value: soon is not an int')
+
+    @patch.object(S3Service, 'create_signed_url')
+    @patch.object(AssetDao, 'get_by_ids')
+    def test_replica_behind(self, get_by_ids_mock, create_signed_url_mock):
+        """
+        Given:
+            The batch is read from a replica, which doesn't have every asset as complete yet
+        Then:
+            Only those assets are looked up again on the primary
+        """
+        primary_cursor = MagicMock()
+        primary_checkout = MagicMock()
+        primary_checkout.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = primary_cursor
+        get_by_ids_mock.side_effect = [
+            [self._asset_row(1), self._asset_row(3, uploaded_status=UploadedStatus.PENDING.value)],
+            [self._asset_row(2), self._asset_row(3)],
+        ]
+        create_signed_url_mock.side_effect = lambda method, object_key, **kwargs: f'yay://{object_key}'
+
+        result = initiate_batch_access({'asset_ids': [1, 2, 3, 4]}, self.mock_cursor, primary_checkout)
+
+        self.assertEqual(get_by_ids_mock.call_args_list[1].args, ({2, 3, 4}, primary_cursor))
+        # Only the rows read from the primary are cached
+        self.assertEqual(asset_row_cache.stats()['size'], 2)
+        self.assertEqual(result, {
+            'urls': {
+                '1': 'yay://key_1',
+                '2': 'yay://key_2',
+                '3': 'yay://key_3',
+            },
+            'errors': {
+                '4': 'Asset with id 4 not found',
+            },
+        })
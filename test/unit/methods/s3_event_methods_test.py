@@ -0,0 +1,140 @@
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+from methods.s3_event_methods import (
+    ingest_s3_events,
+    S3EventInvalidArgsException,
+    MAX_EVENT_RECORDS,
+)
+from database.asset_dao import AssetDao, UploadedStatus
+from database.asset_row_cache import asset_row_cache
+
+def s3_record(object_key, bucket='b', event_name='ObjectCreated:Put'):
+    return {
+        'eventSource': 'aws:s3',
+        'eventName': event_name,
+        's3': {
+            'bucket': {'name': bucket},
+            'object': {'key': object_key, 'size': 1},
+        },
+    }
+
+def sns_notification(s3_event):
+    return {
+        'Type': 'Notification',
+        'MessageId': 'abc',
+        'Message': json.dumps(s3_event),
+    }
+
+def sqs_batch(*bodies):
+    return {
+        'Records': [
+            {'eventSource': 'aws:sqs', 'messageId': str(index), 'body': json.dumps(body)}
+            for index, body in enumerate(bodies)
+        ],
+    }
+
+@patch.object(asset_row_cache, 'invalidate_after_commit')
+@patch.object(AssetDao, 'update_uploaded_status_by_bucket_key_pairs')
+class IngestS3EventsUnitTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+
+    def test_happy_path(self, update_mock, invalidate_many_mock):
+        """
+        Given:
+            An S3 event reporting created objects
+        Then:
+            Their pending assets are marked complete with a single update, and the completed ids are returned
+        """
+        update_mock.return_value = [2, 1]
+
+        result = ingest_s3_events({'Records': [s3_record('a'), s3_record('c', bucket='other')]}, self.mock_cursor)
+
+        update_mock.assert_called_once_with(
+            [('b', 'a'), ('other', 'c')],
+            UploadedStatus.PENDING.value,
+            UploadedStatus.COMPLETE.value,
+            self.mock_cursor,
+        )
+        invalidate_many_mock.assert_called_once_with([2, 1], self.mock_cursor)
+        self.assertEqual(result, {'success': True, 'records': 2, 'completed': [1, 2]})
+
+    def test_envelopes(self, update_mock, invalidate_many_mock):
+        """
+        Given:
+            S3 events delivered through SNS, SQS, and SNS then SQS
+        Then:
+            The records are unwrapped from every envelope, and repeated objects are only updated once
+        """
+        update_mock.return_value = []
+        s3_event = {'Records': [s3_record('a')]}
+
+        result = ingest_s3_events(
+            sqs_batch(s3_event, sns_notification({'Records': [s3_record('b'), s3_record('a')]})),
+            self.mock_cursor
+        )
+        ingest_s3_events(sns_notification(s3_event), self.mock_cursor)
+
+        self.assertEqual(result['records'], 3)
+        self.assertEqual(update_mock.call_args_list[0][0][0], [('b', 'a'), ('b', 'b')])
+        self.assertEqual(update_mock.call_args_list[1][0][0], [('b', 'a')])
+
+    def test_decodes_keys(self, update_mock, invalidate_many_mock):
+        """
+        Given:
+            Object keys URL-encoded by S3, with spaces as '+'
+        Then:
+            They are decoded before being matched
+        """
+        update_mock.return_value = []
+
+        ingest_s3_events({'Records': [s3_record('my+folder/caf%C3%A9%2B1.jpg')]}, self.mock_cursor)
+
+        self.assertEqual(update_mock.call_args[0][0], [('b', 'my folder/café+1.jpg')])
+
+    def test_ignores_other_events(self, update_mock, invalidate_many_mock):
+        """
+        Given:
+            Events that don't report a created object: a removal, S3's test event and an SNS subscription confirmation
+        Then:
+            They are ignored
+        """
+        update_mock.return_value = []
+
+        for payload in (
+            {'Records': [s3_record('a', event_name='ObjectRemoved:Delete')]},
+            {'Service': 'Amazon S3', 'Event': 's3:TestEvent', 'Bucket': 'b'},
+            {'Type': 'SubscriptionConfirmation', 'SubscribeURL': 'https://sns.amazonaws.com'},
+        ):
+            self.assertEqual(
+                ingest_s3_events(payload, self.mock_cursor),
+                {'success': True, 'records': 0, 'completed': []}
+            )
+
+    def test_invalid_events(self, update_mock, invalidate_many_mock):
+        """
+        Given:
+            Payloads that are malformed, or report too many objects
+        Then:
+            An applicable error is raised and nothing is updated
+        """
+        for payload, message in (
+            ([], 'Invalid event: [] is not an object'),
+            ({'Records': 'abc'}, 'Invalid key: Records, Value: abc is not a list'),
+            ({'Type': 'Notification', 'Message': 'abc'}, 'Invalid SNS message: it is not JSON'),
+            (
+                {'Records': [{'eventSource': 'aws:s3', 'eventName': 'ObjectCreated:Put'}]},
+                "Invalid record: {'eventSource': 'aws:s3', 'eventName': 'ObjectCreated:Put'} "
+                'has no s3.bucket.name or s3.object.key'
+            ),
+            (
+                {'Records': [s3_record(str(index)) for index in range(MAX_EVENT_RECORDS + 1)]},
+                f'Invalid event: at most {MAX_EVENT_RECORDS} records can be ingested at once'
+            ),
+        ):
+            with self.assertRaises(S3EventInvalidArgsException) as ctx:
+                ingest_s3_events(payload, self.mock_cursor)
+            self.assertEqual(str(ctx.exception), message)
+
+        update_mock.assert_not_called()
@@ -0,0 +1,146 @@
+import unittest
+from metrics.request_metrics import RequestMetrics, render_stats, render_labelled_stats, PHASE_SECONDS
+
+class RequestMetricsUnitTest(unittest.TestCase):
+    def test_disabled(self):
+        """
+        Given:
+            Metrics are switched off
+        Then:
+            Timers are a shared no-op and nothing is recorded
+        """
+        metrics = RequestMetrics(enabled=False)
+
+        metrics.begin_request('/api/access', 'GET')
+        self.assertIs(metrics.timer('sign'), metrics.timer('checkout'))
+        with metrics.timer('sign'), metrics.query_timer('asset_get_by_id'):
+            pass
+        metrics.end_request(200)
+
+        self.assertFalse(any(not line.startswith('#') for line in metrics.render()))
+
+    def test_current_endpoint(self):
+        """
+        Given:
+            Metrics are switched off
+        Then:
+            The endpoint being served is still known until the request ends
+        """
+        metrics = RequestMetrics(enabled=False)
+
+        self.assertIsNone(metrics.current_endpoint())
+        metrics.begin_request('/api/access', 'GET')
+        self.assertEqual(metrics.current_endpoint(), '/api/access')
+        metrics.end_request(200)
+        self.assertIsNone(metrics.current_endpoint())
+
+    def test_outside_a_request(self):
+        """
+        Given:
+            Metrics are switched on, and something is timed outside of any request
+        Then:
+            It isn't recorded
+        """
+        metrics = RequestMetrics(enabled=True)
+
+        with metrics.timer('checkout'):
+            pass
+
+        self.assertFalse(any(not line.startswith('#') for line in metrics.render()))
+
+    def test_request_breakdown(self):
+        """
+        Given:
+            A request times its phases and queries
+        Then:
+            Each is recorded against the request's endpoint, and the request itself is counted
+        """
+        metrics = RequestMetrics(enabled=True, buckets=(1.0,))
+        sign = metrics.timed('sign')(lambda value: value * 2)
+
+        metrics.begin_request('/api/access', 'GET')
+        with metrics.timer('checkout'):
+            pass
+        with metrics.query_timer('asset_get_by_id'):
+            pass
+        self.assertEqual(sign(21), 42)
+        metrics.end_request(200)
+        lines = metrics.render()
+
+        for expected in (
+            'cloud_asset_request_duration_seconds_count{endpoint="/api/access",method="GET"} 1',
+            'cloud_asset_phase_duration_seconds_count{endpoint="/api/access",phase="checkout"} 1',
+            'cloud_asset_phase_duration_seconds_count{endpoint="/api/access",phase="sign"} 1',
+            'cloud_asset_query_duration_seconds_count{endpoint="/api/access",statement="asset_get_by_id"} 1',
+            'cloud_asset_requests_total{endpoint="/api/access",method="GET",code="200"} 1',
+        ):
+            self.assertIn(expected, lines)
+
+    def test_histogram_buckets(self):
+        """
+        Given:
+            Observations on, between and above the bucket bounds
+        Then:
+            Bucket counts are cumulative, and each bound includes observations equal to it
+        """
+        metrics = RequestMetrics(enabled=True, buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.1, 0.5, 2.0):
+            metrics.observe(PHASE_SECONDS, ('/api/upload', 'sign'), seconds)
+
+        lines = [line for line in metrics.render() if line.startswith('cloud_asset_phase_duration_seconds')]
+
+        self.assertEqual(lines, [
+            'cloud_asset_phase_duration_seconds_bucket{endpoint="/api/upload",phase="sign",le="0.1"} 2',
+            'cloud_asset_phase_duration_seconds_bucket{endpoint="/api/upload",phase="sign",le="1.0"} 3',
+            'cloud_asset_phase_duration_seconds_bucket{endpoint="/api/upload",phase="sign",le="+Inf"} 4',
+            'cloud_asset_phase_duration_seconds_sum{endpoint="/api/upload",phase="sign"} 2.65',
+            'cloud_asset_phase_duration_seconds_count{endpoint="/api/upload",phase="sign"} 4',
+        ])
+
+class RenderStatsUnitTest(unittest.TestCase):
+    def test_render_stats(self):
+        """
+        Given:
+            A stats dict with counters, gauges, a flag and a missing value
+        Then:
+            Counters get a _total suffix (once), flags become 0/1 and missing values are left out
+        """
+        lines = render_stats('pool', {
+            'checkouts': 3,
+            'checkout_wait_seconds_total': 0.5,
+            'idle': 2,
+            'enabled': True,
+            'max_uses': None,
+        }, counters={'checkouts', 'checkout_wait_seconds_total'})
+
+        self.assertEqual(lines, [
+            '# TYPE cloud_asset_pool_checkouts_total counter',
+            'cloud_asset_pool_checkouts_total 3',
+            '# TYPE cloud_asset_pool_checkout_wait_seconds_total counter',
+            'cloud_asset_pool_checkout_wait_seconds_total 0.5',
+            '# TYPE cloud_asset_pool_idle gauge',
+            'cloud_asset_pool_idle 2',
+            '# TYPE cloud_asset_pool_enabled gauge',
+            'cloud_asset_pool_enabled 1',
+        ])
+
+    def test_render_labelled_stats(self):
+        """
+        Given:
+            Stats dicts for two statements
+        Then:
+            Each metric is typed once, with a labelled sample per statement
+        """
+        lines = render_labelled_stats('statement', 'statement', {
+            'b_get': {'calls': 2, 'seconds_max': 0.5},
+            'a_get': {'calls': 1, 'seconds_max': 0.25},
+        }, counters={'calls'})
+
+        self.assertEqual(lines, [
+            '# TYPE cloud_asset_statement_calls_total counter',
+            'cloud_asset_statement_calls_total{statement="a_get"} 1',
+            'cloud_asset_statement_calls_total{statement="b_get"} 2',
+            '# TYPE cloud_asset_statement_seconds_max gauge',
+            'cloud_asset_statement_seconds_max{statement="a_get"} 0.25',
+            'cloud_asset_statement_seconds_max{statement="b_get"} 0.5',
+        ])
@@ -0,0 +1,162 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Workers answer every connection with their pid, until they're sent SIGTERM
+SUPERVISOR = '''
+import logging, os, signal, socket, sys
+from prefork import PreforkSupervisor, open_listening_socket
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+mode = sys.argv[2]
+
+def serve(listen_socket):
+    if mode == 'crash':
+        sys.exit(3)
+    stopping = []
+    signal.signal(signal.SIGTERM, signal.SIG_IGN if mode == 'stubborn' else lambda *args: stopping.append(True))
+    listen_socket.settimeout(0.05)
+    while not stopping:
+        try:
+            connection, _ = listen_socket.accept()
+        except socket.timeout:
+            continue
+        with connection:
+            connection.sendall(str(os.getpid()).encode())
+
+with open_listening_socket('127.0.0.1', int(sys.argv[1]), 16) as listen_socket:
+    PreforkSupervisor(
+        serve, listen_socket, workers=2, stop_timeout=0.5, min_uptime=1, restart_delay=0.2, max_restart_delay=0.4
+    ).run()
+'''
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _children(pid):
+    children = set()
+    for entry in os.listdir('/proc'):
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # The ppid follows the process name, which is in parentheses
+                if int(stat.read().rpartition(')')[2].split()[1]) == pid:
+                    children.add(int(entry))
+        except (ValueError, OSError):
+            continue
+    return children
+
+@unittest.skipUnless(hasattr(os, 'fork') and os.path.isdir('/proc'), 'Forks, and finds workers through /proc')
+class PreforkSupervisorUnitTest(unittest.TestCase):
+    def start(self, mode='serve'):
+        self.port = _free_port()
+        self.supervisor = subprocess.Popen(
+            [sys.executable, '-c', SUPERVISOR, str(self.port), mode],
+            env={**os.environ, 'PYTHONPATH': ROOT},
+            cwd=ROOT,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        self.addCleanup(self.supervisor.kill)
+        self.addCleanup(self.supervisor.stderr.close)
+
+    def stop(self):
+        self.supervisor.send_signal(signal.SIGTERM)
+        self.assertEqual(self.supervisor.wait(10), 0)
+        return self.supervisor.stderr.read()
+
+    def wait_for_workers(self, condition):
+        for _ in range(1000):
+            workers = _children(self.supervisor.pid)
+            if condition(workers):
+                return workers
+            time.sleep(0.01)
+        self.fail(f'Timed out waiting, with workers {workers}')
+
+    def answering_pid(self):
+        with socket.create_connection(('127.0.0.1', self.port), timeout=10) as connection:
+            return int(connection.recv(32))
+
+    def test_replaces_exited_worker(self):
+        """
+        Given:
+            A worker dies
+        Then:
+            It is replaced, and the supervisor still stops cleanly
+        """
+        self.start()
+        workers = self.wait_for_workers(lambda workers: len(workers) == 2)
+        self.assertIn(self.answering_pid(), workers)
+        dead = min(workers)
+
+        os.kill(dead, signal.SIGKILL)
+        replaced = self.wait_for_workers(lambda current: len(current) == 2 and dead not in current)
+
+        self.assertIn(self.answering_pid(), replaced)
+        self.assertIn(f'Worker {dead} was killed by signal {signal.SIGKILL.value}', self.stop())
+        self.assertEqual(_children(self.supervisor.pid), set())
+
+    def test_reload(self):
+        """
+        Given:
+            The supervisor is sent SIGHUP
+        Then:
+            Every worker is replaced, and connections are answered throughout
+        """
+        self.start()
+        old = self.wait_for_workers(lambda workers: len(workers) == 2)
+
+        self.supervisor.send_signal(signal.SIGHUP)
+        answered = set()
+        while len(answered) < 20 and not _children(self.supervisor.pid).isdisjoint(old):
+            answered.add(self.answering_pid())
+        new = self.wait_for_workers(lambda workers: len(workers) == 2 and workers.isdisjoint(old))
+
+        self.assertIn(self.answering_pid(), new)
+        logs = self.stop()
+        self.assertIn(f'Reloading, replacing workers {sorted(old)}', logs)
+        for pid in old:
+            self.assertIn(f'Worker {pid} exited with code 0 after being stopped', logs)
+
+    def test_crash_loop_backs_off(self):
+        """
+        Given:
+            Workers keep exiting as soon as they start
+        Then:
+            They're replaced after a delay that doubles, up to the maximum
+        """
+        self.start('crash')
+        time.sleep(1.5)
+
+        logs = self.stop()
+        delays = [
+            float(line.rpartition(' ')[2].rstrip('s'))
+            for line in logs.splitlines() if 'after starting, replacing it in' in line
+        ]
+        self.assertEqual(delays[0], 0.2)
+        self.assertIn(0.4, delays)
+        self.assertLessEqual(max(delays), 0.4)
+        # Two workers a round, and at most five rounds started in the time
+        self.assertLessEqual(len(delays), 10)
+
+    def test_worker_killed_after_stop_timeout(self):
+        """
+        Given:
+            Workers ignore SIGTERM
+        Then:
+            The supervisor kills them once the stop timeout is up
+        """
+        self.start('stubborn')
+        workers = self.wait_for_workers(lambda workers: len(workers) == 2)
+
+        logs = self.stop()
+
+        for pid in workers:
+            self.assertIn(f'Worker {pid} took longer than 0.5s to stop, killing it', logs)